@@ -1,9 +1,18 @@
 import streamlit as st
 import pandas as pd
-import re
+import os
 from pathlib import Path
 from datetime import datetime
 
+from asset_registry import AssetRegistry
+from dashboard import EXPORT_FORMATS, DashboardCache, export_file, filter_key, normalize_frame
+from leaderboard import split_column
+from live_feed import LiveFeed
+from sheet_store import IncrementalSheetLoader, ResultsApiLoader
+from stage_analytics import StageAnalytics
+from stages import FINAL_STAGE, STAGES
+import telemetry
+
 # -----------------------------
 # PAGE CONFIG
 # -----------------------------
@@ -17,37 +26,83 @@ st.set_page_config(
 # LOAD CSS
 # -----------------------------
 CSS_PATH = Path("style.css")
-if CSS_PATH.exists():
-    st.markdown(f"<style>{CSS_PATH.read_text(encoding='utf-8')}</style>", unsafe_allow_html=True)
+ASSETS_WATCH = os.environ.get("ASSETS_WATCH", "").lower() in ("1", "true", "yes", "on")
+
+@st.cache_resource
+def get_assets() -> AssetRegistry:
+    """CSS / โลโก้ อ่านจากดิสก์ครั้งเดียวต่อ process ใช้ร่วมกันทุก session"""
+    return AssetRegistry(watch=ASSETS_WATCH)
+
+css = get_assets().text(CSS_PATH)
+if css is not None:
+    st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
 else:
     st.warning("ไม่พบไฟล์ style.css (ควรอยู่โฟลเดอร์เดียวกับ admin.py)")
 
 # -----------------------------
 # HEADER
 # -----------------------------
-st.image("assets/logo.png", use_container_width=True)
+st.image(get_assets().image("assets/logo.png"), use_container_width=True)
 st.markdown(
     '<p style="text-align:center; opacity:0.9;">แดชบอร์ดควบคุมครู — ผล DATA Escape Room</p>',
     unsafe_allow_html=True
 )
 
 SHEET_CSV_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vQIHdSOZCCAyAPLg41A9no_hJmAhm9dPV4lim7xxBctg-WSJxrnO5Uc6bdD9WSo16o0krwa6319JQ1p/pub?output=csv"
+# สำเนาชีตในเครื่อง (ดึงเฉพาะแถวใหม่ทุกครั้งที่รีเฟรช)
+SHEET_STORE_PATH = Path("data") / "sheet_rows.db"
+# โหลดชีตใหม่ทั้งหมดทุกกี่วินาที (แถวที่ครูแก้/ลบกลางชีต) — ปุ่มรีเฟรชโหลดใหม่ทั้งหมดทันที
+SHEET_FULL_RELOAD_SEC = float(os.environ.get("SHEET_FULL_RELOAD_SEC", 600))
+
+# ถ้ารัน results_service ในเครื่อง อ่านผลจากที่นั่นแทนชีต (เช่น http://localhost:8600)
+RESULTS_API_URL = os.environ.get("RESULTS_API_URL", "").rstrip("/")
+DATA_SOURCE = RESULTS_API_URL or SHEET_CSV_URL
+
+# โหมดสด: ดึงแถวใหม่จากแหล่งข้อมูลทุก LIVE_POLL_SEC / วาดส่วนสรุปใหม่ทุก LIVE_REFRESH_SEC
+LIVE_POLL_SEC = 1.0 if RESULTS_API_URL else 15.0
+LIVE_REFRESH_SEC = 2.0
+# ไม่มีหน้าจอไหนเปิดโหมดสดนานเท่านี้ (วินาที) = หยุดดึงข้อมูล จนกว่าจะมีคนเปิดอีกครั้ง
+LIVE_IDLE_SEC = 60.0
+
+# ผ่านครบทุกด่าน = ตอบถูกทุกด่านใน STAGES
+REQUIRED_STAGES = {s.number for s in STAGES}
+
+# แผงเวลาที่ซ่อนไว้: เปิดด้วย ?panel=timing (ต้องรันทั้งสองแอปด้วย TELEMETRY=1)
+TIMING_PANEL_PARAM = "timing"
 
 # -----------------------------
 # HELPERS
 # -----------------------------
-@st.cache_data(ttl=60)
+@st.cache_resource
+def get_telemetry() -> telemetry.Telemetry:
+    return telemetry.from_env("admin")
+
+@st.cache_resource
+def get_sheet_loader(url: str):
+    if url == RESULTS_API_URL:
+        return ResultsApiLoader(url)
+    return IncrementalSheetLoader(url, SHEET_STORE_PATH, full_every=SHEET_FULL_RELOAD_SEC)
+
+# บริการในเครื่องตอบเร็ว จึงรีเฟรชถี่กว่าชีต
+@st.cache_data(ttl=5 if RESULTS_API_URL else 60)
 def load_sheet(url: str) -> pd.DataFrame:
-    return pd.read_csv(url)
-
-def convert_time_to_seconds(t):
-    """แปลง 'x นาที y วินาที' -> วินาที"""
-    if pd.isna(t):
-        return None
-    m = re.search(r"(\d+)\s*นาที\s*(\d+)\s*วินาที", str(t))
-    if not m:
-        return None
-    return int(m.group(1)) * 60 + int(m.group(2))
+    loader = get_sheet_loader(url)
+    with get_telemetry().span("sheet_load"):
+        loader.refresh()
+    generation, df = loader.since(0)
+    df.attrs["generation"] = generation
+    return df
+
+def data_version(df: pd.DataFrame) -> tuple:
+    """ตัวบอกว่าข้อมูลเปลี่ยนหรือยัง (รอบที่โหลดใหม่ทั้งหมด + จำนวนแถว + หัวตาราง + แถวสุดท้าย)"""
+    last = tuple(str(v) for v in df.iloc[-1].tolist()) if len(df) else ()
+    return (df.attrs.get("generation"), len(df), tuple(df.columns), last)
+
+@st.cache_resource(max_entries=2)
+def get_dashboard(version: tuple, _raw: pd.DataFrame) -> DashboardCache:
+    """normalize + แปลงเป็น category ครั้งเดียวต่อเวอร์ชันข้อมูล ใช้ร่วมกันทุก session"""
+    with get_telemetry().span("normalize"):
+        return DashboardCache(normalize_frame(_raw), REQUIRED_STAGES, FINAL_STAGE)
 
 def sec_to_mmss(sec):
     if sec is None or pd.isna(sec):
@@ -55,6 +110,13 @@ def sec_to_mmss(sec):
     sec = int(sec)
     return f"{sec//60:02d}:{sec%60:02d}"
 
+def secs_to_mmss(sec: pd.Series) -> pd.Series:
+    """sec_to_mmss แบบทั้งคอลัมน์"""
+    sec = pd.to_numeric(sec, errors="coerce")
+    whole = sec.fillna(0).astype(int)
+    mmss = (whole // 60).astype(str).str.zfill(2) + ":" + (whole % 60).astype(str).str.zfill(2)
+    return mmss.where(sec.notna(), "-")
+
 def kpi_html(title: str, value: str, sub: str = "") -> str:
     return f"""
     <div class="kpi-box">
@@ -64,40 +126,232 @@ def kpi_html(title: str, value: str, sub: str = "") -> str:
     </div>
     """
 
+def render_overview(kpis: dict, leader: pd.DataFrame, chart_data: pd.DataFrame, splits: pd.DataFrame):
+    """KPI + leaderboard + กราฟ + คอขวดรายด่าน (ใช้ทั้งโหมดปกติและโหมดสด)"""
+    total = kpis["total"]
+    avg_finish = kpis["avg_finish"]
+
+    # -----------------------------
+    # KPI CARDS (แบบในภาพ)
+    # -----------------------------
+    st.markdown("## 📌 ภาพรวม")
+    st.markdown(
+        f"""
+        <div class="kpi-grid">
+          {kpi_html("รายการทั้งหมด", f"{total}", "Attempts (หลังกรอง)")}
+          {kpi_html("ตอบถูก", f"{kpis['correct']}", "รวมทุกด่าน")}
+          {kpi_html("ตอบผิด", f"{kpis['wrong']}", "รวมทุกด่าน")}
+          {kpi_html("ความถูกต้อง", f"{kpis['accuracy']:.1f}%", "Correct / Total")}
+          {kpi_html("จำนวนกลุ่ม", f"{kpis['groups']}", f"จำนวนห้อง {kpis['rooms']}")}
+          {kpi_html("จบเกม", f"{kpis['done_groups']}", f"เวลาเฉลี่ย {sec_to_mmss(avg_finish) if avg_finish else '-'}")}
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+    st.markdown("<hr/>", unsafe_allow_html=True)
+
+    # -----------------------------
+    # LEADERBOARD
+    # -----------------------------
+    st.markdown("## 🏆 Leaderboard (ผ่านครบทุกด่าน) — เรียงตามเวลา")
+
+    # ----- เงื่อนไข: ผ่านครบทุกด่าน + มีเวลาจบ (ด่านสุดท้ายถูกต้อง) เรียงตามเวลาที่เร็วสุดของกลุ่ม -----
+    leader = leader.copy()
+
+    if len(leader) == 0:
+        st.info(f"ยังไม่พบผู้เล่นที่ผ่านครบทุกด่าน (1–{FINAL_STAGE}) และมีเวลาจบเกม (stage {FINAL_STAGE} ถูกต้อง)")
+    else:
+        leader.insert(0, "อันดับ", leader.index + 1)
+        leader["เวลา"] = secs_to_mmss(leader["time_seconds"])
+        # เวลาต่อด่าน (ข้อมูลเก่าที่ไม่มี stage_seconds = "-")
+        split_names = {}
+        for s in sorted(REQUIRED_STAGES):
+            split_names[split_column(s)] = f"ด่าน {s}"
+            leader[split_column(s)] = secs_to_mmss(leader[split_column(s)])
+
+        # โชว์ทุกคน (ไม่จำกัด Top10)
+        st.dataframe(
+            leader[["อันดับ", "group_name", "classroom", "เวลา", "attempts", "wrong"] + list(split_names)].rename(
+                columns={"attempts": "ตอบทั้งหมด", "wrong": "ตอบผิด", **split_names}
+            ),
+            use_container_width=True,
+            hide_index=True
+        )
+
+    # -----------------------------
+    # CHARTS
+    # -----------------------------
+    st.markdown("## 📈 สถิติการตอบถูก/ผิดรายด่าน")
+
+    if total > 0 and not chart_data.empty:
+        st.bar_chart(chart_data)
+    else:
+        st.info("ข้อมูลยังไม่เพียงพอสำหรับแสดงกราฟ")
+
+    # -----------------------------
+    # BOTTLENECKS (เวลาต่อด่าน)
+    # -----------------------------
+    st.markdown("## ⏳ เวลาที่ใช้ต่อด่าน (หาคอขวด)")
+
+    if splits is not None and not splits.empty:
+        bottleneck = (splits[["median", "p90"]] / 60).rename(
+            columns={"median": "มัธยฐาน (นาที)", "p90": "P90 (นาที)"}
+        )
+        bottleneck.index = [f"ด่าน {s}" for s in bottleneck.index]
+        st.bar_chart(bottleneck, stack=False, sort=False)
+        slowest = splits["median"].idxmax()
+        st.caption(
+            f"ด่านที่ใช้เวลามากที่สุด (มัธยฐาน): ด่าน {slowest} — {sec_to_mmss(splits.loc[slowest, 'median'])} "
+            f"จาก {int(splits.loc[slowest, 'teams'])} กลุ่ม"
+        )
+    else:
+        st.info("ยังไม่มีข้อมูลเวลาต่อด่าน (stage_seconds)")
+
+    st.markdown("<hr/>", unsafe_allow_html=True)
+
+def render_analytics(analytics: StageAnalytics, key: str):
+    """ความยากรายด่าน: จำนวนครั้งจนผ่าน / เวลา / คำใบ้ / คำตอบผิดที่พบบ่อย (เลือกห้องได้)"""
+    st.markdown("## 🔬 วิเคราะห์ความยากรายด่าน")
+
+    rooms = st.multiselect("ห้อง (ว่าง = ทุกห้อง)", analytics.rooms(), key=f"{key}_analytics_rooms")
+    report = analytics.report(rooms)
+    summary = report["summary"]
+    if summary.empty:
+        st.info("ยังไม่มีข้อมูลสำหรับวิเคราะห์")
+        st.markdown("<hr/>", unsafe_allow_html=True)
+        return
+
+    table = pd.DataFrame({
+        "กลุ่มที่ลอง": summary["teams"],
+        "ผ่าน": summary["solved"],
+        "ยังติด": summary["stuck"],
+        "ครั้งจนผ่าน (มัธยฐาน)": summary["attempts_median"],
+        "ครั้งจนผ่าน (เฉลี่ย)": summary["attempts_mean"].round(1),
+        "เวลา P50": secs_to_mmss(summary["time_p50"]),
+        "เวลา P90": secs_to_mmss(summary["time_p90"]),
+        "เปิดคำใบ้ (%)": (summary["hint_rate"] * 100).round(0),
+        "ครั้งจนผ่าน (มีคำใบ้)": summary["attempts_hint"].round(1),
+        "ครั้งจนผ่าน (ไม่มีคำใบ้)": summary["attempts_no_hint"].round(1),
+        "สหสัมพันธ์ คำใบ้–ครั้ง": summary["hint_corr"].round(2),
+    })
+    table.index = [f"ด่าน {s}" for s in table.index]
+    st.dataframe(table, use_container_width=True)
+
+    stage = st.selectbox("ดูรายละเอียดด่าน", list(summary.index), format_func=lambda s: f"ด่าน {s}",
+                         key=f"{key}_analytics_stage")
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("#### จำนวนครั้งที่ตอบจนผ่าน")
+        if stage in report["attempts"].index:
+            dist = report["attempts"].loc[stage].rename("กลุ่ม").rename_axis("ครั้ง").reset_index()
+            st.bar_chart(dist, x="ครั้ง", y="กลุ่ม", sort=False)
+        else:
+            st.info("ยังไม่มีกลุ่มที่ผ่านด่านนี้")
+        if stage in report["times"].index:
+            times = report["times"].loc[stage]
+            st.caption("เวลาจนผ่าน — " + " / ".join(f"{q.upper()} {sec_to_mmss(v)}" for q, v in times.items()))
+    with c2:
+        st.markdown("#### คำตอบผิดที่พบบ่อย")
+        wrong = report["wrong"]
+        wrong = wrong[wrong["stage"] == stage]
+        if len(wrong):
+            st.dataframe(
+                pd.DataFrame({
+                    "คำตอบ": wrong["answer"],
+                    "ครั้ง": wrong["n"],
+                    "สัดส่วน (%)": (wrong["share"] * 100).round(1),
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("ยังไม่มีคำตอบผิดในด่านนี้")
+
+    st.markdown("<hr/>", unsafe_allow_html=True)
+
+@st.cache_resource
+def get_live_feed(url: str) -> LiveFeed:
+    """thread ดึงข้อมูลใหม่ตัวเดียวต่อ process ใช้ร่วมกันทุกหน้าจอ"""
+    return LiveFeed(get_sheet_loader(url), REQUIRED_STAGES, FINAL_STAGE, interval=LIVE_POLL_SEC,
+                    idle_timeout=LIVE_IDLE_SEC)
+
+@st.fragment(run_every=LIVE_REFRESH_SEC)
+def live_panel():
+    # rerun เฉพาะส่วนนี้ตามรอบ — อ่านผลสรุปแบบ incremental จาก LiveFeed (ไม่โหลด/คำนวณทั้งชีตใหม่)
+    feed = get_live_feed(DATA_SOURCE)
+    updated = datetime.fromtimestamp(feed.updated_at).strftime("%H:%M:%S") if feed.updated_at else "-"
+    st.caption(f"📡 โหมดสด (ทุกห้อง ไม่ใช้ตัวกรอง) — ข้อมูลล่าสุด {updated}")
+    if feed.last_error:
+        st.warning(f"ดึงข้อมูลใหม่ไม่สำเร็จ: {feed.last_error}")
+    data = feed.snapshot()
+    render_overview(data["kpis"], data["leader"], data["chart"], data["splits"])
+    render_analytics(feed.analytics, "live")
+
+def render_timing_panel():
+    """เวลาของแต่ละช่วงงาน (จากไฟล์ trace ของทั้ง app.py และ admin.py) + อัตราส่ง webhook สำเร็จ"""
+    st.markdown("## ⏱️ เวลาทำงานของระบบ")
+    tel = get_telemetry()
+    if not tel.enabled:
+        st.info("ยังไม่ได้เปิดการจับเวลา — รันทั้งสองแอปด้วย TELEMETRY=1")
+        return
+    if tel.trace_path is None:
+        st.dataframe(tel.stats(), use_container_width=True, hide_index=True)
+        return
+
+    minutes = st.select_slider("ช่วงเวลาล่าสุด (นาที)", [5, 15, 60, 240, 1440], value=15)
+    trace = telemetry.read_trace(tel.trace_path)
+    trace = trace[trace["ts"] >= pd.Timestamp.now() - pd.Timedelta(minutes=minutes)]
+    if trace.empty:
+        st.info("ยังไม่มีข้อมูลในช่วงเวลานี้")
+        return
+
+    st.dataframe(telemetry.trace_summary(trace).round(1), use_container_width=True, hide_index=True)
+
+    posts = trace[trace["span"] == "webhook_post"]
+    if len(posts):
+        ok = int(posts["ok"].astype(bool).sum())
+        c1, c2, c3 = st.columns(3)
+        c1.metric("ส่ง webhook สำเร็จ", f"{ok}")
+        c2.metric("ส่งไม่สำเร็จ", f"{len(posts) - ok}")
+        c3.metric("อัตราสำเร็จ", f"{ok / len(posts) * 100:.1f}%")
+
+    spans = sorted(trace["span"].unique())
+    span = st.selectbox("histogram ของ", spans)
+    hist = telemetry.latency_histogram(trace.loc[trace["span"] == span, "ms"])
+    st.bar_chart(hist, x="le_ms", y="count", x_label="ms (ขอบบน)", sort=False)
+
 # -----------------------------
 # SIDEBAR
 # -----------------------------
 with st.sidebar:
-    st.image("assets/logo_square.png", use_container_width=True)
+    st.image(get_assets().image("assets/logo_square.png"), use_container_width=True)
     st.markdown("## ⚙️ ตัวกรองข้อมูล")
 
     if st.button("🔄 รีเฟรชข้อมูลทันที"):
-        st.cache_data.clear()
-        st.rerun()
+        # โหลดใหม่ทั้งหมด: แถวที่ลบ/แก้ในชีตหายไปจากสำเนาในเครื่องด้วย
+        try:
+            get_sheet_loader(DATA_SOURCE).refresh(full=True)
+        except Exception as e:
+            st.error(f"โหลดข้อมูลใหม่ไม่สำเร็จ: {e}")
+        else:
+            load_sheet.clear()
+            st.rerun()
+
+    live_mode = st.toggle("📡 โหมดสด (สำหรับฉายขึ้นจอ)", value=False)
 
 # -----------------------------
 # LOAD DATA
 # -----------------------------
 try:
-    df = load_sheet(SHEET_CSV_URL)
+    df = load_sheet(DATA_SOURCE)
 except Exception as e:
     st.error(f"โหลดข้อมูลไม่สำเร็จ: {e}")
     st.stop()
 
 # -----------------------------
-# CLEAN / NORMALIZE
+# CLEAN / NORMALIZE (ครั้งเดียวต่อเวอร์ชันข้อมูล)
 # -----------------------------
-# columns fallback
-for col in ["group_name", "classroom", "stage", "result", "time_used", "timestamp"]:
-    if col not in df.columns:
-        df[col] = None
-
-# types
-df["stage"] = pd.to_numeric(df["stage"], errors="coerce")
-df["time_seconds"] = df["time_used"].apply(convert_time_to_seconds)
-
-if "timestamp" in df.columns:
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+dash = get_dashboard(data_version(df), df)
 
 # -----------------------------
 # FILTERS (sidebar)
@@ -108,146 +362,75 @@ with st.sidebar:
     st.caption(f"อัปเดตล่าสุด: {now_str}")
 
     # group filter
-    groups = sorted(df["group_name"].dropna().astype(str).unique().tolist())
+    groups, _, _ = dash.options()
     group_filter = st.multiselect("เลือกกลุ่ม", groups, default=groups)
-    if group_filter:
-        df = df[df["group_name"].astype(str).isin(group_filter)]
 
     # room filter
-    rooms = sorted(df["classroom"].dropna().astype(str).unique().tolist())
+    _, rooms, _ = dash.options(group_filter)
     room_filter = st.multiselect("เลือกห้อง", rooms, default=rooms)
-    if room_filter:
-        df = df[df["classroom"].astype(str).isin(room_filter)]
 
     # stage filter
-    stages = sorted(df["stage"].dropna().astype(int).unique().tolist())
+    _, _, stages = dash.options(group_filter, room_filter)
     stage_filter = st.multiselect("เลือกด่าน", stages, default=stages)
-    if stage_filter:
-        df = df[df["stage"].isin(stage_filter)]
-
-# -----------------------------
-# KPI SUMMARY (ต้องนิยามตัวแปรก่อนใช้งาน)
-# -----------------------------
-total = len(df)
-correct_n = int((df["result"] == "ถูกต้อง").sum())
-wrong_n = int((df["result"] == "ผิด").sum())
-acc = (correct_n / total * 100) if total > 0 else 0.0
 
-unique_groups = int(df["group_name"].dropna().nunique())
-unique_rooms = int(df["classroom"].dropna().nunique())
-
-# จบเกม = stage 5 ถูกต้อง + มีเวลา
-done_df = df[(df["stage"] == 5) & (df["result"] == "ถูกต้อง")].dropna(subset=["time_seconds", "group_name"])
-done_groups = int(done_df["group_name"].nunique()) if len(done_df) else 0
-avg_finish = float(done_df.groupby("group_name")["time_seconds"].min().mean()) if len(done_df) else None
+filters = filter_key(group_filter, room_filter, stage_filter)
+with get_telemetry().span("aggregate"):
+    summary = dash.summary(filters)
 
 # -----------------------------
-# KPI CARDS (แบบในภาพ)
+# OVERVIEW (ปกติ = ตามตัวกรอง / โหมดสด = ทุกห้อง อัปเดตเองเฉพาะส่วนนี้)
 # -----------------------------
-st.markdown("## 📌 ภาพรวม")
-st.markdown(
-    f"""
-    <div class="kpi-grid">
-      {kpi_html("รายการทั้งหมด", f"{total}", "Attempts (หลังกรอง)")}
-      {kpi_html("ตอบถูก", f"{correct_n}", "รวมทุกด่าน")}
-      {kpi_html("ตอบผิด", f"{wrong_n}", "รวมทุกด่าน")}
-      {kpi_html("ความถูกต้อง", f"{acc:.1f}%", "Correct / Total")}
-      {kpi_html("จำนวนกลุ่ม", f"{unique_groups}", f"จำนวนห้อง {unique_rooms}")}
-      {kpi_html("จบเกม", f"{done_groups}", f"เวลาเฉลี่ย {sec_to_mmss(avg_finish) if avg_finish else '-'}")}
-    </div>
-    """,
-    unsafe_allow_html=True
-)
-st.markdown("<hr/>", unsafe_allow_html=True)
-
-# -----------------------------
-# LEADERBOARD
-# -----------------------------
-st.markdown("## 🏆 Leaderboard (ผ่านครบทุกด่าน) — เรียงตามเวลา")
-
-# ----- เงื่อนไข: ผ่านครบทุกด่าน (1-5) -----
-REQUIRED_STAGES = {1, 2, 3, 4, 5}
-
-# เอาเฉพาะรายการที่ "ถูกต้อง" และ stage อยู่ใน 1-5
-ok = df[(df["result"] == "ถูกต้อง") & (df["stage"].isin(list(REQUIRED_STAGES)))].copy()
-
-# กันเคส stage เป็น float
-ok["stage"] = ok["stage"].astype(int)
-
-# กลุ่มที่ผ่านครบทุกด่าน = มี stage ครบ 1-5
-passed_all = (
-    ok.groupby(["group_name", "classroom"])["stage"]
-      .apply(lambda s: set(s.unique()) >= REQUIRED_STAGES)
-      .reset_index(name="passed_all")
-)
-
-passed_all = passed_all[passed_all["passed_all"] == True][["group_name", "classroom"]]
-
-# ----- เวลาอันดับ: ใช้เวลาจบเกม (stage 5 ถูกต้อง) ที่เร็วสุดของกลุ่ม -----
-finish = df[(df["stage"] == 5) & (df["result"] == "ถูกต้อง")].dropna(subset=["time_seconds"]).copy()
-
-# เวลาเร็วสุดต่อกลุ่ม/ห้อง
-best_time = (
-    finish.groupby(["group_name", "classroom"])["time_seconds"]
-          .min()
-          .reset_index()
-)
-
-# รวมเงื่อนไข "ผ่านครบทุกด่าน" + "มีเวลาจบ"
-leader = passed_all.merge(best_time, on=["group_name", "classroom"], how="inner")
-
-# เรียงตามเวลา
-leader = leader.sort_values("time_seconds", ascending=True).reset_index(drop=True)
-
-if len(leader) == 0:
-    st.info("ยังไม่พบผู้เล่นที่ผ่านครบทุกด่าน (1–5) และมีเวลาจบเกม (stage 5 ถูกต้อง)")
+if live_mode:
+    live_panel()
 else:
-    leader.insert(0, "อันดับ", leader.index + 1)
-    leader["เวลา"] = leader["time_seconds"].apply(sec_to_mmss)
-
-    # โชว์ทุกคน (ไม่จำกัด Top10)
-    st.dataframe(
-        leader[["อันดับ", "group_name", "classroom", "เวลา"]],
-        use_container_width=True,
-        hide_index=True
-    )
-
-
-# -----------------------------
-# CHARTS
-# -----------------------------
-st.markdown("## 📈 สถิติการตอบถูก/ผิดรายด่าน")
-
-if total > 0 and df["stage"].notna().any():
-    chart_data = df.groupby(["stage", "result"]).size().unstack(fill_value=0).sort_index()
-    st.bar_chart(chart_data)
-else:
-    st.info("ข้อมูลยังไม่เพียงพอสำหรับแสดงกราฟ")
-
-st.markdown("<hr/>", unsafe_allow_html=True)
+    render_overview(summary["kpis"], summary["leader"], summary["chart"], summary["splits"])
+    with get_telemetry().span("analytics"):
+        analytics = dash.analytics(filters)
+    render_analytics(analytics, "main")
 
 # -----------------------------
 # FULL TABLE
 # -----------------------------
 st.markdown("## 📋 ตารางข้อมูลทั้งหมด (หลังกรอง)")
 
-# จัดคอลัมน์ที่ควรโชว์
-show_cols = ["timestamp", "group_name", "classroom", "stage", "answer", "result", "time_used", "time_seconds"]
-for c in show_cols:
-    if c not in df.columns:
-        df[c] = None
+# แบ่งหน้าจากลำดับที่เรียงไว้แล้ว (ไม่ต้อง sort ทั้งตารางทุกครั้ง)
+c1, c2 = st.columns([1, 1])
+with c2:
+    page_size = st.selectbox("แถวต่อหน้า", [50, 100, 500, 1000], index=1)
+# นับจากจำนวนแถวจริง ไม่ใช่ kpis["total"] (ซึ่งนับคำตอบซ้ำตาม count)
+n_rows = len(dash.sorted_positions(filters))
+n_pages = max(1, -(-n_rows // page_size))
+with c1:
+    page = st.number_input(f"หน้า (ทั้งหมด {n_pages} หน้า)", min_value=1, max_value=n_pages, value=1, step=1)
 
-st.dataframe(df[show_cols].sort_values(by="timestamp", ascending=False, na_position="last"),
-            use_container_width=True)
+st.dataframe(dash.page(filters, int(page), page_size), use_container_width=True)
 
 # -----------------------------
 # DOWNLOAD
 # -----------------------------
 st.markdown("## 📥 ดาวน์โหลดข้อมูล")
-csv_bytes = df.to_csv(index=False).encode("utf-8-sig")
+EXPORT_LABELS = {"csv": "CSV", "csv.gz": "CSV (gzip)", "parquet": "Parquet"}
+export_fmt = st.radio(
+    "รูปแบบไฟล์", list(EXPORT_FORMATS), horizontal=True,
+    format_func=lambda f: EXPORT_LABELS.get(f, f)
+)
+ext, mime = EXPORT_FORMATS[export_fmt]
+
+def build_export(dash=dash, key=filters, fmt=export_fmt):
+    # สร้างไฟล์เมื่อกดดาวน์โหลดเท่านั้น (Streamlit เรียกใน thread แยก) ไม่ใช่ทุก rerun
+    with get_telemetry().span("export"):
+        return export_file(dash.filtered(key), fmt)
+
 st.download_button(
-    "ดาวน์โหลด CSV (หลังกรอง)",
-    csv_bytes,
-    file_name="escape_room_results_filtered.csv",
-    mime="text/csv"
+    f"ดาวน์โหลด {EXPORT_LABELS.get(export_fmt, export_fmt)} (หลังกรอง)",
+    build_export,
+    file_name=f"escape_room_results_filtered.{ext}",
+    mime=mime
 )
+
+# -----------------------------
+# TIMING (ซ่อนไว้ เปิดด้วย ?panel=timing)
+# -----------------------------
+if st.query_params.get("panel") == TIMING_PANEL_PARAM:
+    st.markdown("<hr/>", unsafe_allow_html=True)
+    render_timing_panel()
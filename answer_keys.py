@@ -0,0 +1,92 @@
+import hashlib
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+
+# -------------------------------------------------
+# ANSWER KEY
+# -------------------------------------------------
+AGGREGATES = ("max", "min", "sum", "mean", "median", "count")
+
+
+@dataclass(frozen=True)
+class AnswerSpec:
+    """วิธีคิดเฉลยของด่าน: ไฟล์ CSV + คอลัมน์ + ฟังก์ชันสรุป (+ groupby ถ้ามี)"""
+    file: str
+    column: str
+    aggregate: str
+    rounding: Optional[int] = None
+    tolerance: float = 0.0
+    group_by: Optional[str] = None
+    group_aggregate: str = "sum"
+
+    def __post_init__(self):
+        for agg in (self.aggregate, self.group_aggregate):
+            if agg not in AGGREGATES:
+                raise ValueError(f"aggregate ไม่รองรับ: {agg} (ใช้ได้: {', '.join(AGGREGATES)})")
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    expected: float
+    tolerance: float = 0.0
+
+    def check(self, value) -> bool:
+        # +1e-9 กันเศษทศนิยมของ float (เช่น 3.89 ที่พิมพ์เข้ามา)
+        return abs(float(value) - self.expected) <= self.tolerance + 1e-9
+
+
+def compute_answer(df: pd.DataFrame, spec: AnswerSpec) -> float:
+    values = df[spec.column]
+    if spec.group_by is not None:
+        values = df.groupby(spec.group_by)[spec.column].agg(spec.group_aggregate)
+    value = values.agg(spec.aggregate)
+    if spec.rounding is not None:
+        value = round(float(value), spec.rounding)
+    return float(value)
+
+
+def file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+# -------------------------------------------------
+# PROCESS-WIDE CACHE
+# -------------------------------------------------
+class AnswerKeyCache:
+    """
+    เก็บเฉลยของแต่ละด่านไว้ในหน่วยความจำ (ใช้ร่วมกันทุก session)
+    - อ่าน CSV + คำนวณครั้งเดียวต่อไฟล์
+    - ไฟล์ถูกแก้ (mtime/ขนาดเปลี่ยน) -> เช็ก hash ก่อน ถ้าเนื้อหาเปลี่ยนจริงค่อยคำนวณใหม่
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # spec -> (stat signature, digest, AnswerKey)
+        self._entries = {}
+
+    def get(self, spec: AnswerSpec) -> AnswerKey:
+        path = Path(spec.file)
+        st_ = path.stat()
+        signature = (st_.st_mtime_ns, st_.st_size)
+
+        with self._lock:
+            entry = self._entries.get(spec)
+            if entry is not None and entry[0] == signature:
+                return entry[2]
+
+            digest = file_digest(path)
+            if entry is not None and entry[1] == digest:
+                key = entry[2]
+            else:
+                key = AnswerKey(compute_answer(pd.read_csv(path), spec), spec.tolerance)
+            self._entries[spec] = (signature, digest, key)
+            return key
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -1,10 +1,26 @@
 import streamlit as st
-import pandas as pd
-import requests
+import asyncio
+import hashlib
+import math
+import os
 import time
+import uuid
 from pathlib import Path
-import base64
 import streamlit.components.v1 as components
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from asset_registry import AssetRegistry
+from attempt_guard import AttemptLimiter
+from attempt_journal import AttemptJournal
+from attempt_logger import AttemptLogger
+from answer_keys import AnswerKeyCache
+from datasets import DatasetFactory
+from image_assets import ImageVariants, default_plan
+from session_record import IdleSessionReaper, SessionCheckpoints, SessionRecord
+from sound_assets import SoundBank
+from state_backend import open_backend
+from stages import FINAL_STAGE, STAGE_BY_NUMBER, SUMMARY_STAGE, TOTAL_STAGES, Stage
+import telemetry
 
 st.set_page_config(
     page_title="DATA Escape Room",
@@ -12,81 +28,252 @@ st.set_page_config(
     layout="centered"
 )
 
-# -------------------------------------------------
-# LOAD CSS
-# -------------------------------------------------
-with open("style.css", "r", encoding="utf-8") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
 # -------------------------------------------------
 # CONFIG
 # -------------------------------------------------
-WEBHOOK_URL = "https://script.google.com/macros/s/AKfycbwGUE2ANKAkwQcu9ltUpy5MXhPtBtZyY6OXHdruocyvq2yvol1nkqZd6dPYD3kezkjZ/exec"
+WEBHOOK_URL = os.environ.get(
+    "WEBHOOK_URL",
+    "https://script.google.com/macros/s/AKfycbwGUE2ANKAkwQcu9ltUpy5MXhPtBtZyY6OXHdruocyvq2yvol1nkqZd6dPYD3kezkjZ/exec"
+)
+
+# ถ้ารัน results_service ในเครื่อง ให้ส่งผลไปที่นั่นแทนชีต (เช่น http://localhost:8600)
+RESULTS_API_URL = os.environ.get("RESULTS_API_URL", "").rstrip("/")
+ATTEMPT_ENDPOINT = f"{RESULTS_API_URL}/attempts" if RESULTS_API_URL else WEBHOOK_URL
 
 ASSETS = Path("assets")
 SFX_SUCCESS = str(ASSETS / "sfx_success.mp3")
 SFX_FAIL = str(ASSETS / "sfx_fail.mp3")
+CSS_PATH = Path("style.css")
+
+# ไฟล์ CSV ของแต่ละด่าน: "shared" = ทุกกลุ่มใช้ไฟล์เดียวกัน / "group" = สุ่มชุดข้อมูลเฉพาะกลุ่ม+ห้อง
+DATASET_MODE = os.environ.get("DATASET_MODE", "shared").lower()
+# จำนวนแถวของชุดข้อมูลเฉพาะกลุ่ม (ว่าง = เท่าไฟล์ต้นฉบับ) เช่น 100000
+DATASET_ROWS = int(os.environ.get("DATASET_ROWS") or 0) or None
+# ขนาด CSV เฉพาะกลุ่มที่จำไว้ในหน่วยความจำรวมกันไม่เกิน (MB) — เกินแล้วลบชุดที่ไม่ได้ใช้นานที่สุด
+DATASET_CACHE_MB = int(os.environ.get("DATASET_CACHE_MB", 128))
+
+# โหมดพัฒนา: โหลด CSS/CSV/รูปใหม่อัตโนมัติเมื่อไฟล์เปลี่ยน (ปกติอ่านครั้งเดียวต่อ process)
+ASSETS_WATCH = os.environ.get("ASSETS_WATCH", "").lower() in ("1", "true", "yes", "on")
+
+# journal ในเครื่อง: บันทึกผลก่อน แล้วค่อยทยอยส่งขึ้นชีต
+JOURNAL_PATH = Path(os.environ.get("ATTEMPT_JOURNAL_PATH", Path("data") / "attempts.db"))
+
+# จำกัดความถี่การตรวจคำตอบต่อทีม/ด่าน (ATTEMPT_RATE_LIMIT=0 = ไม่จำกัด)
+ATTEMPT_RATE_LIMIT = os.environ.get("ATTEMPT_RATE_LIMIT", "1").lower() not in ("0", "false", "no", "off")
+# คำตอบผิดพักไว้กี่วินาทีก่อนส่งขึ้นชีต ตอบผิดซ้ำเดิมระหว่างนั้นส่งเป็นแถวเดียว (0 = ส่งทันที แถวละครั้ง)
+# journal บันทึกทุกครั้งเสมอ
+ATTEMPT_COALESCE_WINDOW = float(os.environ.get("ATTEMPT_COALESCE_WINDOW", 10))
+
+# ที่เก็บความคืบหน้าของผู้เล่น (ใช้ร่วมกันทุก process/เครื่อง)
+# ว่าง = SQLite ที่ STATE_DB_PATH (เครื่องเดียว แยกจากไฟล์ journal), "sqlite:///path" หรือ "redis://host:6379/0" (หลายเครื่อง)
+# "memory://" = ในหน่วยความจำของ process นี้ (ทดสอบ / ไม่ต้องเล่นต่อหลังรีสตาร์ต)
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "")
+STATE_DB_PATH = Path(os.environ.get("STATE_DB_PATH", Path("data") / "state.db"))
+STATE_PREFIX = os.environ.get("STATE_PREFIX", "escape:")
+
+# ปิด session ที่ไม่มีการใช้งานเกินกี่วินาทีและแท็บปิดไปแล้ว (0 = ไม่ปิด) — เล่นต่อได้จาก checkpoint
+SESSION_IDLE_TIMEOUT = float(os.environ.get("SESSION_IDLE_TIMEOUT", 30 * 60))
+# checkpoint ที่ไม่ได้อัปเดตนานกว่านี้ (วินาที) หมดอายุ
+CHECKPOINT_MAX_AGE = 24 * 3600
+
+# ช่องเขียนโค้ด pandas ในแต่ละด่าน (CODE_CELL=1 = เปิด) รันด้วย Pyodide ในเบราว์เซอร์ของผู้เล่นเอง
+# เซิร์ฟเวอร์ไม่รันโค้ดของผู้เล่น — ได้รับแค่ตัวเลขคำตอบมาตรวจเหมือนช่องกรอกคำตอบ
+CODE_CELL = os.environ.get("CODE_CELL", "").lower() in ("1", "true", "yes", "on")
+# เวลาสูงสุดต่อการรันหนึ่งครั้ง (วินาที) เกินแล้วเบราว์เซอร์หยุดตัวรันแล้วเริ่มใหม่
+CODE_TIMEOUT = float(os.environ.get("CODE_TIMEOUT", 10))
+# ที่อยู่ไฟล์ Pyodide ที่เบราว์เซอร์โหลด (เปลี่ยนเป็น mirror ในเครือข่ายโรงเรียนได้ ต้องลงท้ายด้วย /)
+PYODIDE_URL = os.environ.get("PYODIDE_URL", "https://cdn.jsdelivr.net/pyodide/v0.27.2/full/")
+
+# ความถี่ที่เบราว์เซอร์เช็กว่าถึงเวลาเปลี่ยนด่านหรือยัง (วินาที)
+TRANSITION_TICK_SEC = 0.3
+
+# component ช่องเขียนโค้ด (pandas_cell/index.html) — คืน {"answer": ตัวเลข, "nonce": ...} เมื่อกดส่งคำตอบ
+pandas_cell = components.declare_component("pandas_cell", path=str(Path(__file__).resolve().parent / "pandas_cell"))
 
 
 # -------------------------------------------------
 # HELPERS
 # -------------------------------------------------
+@st.cache_resource
+def get_telemetry() -> telemetry.Telemetry:
+    """จับเวลาช่วงงานสำคัญ (เปิดด้วย TELEMETRY=1 ดู telemetry.from_env)"""
+    return telemetry.from_env("app")
+
+
 def format_time(sec: int) -> str:
     m = sec // 60
     s = sec % 60
     return f"{m} นาที {s} วินาที"
 
 
+@st.cache_resource
+def get_sound_bank() -> SoundBank:
+    """เสียงทุกไฟล์เตรียมครั้งเดียวต่อ process ใช้ร่วมกันทุก session"""
+    return SoundBank(
+        [SFX_SUCCESS, SFX_FAIL],
+        use_static=bool(st.get_option("server.enableStaticServing")),
+    )
+
+
+@st.cache_resource
+def get_image_variants() -> ImageVariants:
+    """รูปย่อ (WebP) สร้างครั้งเดียวต่อ process — สร้างล่วงหน้าตั้งแต่เริ่ม"""
+    variants = ImageVariants()
+    variants.prebuild(default_plan(ASSETS))
+    return variants
+
+
+@st.cache_resource
+def get_assets() -> AssetRegistry:
+    """CSS / CSV / รูป อ่านจากดิสก์ครั้งเดียวต่อ process ใช้ร่วมกันทุก session"""
+    return AssetRegistry(watch=ASSETS_WATCH, image_variants=get_image_variants())
+
+
+def image_variant(path, variant: str = None) -> bytes:
+    with get_telemetry().span("image_render"):
+        return get_assets().image(path, variant)
+
+
 def play_sound_autoplay(path_str: str):
     """
     เล่นเสียงแบบ autoplay โดยไม่แสดงแถบ player
     path_str รับเป็น string ได้เลย เช่น "assets/sfx_success.mp3"
     """
-    path = Path(path_str)
-    if not path.exists():
+    html = get_sound_bank().html(path_str)
+    if html is None:
         st.warning(f"ไม่พบไฟล์เสียง: {path_str}")
         return
-
-    b64 = base64.b64encode(path.read_bytes()).decode("utf-8")
-    html = f"""
-    <audio autoplay>
-        <source src="data:audio/mp3;base64,{b64}" type="audio/mp3">
-    </audio>
-    """
     components.html(html, height=0)
 
 
-def download_csv_button(path: str, label: str):
-    p = Path(path)
-    if p.exists():
+@st.cache_resource
+def get_dataset_factory() -> DatasetFactory:
+    """ชุดข้อมูลเฉพาะกลุ่ม + เฉลย จำไว้ร่วมกันทุก session"""
+    return DatasetFactory(rows=DATASET_ROWS, max_bytes=DATASET_CACHE_MB * 2**20)
+
+
+def per_group_datasets() -> bool:
+    return DATASET_MODE == "group"
+
+
+def group_dataset(stage: Stage):
+    return get_dataset_factory().get(stage, st.session_state.rec.group_name, st.session_state.rec.room)
+
+
+def stage_csv(stage: Stage):
+    """(bytes, ชื่อไฟล์) ของ CSV ด่านนี้ที่กลุ่มนี้ได้ — bytes เป็น None ถ้าไม่พบไฟล์"""
+    if per_group_datasets():
+        factory, rec = get_dataset_factory(), st.session_state.rec
+        with get_telemetry().span("csv_load"):
+            data = group_dataset(stage).csv
+        # สร้างข้อมูลด่านถัดไปไว้ระหว่างที่กลุ่มยังทำด่านนี้ — เปิดด่านใหม่จะไม่ต้องรอสร้าง CSV
+        if stage.number + 1 in STAGE_BY_NUMBER:
+            factory.prefetch(STAGE_BY_NUMBER[stage.number + 1], rec.group_name, rec.room)
+        return data, factory.file_name(stage, rec.group_name)
+    p = Path(stage.file)
+    with get_telemetry().span("csv_load"):
+        return get_assets().bytes(p), p.name
+
+
+def download_csv_button(stage: Stage, label: str):
+    data, file_name = stage_csv(stage)
+    if data is not None:
         st.download_button(
             label=label,
-            data=p.read_bytes(),
-            file_name=p.name,
+            data=data,
+            file_name=file_name,
             mime="text/csv"
         )
     else:
-        st.warning(f"ไม่พบไฟล์สำหรับดาวน์โหลด: {path}")
+        st.warning(f"ไม่พบไฟล์สำหรับดาวน์โหลด: {stage.file}")
+
+
+@st.cache_resource
+def get_answer_key_cache() -> AnswerKeyCache:
+    """แคชเฉลยตัวเดียวต่อ process ใช้ร่วมกันทุก session"""
+    return AnswerKeyCache()
+
 
+def get_answer_key(stage: int):
+    if per_group_datasets():
+        return group_dataset(STAGE_BY_NUMBER[stage]).answer
+    return get_answer_key_cache().get(STAGE_BY_NUMBER[stage].answer_spec)
 
-def log_to_sheet(group, room, stage, answer, result, time_used=""):
+
+@st.cache_resource
+def get_attempt_logger() -> AttemptLogger:
+    """logger ตัวเดียวต่อ process ใช้ร่วมกันทุก session"""
+    return AttemptLogger(ATTEMPT_ENDPOINT, AttemptJournal(JOURNAL_PATH),
+                         coalesce_window=ATTEMPT_COALESCE_WINDOW, telemetry=get_telemetry())
+
+
+@st.cache_resource
+def get_attempt_limiter():
+    """ตัวจำกัดความถี่ตัวเดียวต่อ process (นับรวมทุกแท็บของทีมเดียวกัน)"""
+    return AttemptLimiter() if ATTEMPT_RATE_LIMIT else None
+
+
+def log_to_sheet(group, room, stage, answer, result, time_used="", time_seconds=None,
+                 stage_seconds=None, elapsed_seconds=None, hints_used=False):
+    """
+    บันทึกผลการตอบลง journal แล้วทยอยส่งไปชีตเบื้องหลัง (ไม่รอ webhook)
+    time_seconds = เวลาเป็นวินาที (ตัวเลข) คู่กับ time_used ที่เป็นข้อความภาษาไทย
+    stage_seconds = เวลาในด่านนี้ (ตอบถูก = เวลาของด่าน), elapsed_seconds = เวลารวมถึงตอนนี้
+    hints_used = 1 ถ้าเปิดคำใบ้ของด่านนี้แล้ว
+    คำตอบผิดซ้ำเดิมติด ๆ ถูกรวมเป็นแถวเดียว (count) ตอนส่งจาก journal
+    """
     payload = {
         "group_name": group,
         "classroom": room,
         "stage": int(stage),
         "answer": answer,
         "result": result,
-        "time_used": time_used
+        "time_used": time_used,
+        "time_seconds": "" if time_seconds is None else int(time_seconds),
+        "stage_seconds": "" if stage_seconds is None else round(stage_seconds, 2),
+        "elapsed_seconds": "" if elapsed_seconds is None else round(elapsed_seconds, 2),
+        "hints_used": int(bool(hints_used)),
+        "count": 1,
     }
-    try:
-        r = requests.post(WEBHOOK_URL, json=payload, timeout=10)
-        if r.status_code != 200:
-            st.error(f"บันทึกลงชีตไม่สำเร็จ (HTTP {r.status_code}) : {r.text[:200]}")
+    get_attempt_logger().log(payload)
+
+
+@st.cache_resource
+def get_checkpoints() -> SessionCheckpoints:
+    """ความคืบหน้าของทุก session/ทีม ใน state backend ใช้กลับมาเล่นต่อ"""
+    backend = open_backend(STATE_BACKEND, STATE_DB_PATH, prefix=STATE_PREFIX)
+    return SessionCheckpoints(backend, ttl=CHECKPOINT_MAX_AGE)
+
+
+def save_progress():
+    get_checkpoints().save(st.session_state.rec)
+
+
+def close_session(session_id: str) -> bool:
+    """
+    ปิด session ที่ client หลุดไปแล้ว (websocket ปิด) — คืน False ถ้ายังเชื่อมต่ออยู่ (ไม่ปิด)
+    ปิด session ที่แท็บยังเปิดอยู่ไม่ได้: Streamlit จะทิ้งข้อความจากแท็บนั้นเงียบ ๆ หน้าเกมค้าง
+    """
+    from streamlit import runtime
+    rt = runtime.get_instance()
+
+    async def close_if_disconnected() -> bool:
+        # Runtime.close_session ต้องเรียกบน event loop ของ server (API ภายในของ Streamlit)
+        if rt.is_active_session(session_id):
             return False
+        rt.close_session(session_id)
         return True
-    except Exception as e:
-        st.error(f"บันทึกลงชีตไม่สำเร็จ: {e}")
-        return False
+
+    loop = rt._get_async_objs().eventloop
+    return asyncio.run_coroutine_threadsafe(close_if_disconnected(), loop).result(timeout=10)
+
+
+@st.cache_resource
+def get_session_reaper():
+    """ตัวปิด session ที่ไม่ได้ใช้งาน (หนึ่งตัวต่อ process)"""
+    if SESSION_IDLE_TIMEOUT <= 0:
+        return None
+    return IdleSessionReaper(SESSION_IDLE_TIMEOUT, close_session)
 
 
 def reset_answer(stage: int):
@@ -94,7 +281,7 @@ def reset_answer(stage: int):
 
 
 def unlock_badge(stage: int):
-    st.session_state.badges.add(stage)
+    st.session_state.rec.add_badge(stage)
 
 
 def stage_card(title: str, mission_html: str, image_file: str):
@@ -106,101 +293,247 @@ def stage_card(title: str, mission_html: str, image_file: str):
     """, unsafe_allow_html=True)
 
     img_path = ASSETS / image_file
-    if img_path.exists():
-        st.image(str(img_path), use_container_width=True)
+    if get_assets().exists(img_path):
+        st.image(image_variant(img_path, "content"), use_container_width=True)
     else:
         st.warning(f"ไม่พบรูป: assets/{image_file}")
 
 
 def auto_next_stage(next_stage: int, delay_sec: float = 1.2):
     """
-    ไปด่านถัดไปอัตโนมัติหลังหน่วงเวลา
-    (ให้เสียงเริ่มเล่น + ให้ balloons แสดงก่อน)
+    ตั้งเวลาไปด่านถัดไปอัตโนมัติ (ให้เสียงเริ่มเล่น + ให้ balloons แสดงก่อน)
+    ไม่ sleep บนเซิร์ฟเวอร์ — เบราว์เซอร์จะเรียก transition_timer ซ้ำจนครบเวลา
     """
-    time.sleep(delay_sec)
+    rec = st.session_state.rec
+    rec.pending_stage = next_stage
+    rec.pending_due = time.monotonic() + delay_sec
+    save_progress()
+
+
+def apply_pending_transition() -> bool:
+    """ไปด่านที่ตั้งเวลาไว้ ถ้าครบเวลาแล้ว"""
+    rec = st.session_state.rec
+    next_stage = rec.pending_stage
+    if next_stage is None or time.monotonic() < rec.pending_due:
+        return False
+    reset_answer(rec.stage)
     reset_answer(next_stage)
-    st.session_state.stage = next_stage
-    st.rerun()
+    rec.pending_stage = None
+    rec.stage = next_stage
+    if next_stage in STAGE_BY_NUMBER:
+        rec.start_clock(time.monotonic())
+    return True
 
 
-HINTS = {
-    1: "ใบ้: ดูคอลัมน์ <b>Sales</b> แล้วหา “ค่ามากที่สุด” (max).",
-    2: "ใบ้: ดูคอลัมน์ <b>ExerciseMinutes</b> แล้วหา “ค่าน้อยที่สุด” (min).",
-    3: "ใบ้: ดูคอลัมน์ <b>Units</b> แล้วหา “ค่ามากที่สุด” (max).",
-    4: "ใบ้: ดูคอลัมน์ <b>Visitors</b> แล้วหา “หาผลรวม” (sum).",
-    5: "ใบ้: ดูคอลัมน์ <b>HoursUsed</b> แล้วหา “ค่าเฉลี่ย” และปัดทศนิยม 2 ตำแหน่ง (mean + round).",
-}
+@st.fragment(run_every=TRANSITION_TICK_SEC)
+def transition_timer():
+    # rerun เฉพาะ fragment นี้ (ฝั่ง client ตั้งเวลา) จนครบเวลาแล้วค่อย rerun ทั้งหน้า
+    if apply_pending_transition():
+        st.rerun()
 
 
 def hint_block(stage: int):
     c1, c2 = st.columns([1, 3])
     with c1:
         if st.button("💡 ขอใบ้", key=f"hint_btn_{stage}"):
-            st.session_state.hints_used.add(stage)
+            st.session_state.rec.add_hint(stage)
+            save_progress()
     with c2:
-        if stage in st.session_state.hints_used:
-            st.info(HINTS.get(stage, ""))
+        if st.session_state.rec.has_hint(stage):
+            st.info(STAGE_BY_NUMBER[stage].hint)
+
+
+def check_answer(stage: Stage, user):
+    """ตรวจคำตอบกับเฉลย บันทึกผล และตั้งเวลาไปด่านถัดไปถ้าถูก (ทั้งช่องกรอกคำตอบและช่องโค้ด)"""
+    n = stage.number
+    is_final = n == FINAL_STAGE
+    rec = st.session_state.rec
+
+    limiter = get_attempt_limiter()
+    wait = limiter.acquire(rec.group_name, rec.room, n) if limiter is not None else 0.0
+    if wait > 0:
+        st.warning(f"⏳ ตอบถี่เกินไป รออีก {math.ceil(wait)} วินาที แล้วลองใหม่")
+        return
+
+    mono = time.monotonic()
+    with get_telemetry().span("answer_check"):
+        result = "ถูกต้อง" if get_answer_key(n).check(user) else "ผิด"
+
+    # เวลาจากนาฬิกา monotonic ของเซิร์ฟเวอร์ (ตอบถูก = หยุดนาฬิกาของด่านนี้)
+    stage_sec = rec.split(mono) if result == "ถูกต้อง" else rec.stage_seconds(mono)
+    elapsed = rec.total_seconds(mono)
+
+    # ด่านสุดท้ายส่งเวลารวมไปด้วย
+    formatted = ""
+    total_sec = None
+    if is_final:
+        total_sec = int(round(elapsed))
+        formatted = format_time(total_sec)
+
+    log_to_sheet(rec.group_name, rec.room, n, user, result, formatted, total_sec,
+                 stage_seconds=stage_sec, elapsed_seconds=elapsed, hints_used=rec.has_hint(n))
+    repeated = result == "ผิด" and st.session_state.get(f"last_wrong_{n}") == user
+    st.session_state[f"last_wrong_{n}"] = user if result == "ผิด" else None
+
+    if result == "ถูกต้อง":
+        unlock_badge(n)
+        play_sound_autoplay(SFX_SUCCESS)
+        if is_final:
+            st.success("🎉 ถูกต้อง! ผ่านครบทุกด่านแล้ว 🎉 กำลังไปหน้าสรุป…")
+            st.balloons()
+
+            # บันทึกเวลาจบเกม
+            rec.completed_seconds = total_sec
+            rec.completed_time = formatted
+            rec.game_completed = True
+
+            auto_next_stage(SUMMARY_STAGE, delay_sec=1.3)
+        else:
+            st.success("🎉 ถูกต้อง! กำลังไปด่านถัดไป…")
+            st.balloons()
+            auto_next_stage(n + 1, delay_sec=1.2)
+    else:
+        # คำตอบเดิมซ้ำ: ไม่เล่นเสียงซ้ำ
+        if not repeated:
+            play_sound_autoplay(SFX_FAIL)
+        st.error("❌ คำตอบผิด ลองใหม่อีกครั้ง")
+
+
+def code_cell(stage: Stage):
+    """
+    ช่องเขียนโค้ด pandas (pandas_cell/): รันในเบราว์เซอร์กับ CSV ชุดเดียวกับที่ดาวน์โหลด
+    กดส่งคำตอบแล้วตรวจที่นี่ด้วย check_answer เหมือนช่องกรอกคำตอบ
+    """
+    n = stage.number
+    with st.expander("🐍 เขียนโค้ด pandas หาคำตอบ (ไม่ต้องเปิด Colab)"):
+        data, _ = stage_csv(stage)
+        if data is None:
+            st.warning(f"ไม่พบไฟล์ของด่านนี้: {stage.file}")
+            return
+        st.caption("โค้ดรันในเบราว์เซอร์ของเรา — ข้อมูลของด่านนี้อยู่ในตัวแปร df (มี pd, np ให้แล้ว) "
+                   "บรรทัดสุดท้าย หรือตัวแปร answer คือคำตอบ (Ctrl+Enter = รัน)")
+        sent = pandas_cell(
+            csv=data,
+            data_key=hashlib.blake2b(data, digest_size=8).hexdigest(),
+            stage=n,
+            initial_code="df.head()",
+            pyodide_url=PYODIDE_URL,
+            timeout_ms=int(CODE_TIMEOUT * 1000),
+            key=f"pandas_cell_{n}",
+            default=None,
+        )
+
+    # ค่าของ component ค้างอยู่ทุก rerun — ตรวจเฉพาะการกดส่งครั้งใหม่ (nonce ที่ยังไม่เคยเห็น)
+    if not isinstance(sent, dict) or sent.get("nonce") == st.session_state.get(f"code_nonce_{n}"):
+        return
+    st.session_state[f"code_nonce_{n}"] = sent.get("nonce")
+    answer = sent.get("answer")
+    if isinstance(answer, bool) or not isinstance(answer, (int, float)) or not math.isfinite(answer):
+        st.warning("คำตอบจากช่องโค้ดต้องเป็นตัวเลข")
+        return
+    if isinstance(answer, float) and answer.is_integer():
+        answer = int(answer)
+    check_answer(stage, answer)
+
+
+def render_stage(stage: Stage):
+    """วาดหน้าด่านจากข้อมูลใน STAGES (ใช้กับทุกด่าน)"""
+    n = stage.number
+
+    stage_card(stage.title, stage.mission_html, stage.image)
+    hint_block(n)
+
+    with st.expander("📁 ดาวน์โหลดไฟล์ CSV ของด่านนี้"):
+        download_csv_button(stage, f"📥 ดาวน์โหลดไฟล์ด่านที่ {n}")
+
+    if stage.input_format:
+        user = st.number_input(stage.input_label, format=stage.input_format, key=f"answer_{n}")
+    else:
+        user = st.number_input(stage.input_label, step=1, key=f"answer_{n}")
+
+    if st.button("ตรวจคำตอบ", key=f"check_{n}"):
+        check_answer(stage, user)
+
+    if CODE_CELL:
+        code_cell(stage)
 
 
 def summary_page():
-    st.markdown("""
+    rec = st.session_state.rec
+    st.markdown(f"""
     <div class="game-card">
         <h2>🏁 สรุปผลการเล่น (Mission Complete)</h2>
-        <p>สุดยอด! ผ่านครบทั้ง 5 ด่านแล้ว 🎉</p>
+        <p>สุดยอด! ผ่านครบทั้ง {TOTAL_STAGES} ด่านแล้ว 🎉</p>
     </div>
     """, unsafe_allow_html=True)
 
     st.markdown("### 🧑‍🤝‍🧑 ข้อมูลทีม")
-    st.write(f"**ชื่อกลุ่ม:** {st.session_state.group_name}")
-    st.write(f"**ห้อง:** {st.session_state.room}")
-    st.write(f"**เวลาที่ใช้:** {st.session_state.completed_time}")
+    st.write(f"**ชื่อกลุ่ม:** {rec.group_name}")
+    st.write(f"**ห้อง:** {rec.room}")
+    st.write(f"**เวลาที่ใช้:** {rec.completed_time}")
+    if rec.splits:
+        st.caption(" · ".join(f"ด่าน {i}: {format_time(int(round(s)))}" for i, s in enumerate(rec.splits, 1)))
 
     st.markdown("### 🏆 เหรียญรางวัลที่ได้รับ")
-    cols = st.columns(5)
-    for i in range(1, 6):
+    cols = st.columns(TOTAL_STAGES)
+    for i in range(1, TOTAL_STAGES + 1):
         with cols[i - 1]:
             badge_path = ASSETS / f"badge{i}.png"
-            if i in st.session_state.badges and badge_path.exists():
-                st.image(str(badge_path), use_container_width=True)
+            if rec.has_badge(i) and get_assets().exists(badge_path):
+                st.image(image_variant(badge_path, "thumb"), use_container_width=True)
             else:
                 st.caption(f"ด่าน {i}")
 
     st.markdown("---")
 
     if st.button("🔄 เล่นใหม่อีกครั้ง"):
-        st.session_state.stage = 0
-        st.session_state.start_time = None
-        st.session_state.game_completed = False
-        st.session_state.completed_time = ""
-        st.session_state.completed_seconds = 0
-        st.session_state.badges = set()
-        st.session_state.hints_used = set()
-        for i in range(1, 6):
+        rec.reset()
+        get_checkpoints().delete(rec.group_name, rec.room)
+        save_progress()
+        for i in range(1, TOTAL_STAGES + 1):
             reset_answer(i)
         st.rerun()
 
 
+# -------------------------------------------------
+# LOAD CSS
+# -------------------------------------------------
+st.markdown(f"<style>{get_assets().text(CSS_PATH) or ''}</style>", unsafe_allow_html=True)
+
+
 # -------------------------------------------------
 # SESSION STATE
 # -------------------------------------------------
-if "stage" not in st.session_state:
-    st.session_state.stage = 0
-if "group_name" not in st.session_state:
-    st.session_state.group_name = ""
-if "room" not in st.session_state:
-    st.session_state.room = ""
-if "start_time" not in st.session_state:
-    st.session_state.start_time = None
-if "game_completed" not in st.session_state:
-    st.session_state.game_completed = False
-if "completed_time" not in st.session_state:
-    st.session_state.completed_time = ""
-if "completed_seconds" not in st.session_state:
-    st.session_state.completed_seconds = 0
-if "badges" not in st.session_state:
-    st.session_state.badges = set()
-if "hints_used" not in st.session_state:
-    st.session_state.hints_used = set()
+def restore_session() -> SessionRecord:
+    """
+    session ใหม่: ถ้า URL มี ?sid= ให้โหลดสถานะเดิมจาก state backend
+    (รีเฟรช / websocket ต่อใหม่ไปเจออีกเครื่อง / เซิร์ฟเวอร์รีสตาร์ต) ไม่งั้นสร้าง sid ใหม่ใส่ใน URL
+    """
+    sid = st.query_params.get("sid", "")
+    if sid.isalnum() and len(sid) <= 64:
+        saved = get_checkpoints().load_session(sid)
+        if saved is not None:
+            saved.sid = sid
+            if 1 <= saved.stage <= FINAL_STAGE:
+                st.toast(f"กลับมาเล่นต่อที่ด่าน {saved.stage}")
+            return saved
+    else:
+        sid = uuid.uuid4().hex
+        st.query_params["sid"] = sid
+    return SessionRecord(sid=sid)
+
+
+if "rec" not in st.session_state:
+    st.session_state.rec = restore_session()
+rec = st.session_state.rec
+
+reaper = get_session_reaper()
+ctx = get_script_run_ctx()
+if reaper is not None and ctx is not None:
+    reaper.touch(ctx.session_id)
+
+# ครบเวลาเปลี่ยนด่านระหว่างที่มีการกดอย่างอื่น -> ไปด่านถัดไปเลย
+apply_pending_transition()
 
 
 # -------------------------------------------------
@@ -208,40 +541,40 @@ if "hints_used" not in st.session_state:
 # -------------------------------------------------
 with st.sidebar:
     logo_sq = ASSETS / "logo_square.png"
-    if logo_sq.exists():
-        st.image(str(logo_sq), use_container_width=True)
+    if get_assets().exists(logo_sq):
+        st.image(image_variant(logo_sq), use_container_width=True)
 
     st.markdown("## 🧑‍🤝‍🧑 ทีมผู้เล่น")
-    st.write(f"**กลุ่ม:** {st.session_state.group_name or '-'}")
-    st.write(f"**ห้อง:** {st.session_state.room or '-'}")
+    st.write(f"**กลุ่ม:** {rec.group_name or '-'}")
+    st.write(f"**ห้อง:** {rec.room or '-'}")
 
-    if st.session_state.stage >= 1 and st.session_state.stage <= 5:
+    if rec.stage >= 1 and rec.stage <= TOTAL_STAGES:
         st.progress(
-            (st.session_state.stage - 1) / 5,
-            text=f"ความคืบหน้า {st.session_state.stage-1}/5 ด่าน"
+            (rec.stage - 1) / TOTAL_STAGES,
+            text=f"ความคืบหน้า {rec.stage-1}/{TOTAL_STAGES} ด่าน"
         )
 
     st.markdown("## 🏆 เหรียญที่ได้รับ")
-    cols = st.columns(5)
-    for i in range(1, 6):
+    cols = st.columns(TOTAL_STAGES)
+    for i in range(1, TOTAL_STAGES + 1):
         with cols[i - 1]:
             badge_path = ASSETS / f"badge{i}.png"
-            if i in st.session_state.badges and badge_path.exists():
-                st.image(str(badge_path), use_container_width=True)
+            if rec.has_badge(i) and get_assets().exists(badge_path):
+                st.image(image_variant(badge_path, "thumb"), use_container_width=True)
             else:
                 st.caption(str(i))
 
     mascot = ASSETS / "mascot.png"
-    if mascot.exists():
-        st.image(str(mascot), use_container_width=True)
+    if get_assets().exists(mascot):
+        st.image(image_variant(mascot, "sidebar"), use_container_width=True)
 
 
 # -------------------------------------------------
 # HEADER
 # -------------------------------------------------
 logo = ASSETS / "logo.png"
-if logo.exists():
-    st.image(str(logo), use_container_width=True)
+if get_assets().exists(logo):
+    st.image(image_variant(logo), use_container_width=True)
 
 st.markdown(
     '<p style="text-align:center; opacity:0.9;">เกมฝึกวิเคราะห์ข้อมูล CSV สำหรับนักเรียน ม.3</p>',
@@ -252,12 +585,12 @@ st.markdown(
 # -------------------------------------------------
 # PAGE 0 — INPUT INFO
 # -------------------------------------------------
-if st.session_state.stage == 0:
-    st.markdown("""
+if rec.stage == 0:
+    st.markdown(f"""
     <div class="game-card">
         <h3>🎮 คำชี้แจง </h3>
         <ul>
-            <li>กิจกรรมนี้เป็นเกม “Data Escape Room” ฝึกวิเคราะห์ข้อมูลจากไฟล์ CSV จำนวน 5 ด่าน</li>
+            <li>กิจกรรมนี้เป็นเกม “Data Escape Room” ฝึกวิเคราะห์ข้อมูลจากไฟล์ CSV จำนวน {TOTAL_STAGES} ด่าน</li>
             <li>โดยใช้ Python (Pandas) เพื่อหาคำตอบและถอดรหัส เมื่อกรอกคำตอบถูกต้องจะได้รับเหรียญและปลดล็อกด่านถัดไป</li>
             <li>-กรุณากรอก “ชื่อกลุ่ม” และ “ห้องเรียน” ให้ครบก่อนเริ่มเกม </li>
             <li>-เมื่อเริ่มเกมระบบจะจับเวลาอัตโนมัติและบันทึกผลเพื่อแสดงใน Leaderboard </li>
@@ -269,220 +602,44 @@ if st.session_state.stage == 0:
     """, unsafe_allow_html=True)
 
     st.markdown("### 🧩 กรุณากรอกข้อมูลก่อนเริ่มเกม")
-    st.session_state.group_name = st.text_input("ชื่อกลุ่ม", value=st.session_state.group_name)
-    st.session_state.room = st.text_input("ห้องเรียน เช่น ม.3/1", value=st.session_state.room)
+    rec.group_name = st.text_input("ชื่อกลุ่ม", value=rec.group_name)
+    rec.room = st.text_input("ห้องเรียน เช่น ม.3/1", value=rec.room)
 
     if st.button("เริ่มเกม →"):
-        if st.session_state.group_name.strip() == "" or st.session_state.room.strip() == "":
+        if rec.group_name.strip() == "" or rec.room.strip() == "":
             st.warning("กรุณากรอกชื่อกลุ่มและห้องเรียนก่อน!")
         else:
-            st.session_state.start_time = time.time()
-            st.session_state.stage = 1
-            st.session_state.game_completed = False
-            st.session_state.completed_time = ""
-            st.session_state.completed_seconds = 0
-            st.session_state.badges = set()
-            st.session_state.hints_used = set()
-            for i in range(1, 6):
+            # ทีมเดิมที่ยังเล่นไม่จบ (session หาย/ถูกปิด) -> เล่นต่อจากด่านเดิม เวลาเดินต่อ
+            saved = get_checkpoints().load(rec.group_name, rec.room)
+            if saved is not None and 1 <= saved.stage <= FINAL_STAGE and not saved.game_completed:
+                saved.group_name, saved.room, saved.sid = rec.group_name, rec.room, rec.sid
+                st.session_state.rec = saved
+                save_progress()
+                st.toast(f"กลับมาเล่นต่อที่ด่าน {saved.stage}")
+            else:
+                rec.start(time.time(), time.monotonic())
+                save_progress()
+            for i in range(1, TOTAL_STAGES + 1):
                 reset_answer(i)
             st.rerun()
 
 
 # -------------------------------------------------
-# STAGE 1
+# STAGES 1..N (จาก STAGES ใน stages.py)
 # -------------------------------------------------
-elif st.session_state.stage == 1:
-    stage_card(
-        "🔎 ด่านที่ 1 : ปลดล็อกยอดขาย",
-        "<b>ภารกิจ:</b> เปิดไฟล์ CSV แล้วหาค่า <b>ยอดขาย</b> ที่มากที่สุด",
-        "stage1.png"
-    )
-    hint_block(1)
-
-    df = pd.read_csv("1sales.csv")
-    with st.expander("📁 ดาวน์โหลดไฟล์ CSV ของด่านนี้"):
-        download_csv_button("1sales.csv", "📥 ดาวน์โหลดไฟล์ด่านที่ 1")
-
-    correct = df["Sales"].max()
-    user = st.number_input("กรอกคำตอบ", step=1, key="answer_1")
-
-    if st.button("ตรวจคำตอบ", key="check_1"):
-        result = "ถูกต้อง" if user == correct else "ผิด"
-        log_to_sheet(st.session_state.group_name, st.session_state.room, 1, user, result)
-
-        if result == "ถูกต้อง":
-            unlock_badge(1)
-            play_sound_autoplay(SFX_SUCCESS)
-            st.success("🎉 ถูกต้อง! กำลังไปด่านถัดไป…")
-            st.balloons()
-            auto_next_stage(2, delay_sec=1.2)
-        else:
-            play_sound_autoplay(SFX_FAIL)
-            st.error("❌ คำตอบผิด ลองใหม่อีกครั้ง")
+elif rec.stage in STAGE_BY_NUMBER:
+    render_stage(STAGE_BY_NUMBER[rec.stage])
 
 
 # -------------------------------------------------
-# STAGE 2
+# SUMMARY PAGE
 # -------------------------------------------------
-elif st.session_state.stage == 2:
-    stage_card(
-        "💪 ด่านที่ 2 : ภารกิจออกกำลัง",
-        "<b>ภารกิจ:</b> เปิดไฟล์ CSV แล้วหาค่า <b>จำนวนนาทีออกกำลังกาย</b> ที่น้อยที่สุด",
-        "stage2.png"
-    )
-    hint_block(2)
-
-    df = pd.read_csv("2exercise.csv")
-    with st.expander("📁 ดาวน์โหลดไฟล์ CSV ของด่านนี้"):
-        download_csv_button("2exercise.csv", "📥 ดาวน์โหลดไฟล์ด่านที่ 2")
-
-    correct = df["ExerciseMinutes"].min()
-    user = st.number_input("กรอกคำตอบ", step=1, key="answer_2")
-
-    if st.button("ตรวจคำตอบ", key="check_2"):
-        result = "ถูกต้อง" if user == correct else "ผิด"
-        log_to_sheet(st.session_state.group_name, st.session_state.room, 2, user, result)
-
-        if result == "ถูกต้อง":
-            unlock_badge(2)
-            play_sound_autoplay(SFX_SUCCESS)
-            st.success("🎉 ถูกต้อง! กำลังไปด่านถัดไป…")
-            st.balloons()
-            auto_next_stage(3, delay_sec=1.2)
-        else:
-            play_sound_autoplay(SFX_FAIL)
-            st.error("❌ คำตอบผิด ลองใหม่อีกครั้ง")
-
-
-# -------------------------------------------------
-# STAGE 3
-# -------------------------------------------------
-elif st.session_state.stage == 3:
-    stage_card(
-        "⚡ ด่านที่ 3 : ภารกิจไฟฟ้า",
-        "<b>ภารกิจ:</b> เปิดไฟล์ CSV แล้วหาค่า <b>การใช้หน่วยไฟฟ้า</b> ที่มากที่สุด",
-        "stage3.png"
-    )
-    hint_block(3)
-
-    df = pd.read_csv("3electricity.csv")
-    with st.expander("📁 ดาวน์โหลดไฟล์ CSV ของด่านนี้"):
-        download_csv_button("3electricity.csv", "📥 ดาวน์โหลดไฟล์ด่านที่ 3")
-
-    correct = df["Units"].max()
-    user = st.number_input("กรอกคำตอบ", step=1, key="answer_3")
-
-    if st.button("ตรวจคำตอบ", key="check_3"):
-        result = "ถูกต้อง" if abs(user - correct) < 0.01 else "ผิด"
-        log_to_sheet(st.session_state.group_name, st.session_state.room, 3, user, result)
-
-        if result == "ถูกต้อง":
-            unlock_badge(3)
-            play_sound_autoplay(SFX_SUCCESS)
-            st.success("🎉 ถูกต้อง! กำลังไปด่านถัดไป…")
-            st.balloons()
-            auto_next_stage(4, delay_sec=1.2)
-        else:
-            play_sound_autoplay(SFX_FAIL)
-            st.error("❌ คำตอบผิด ลองใหม่อีกครั้ง")
-
-
-# -------------------------------------------------
-# STAGE 4
-# -------------------------------------------------
-elif st.session_state.stage == 4:
-    stage_card(
-        "🌐 ด่านที่ 4 : ภารกิจเว็บทราฟฟิก",
-        "<b>ภารกิจ:</b> เปิดไฟล์ CSV แล้วหาค่าผลรวมของผู้เยี่ยมชมเว็บไซต์ทั้งหมด",
-        "stage4.png"
-    )
-    hint_block(4)
-
-    df = pd.read_csv("4web.csv")
-    with st.expander("📁 ดาวน์โหลดไฟล์ CSV ของด่านนี้"):
-        download_csv_button("4web.csv", "📥 ดาวน์โหลดไฟล์ด่านที่ 4")
-
-    correct = df["Visitors"].sum()
-    user = st.number_input("กรอกจำนวนคน", step=1, key="answer_4")
-
-    if st.button("ตรวจคำตอบ", key="check_4"):
-        result = "ถูกต้อง" if user == correct else "ผิด"
-        log_to_sheet(st.session_state.group_name, st.session_state.room, 4, user, result)
-
-        if result == "ถูกต้อง":
-            unlock_badge(4)
-            play_sound_autoplay(SFX_SUCCESS)
-            st.success("🎉 ถูกต้อง! กำลังไปด่านถัดไป…")
-            st.balloons()
-            auto_next_stage(5, delay_sec=1.2)
-        else:
-            play_sound_autoplay(SFX_FAIL)
-            st.error("❌ คำตอบผิด ลองใหม่อีกครั้ง")
-
-
-# -------------------------------------------------
-# STAGE 5
-# -------------------------------------------------
-elif st.session_state.stage == 5:
-    stage_card(
-        "📶 ด่านที่ 5 : ภารกิจ Wi-Fi",
-        "<b>ภารกิจ:</b> หา <b>ค่าเฉลี่ยชั่วโมงที่ใช้งาน Wi-Fi</b> เป็นทศนิยม 2 ตำแหน่ง",
-        "stage5.png"
-    )
-    hint_block(5)
-
-    df = pd.read_csv("5internet.csv")
-    with st.expander("📁 ดาวน์โหลดไฟล์ CSV ของด่านนี้"):
-        download_csv_button("5internet.csv", "📥 ดาวน์โหลดไฟล์ด่านที่ 5")
-
-    correct = round(df["HoursUsed"].mean(), 2)
-    user = st.number_input("กรอกคำตอบ เช่น 3.89", format="%.2f", key="answer_5")
-
-    if st.button("ตรวจคำตอบ", key="check_5"):
-        finish = time.time()
-        total_sec = int(finish - st.session_state.start_time)
-        formatted = format_time(total_sec)
-
-        result = "ถูกต้อง" if float(user) == correct else "ผิด"
-
-        ok = log_to_sheet(
-            st.session_state.group_name,
-            st.session_state.room,
-            5,
-            float(user),
-            result,
-            formatted
-        )
-
-        if result == "ถูกต้อง":
-            unlock_badge(5)
-            play_sound_autoplay(SFX_SUCCESS)
-            st.success("🎉 ถูกต้อง! ผ่านครบทุกด่านแล้ว 🎉 กำลังไปหน้าสรุป…")
-            st.balloons()
-
-            # บันทึกเวลาจบเกม
-            st.session_state.completed_seconds = total_sec
-            st.session_state.completed_time = formatted
-            st.session_state.game_completed = True
-
-            # ไปหน้า Summary (Stage 6)
-            auto_next_stage(6, delay_sec=1.3)
-
-        else:
-            play_sound_autoplay(SFX_FAIL)
-            st.error("❌ คำตอบผิด ลองใหม่อีกครั้ง")
+elif rec.stage == SUMMARY_STAGE:
+    summary_page()
 
 
 # -------------------------------------------------
-# SUMMARY PAGE (STAGE 6)
+# STAGE TRANSITION TIMER
 # -------------------------------------------------
-elif st.session_state.stage == 6:
-    summary_page()
-
-
-
-
-
-
-
-
+if rec.pending_stage is not None:
+    transition_timer()
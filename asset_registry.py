@@ -0,0 +1,70 @@
+import threading
+from pathlib import Path
+
+
+# -------------------------------------------------
+# SHARED READ-ONLY ASSETS
+# -------------------------------------------------
+class AssetRegistry:
+    """
+    ไฟล์ที่อ่านอย่างเดียว (CSS / CSV ให้ดาวน์โหลด / รูป) โหลดครั้งแรกที่ขอ แล้วใช้ร่วมกันทุก session
+    - ปกติ: หลังโหลดแล้วไม่แตะดิสก์อีกเลย (rerun ไม่มี file I/O)
+    - watch=True (ตอนพัฒนา): ตรวจ mtime/size ทุกครั้งที่ขอ ไฟล์เปลี่ยน = โหลดใหม่
+    ไฟล์ที่ไม่มีอยู่จะคืน None (และจำไว้ว่าไม่มี เว้นแต่ watch=True)
+    """
+
+    def __init__(self, watch: bool = False, image_variants=None):
+        self.watch = watch
+        self.image_variants = image_variants
+        self._lock = threading.Lock()
+        # (ชนิด, path, ...) -> (signature ของไฟล์, ค่า)
+        self._entries = {}
+
+    @staticmethod
+    def _signature(path: Path):
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _get(self, key: tuple, path, load):
+        path = Path(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and not self.watch:
+            return entry[1]
+
+        sig = self._signature(path)
+        if entry is not None and entry[0] == sig:
+            return entry[1]
+        try:
+            value = load(path) if sig is not None else None
+        except OSError:
+            value = None
+        with self._lock:
+            self._entries[key] = (sig, value)
+        return value
+
+    def exists(self, path) -> bool:
+        return self._get(("exists", str(path)), path, lambda p: True) is not None
+
+    def bytes(self, path):
+        return self._get(("bytes", str(path)), path, lambda p: p.read_bytes())
+
+    def text(self, path, encoding: str = "utf-8"):
+        return self._get(("text", str(path), encoding), path, lambda p: p.read_text(encoding=encoding))
+
+    def image(self, path, variant: str = None):
+        """bytes ของรูป (ถ้าระบุ variant และมี image_variants จะใช้รูปที่ย่อแล้ว)"""
+        if variant is None or self.image_variants is None:
+            return self.bytes(path)
+
+        def load(p: Path):
+            return Path(self.image_variants.get(p, variant)).read_bytes()
+
+        return self._get(("image", str(path), variant), path, load)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
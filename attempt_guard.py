@@ -0,0 +1,170 @@
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+
+from session_record import team_key
+
+
+# -------------------------------------------------
+# RATE LIMIT (token bucket)
+# -------------------------------------------------
+@dataclass(slots=True)
+class TokenBucket:
+    """ถังโทเคน: ตอบได้ทันที capacity ครั้ง แล้วได้คืน rate ครั้งต่อวินาที"""
+    capacity: float
+    rate: float
+    tokens: float = None
+    updated: float = 0.0
+
+    def __post_init__(self):
+        if self.tokens is None:
+            self.tokens = self.capacity
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """วินาทีที่ต้องรอจนมีโทเคนครบ 1 (0 = ตอบได้เลย)"""
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+@dataclass(slots=True)
+class _TeamLimit:
+    bucket: TokenBucket
+    stages: dict = field(default_factory=dict)
+    strikes: int = 0
+    blocked_until: float = 0.0
+    last_strike: float = 0.0
+    last_seen: float = 0.0
+
+
+class AttemptLimiter:
+    """
+    จำกัดความถี่การกด "ตรวจคำตอบ" ของแต่ละทีม (กลุ่ม + ห้อง) — ใช้ร่วมกันทุก session/แท็บ
+    - ถังโทเคนต่อทีม และต่อ (ทีม, ด่าน) ต้องมีโทเคนทั้งสองถังจึงตอบได้
+    - ถังหมด = ติด cooldown และยิ่งโดนบ่อยยิ่งนาน (cooldown_base * 2^(ครั้งที่โดน-1) ไม่เกิน cooldown_max)
+    - ไม่โดนเลยนาน forgive_after วินาที นับครั้งที่โดนใหม่
+    acquire() คืน 0 ถ้าตอบได้ หรือจำนวนวินาทีที่ต้องรอ
+    """
+
+    def __init__(
+        self,
+        team_burst: int = 12,
+        team_rate: float = 1 / 5,
+        stage_burst: int = 5,
+        stage_rate: float = 1 / 8,
+        cooldown_base: float = 5.0,
+        cooldown_max: float = 120.0,
+        forgive_after: float = 300.0,
+        clock=time.monotonic,
+    ):
+        self.team_burst = team_burst
+        self.team_rate = team_rate
+        self.stage_burst = stage_burst
+        self.stage_rate = stage_rate
+        self.cooldown_base = cooldown_base
+        self.cooldown_max = cooldown_max
+        self.forgive_after = forgive_after
+        self.clock = clock
+        self.limited = 0
+        self._lock = threading.Lock()
+        self._teams = {}
+        self._next_prune = 0.0
+
+    def _team(self, key: str, now: float) -> _TeamLimit:
+        team = self._teams.get(key)
+        if team is None:
+            team = self._teams[key] = _TeamLimit(TokenBucket(self.team_burst, self.team_rate, updated=now))
+        return team
+
+    def acquire(self, group: str, room: str, stage: int) -> float:
+        now = self.clock()
+        with self._lock:
+            self._prune(now)
+            team = self._team(team_key(group, room), now)
+            team.last_seen = now
+            if now < team.blocked_until:
+                self.limited += 1
+                return team.blocked_until - now
+
+            stage_bucket = team.stages.get(stage)
+            if stage_bucket is None:
+                stage_bucket = team.stages[stage] = TokenBucket(self.stage_burst, self.stage_rate, updated=now)
+            team.bucket.refill(now)
+            stage_bucket.refill(now)
+            if team.bucket.tokens >= 1 and stage_bucket.tokens >= 1:
+                team.bucket.tokens -= 1
+                stage_bucket.tokens -= 1
+                return 0.0
+
+            if now - team.last_strike > self.forgive_after:
+                team.strikes = 0
+            team.strikes += 1
+            team.last_strike = now
+            cooldown = min(self.cooldown_max, self.cooldown_base * 2 ** (team.strikes - 1))
+            wait = max(cooldown, team.bucket.wait_time(), stage_bucket.wait_time())
+            team.blocked_until = now + wait
+            self.limited += 1
+            return wait
+
+    def _prune(self, now: float):
+        # ทีมที่เงียบนานจนถังเต็มและพ้นช่วงนับครั้งที่โดนแล้ว ไม่ต้องจำต่อ
+        if now < self._next_prune:
+            return
+        self._next_prune = now + 60.0
+        idle = max(self.forgive_after, self.team_burst / self.team_rate, self.stage_burst / self.stage_rate)
+        for key in [k for k, t in self._teams.items() if now - t.last_seen > idle]:
+            del self._teams[key]
+
+    def teams(self) -> int:
+        with self._lock:
+            return len(self._teams)
+
+
+# -------------------------------------------------
+# DUPLICATE-SUBMIT COALESCING
+# -------------------------------------------------
+def coalesce_keys(payload: dict) -> tuple:
+    """
+    (scope, run_key) ของผลการตอบสำหรับ journal
+    scope = ทีม + ด่าน (ส่งตามลำดับ), run_key = scope + คำตอบ เฉพาะคำตอบผิด (รวมกันได้) ไม่เช่นนั้น None
+    """
+    scope = json.dumps([team_key(str(payload.get("group_name", "")), str(payload.get("classroom", ""))),
+                        payload.get("stage")], ensure_ascii=False)
+    if payload.get("result") != "ผิด":
+        return scope, None
+    return scope, json.dumps([scope, payload.get("answer")], ensure_ascii=False)
+
+
+def coalesce_attempts(rows: list, window: float) -> list:
+    """
+    รวมคำตอบผิดที่ซ้ำกันติด ๆ ของทีมเดียวกันในด่านเดียวกันเป็นรายการเดียว (ฟิลด์ count)
+    ใช้กับรายการที่จองมาจาก journal: ทุกครั้งที่กดถูกบันทึกลงดิสก์ทันที แล้วจึงรวมตอนส่ง
+    (journal พักคำตอบผิดไว้ coalesce_window วินาทีก่อนให้จอง — ดู coalesce_keys / AttemptJournal.append)
+    - rows = [(id, created_at, payload), ...] เรียงตาม id
+    - รวมได้เมื่อห่างจากรายการแรกของชุดไม่เกิน window วินาที (นับจากรายการแรก ไม่ต่ออายุ)
+    - แถวที่รวมแล้วใช้ payload ของรายการแรก (timestamp = เวลาที่ตอบผิดครั้งแรก) + count
+    - คำตอบอื่น / คำตอบถูก ของทีมและด่านเดียวกันคั่น = เริ่มชุดใหม่ (ลำดับไม่สลับ)
+    คืน [(id, payload, merged_ids), ...] — merged_ids = id ของรายการที่ถูกรวมเข้ามา (ไม่ต้องส่งซ้ำ)
+    window <= 0 = ไม่รวม
+    """
+    out = []
+    runs = {}
+    for record_id, created_at, payload in rows:
+        key = coalesce_keys(payload)[0]
+        wrong = payload.get("result") == "ผิด"
+        run = runs.pop(key, None)
+        if run is not None and wrong and window > 0:
+            i, first_at, answer = run
+            if payload.get("answer") == answer and created_at - first_at <= window:
+                _, head, merged = out[i]
+                head["count"] = int(head.get("count") or 1) + int(payload.get("count") or 1)
+                merged.append(record_id)
+                runs[key] = run
+                continue
+        out.append((record_id, dict(payload), []))
+        if wrong and window > 0:
+            runs[key] = (len(out) - 1, created_at, payload.get("answer"))
+    return out
@@ -0,0 +1,187 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+# -------------------------------------------------
+# LOCAL WRITE-AHEAD JOURNAL (SQLite WAL)
+# -------------------------------------------------
+class AttemptJournal:
+    """
+    บันทึกผลการตอบลงไฟล์ SQLite ในเครื่องก่อนเสมอ (append-only)
+    - append() เขียนลงดิสก์ทันที ไม่ต้องรอเน็ต
+    - สถานะการส่งเก็บต่อแถวในไฟล์ (sent / claimed_by / lease_until) ไม่ได้อยู่ในหน่วยความจำของ process
+    - claim() จองแถวที่ยังไม่ส่งแบบ atomic (BEGIN IMMEDIATE) — หลาย process ใช้ไฟล์เดียวกันได้
+      แถวหนึ่งถูกจองได้ทีละผู้ส่ง จองแล้วค้าง (process ตาย) ครบ lease แล้วผู้ส่งอื่นจองต่อได้
+    - mark_sent() ทีละแถวหลังส่งสำเร็จ — รีสตาร์ตกลางชุดก็ไม่ส่งแถวที่ส่งแล้วซ้ำ
+    - append(..., run_key, hold) พักแถวไว้ (due_at) ให้แถวซ้ำที่ตามมารวมได้ก่อนส่ง — แถวแรกของชุดกำหนดเวลาส่งทั้งชุด
+      แถวอื่นของ scope เดียวกันมาคั่น = ปล่อยชุดที่พักไว้ทันที (ลำดับไม่สลับ)
+    """
+
+    # คอลัมน์ที่เพิ่มทีหลัง (journal รุ่นเก่าเพิ่มให้ตอนเปิดไฟล์)
+    COLUMNS = {
+        "sent": "INTEGER NOT NULL DEFAULT 0",
+        "claimed_by": "TEXT",
+        "lease_until": "REAL NOT NULL DEFAULT 0",
+        "scope": "TEXT",
+        "run_key": "TEXT",
+        "due_at": "REAL NOT NULL DEFAULT 0",
+    }
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL = fsync ตอน checkpoint (รวบหลายรายการต่อครั้ง) แต่ยังไม่เสียข้อมูลถ้าโปรแกรมล่ม
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS attempts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO meta (key, value) VALUES ('hwm', 0);
+        """)
+        self._migrate()
+        self._conn.execute("CREATE INDEX IF NOT EXISTS attempts_unsent ON attempts (id) WHERE sent = 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS attempts_scope ON attempts (scope, id) WHERE sent = 0")
+
+    def _migrate(self):
+        """journal รุ่นเก่ามีแค่ high-water mark — เพิ่มสถานะต่อแถว แล้วถือว่าแถวที่ id <= hwm ส่งแล้ว"""
+        with self._lock:
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(attempts)")}
+            if columns >= self.COLUMNS.keys():
+                return
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                columns = {row[1] for row in self._conn.execute("PRAGMA table_info(attempts)")}
+                for name, decl in self.COLUMNS.items():
+                    if name not in columns:
+                        self._conn.execute(f"ALTER TABLE attempts ADD COLUMN {name} {decl}")
+                if "sent" not in columns:
+                    self._conn.execute(
+                        "UPDATE attempts SET sent = 1 WHERE id <= (SELECT value FROM meta WHERE key = 'hwm')"
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def append(self, payload: dict, scope: str = None, run_key: str = None, hold: float = 0.0) -> int:
+        """
+        เขียนหนึ่งแถวลงดิสก์ทันที คืน id
+        - ใส่ timestamp (เวลาที่เกิดเหตุการณ์ตามนาฬิกาเครื่อง) ให้ payload ถ้ายังไม่มี — ส่งทีหลังเวลาก็ไม่เลื่อน
+        - scope = กลุ่มที่ต้องส่งตามลำดับ (ทีม + ด่าน), run_key = แถวที่รวมกันได้ (เช่น คำตอบผิดเดียวกัน)
+        - มี run_key และ hold > 0: แถวล่าสุดของ scope ที่ยังพักอยู่และ run_key ตรงกัน = ต่อชุดเดิม (ส่งพร้อมกัน)
+          ไม่เช่นนั้นเริ่มชุดใหม่ พักไว้ hold วินาที
+        """
+        now = time.time()
+        payload = dict(payload)
+        payload.setdefault("timestamp", time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)))
+        data = json.dumps(payload, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                due = now
+                if scope is not None:
+                    last = self._conn.execute(
+                        "SELECT run_key, due_at FROM attempts WHERE scope = ? AND sent = 0 ORDER BY id DESC LIMIT 1",
+                        (scope,)
+                    ).fetchone()
+                    if run_key is not None and hold > 0 and last is not None and last[0] == run_key and last[1] > now:
+                        due = last[1]
+                    else:
+                        self._conn.execute(
+                            "UPDATE attempts SET due_at = ? WHERE scope = ? AND sent = 0 AND due_at > ?",
+                            (now, scope, now)
+                        )
+                        if run_key is not None and hold > 0:
+                            due = now + hold
+                cur = self._conn.execute(
+                    "INSERT INTO attempts (created_at, payload, scope, run_key, due_at) VALUES (?, ?, ?, ?, ?)",
+                    (now, data, scope, run_key, due)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return int(cur.lastrowid)
+
+    def claim(self, owner: str, limit: int = 20, lease: float = 60.0) -> list:
+        """
+        จองแถวที่ถึงเวลาส่ง ยังไม่ส่ง และไม่มีใครจองอยู่ (หรือ lease หมดแล้ว) ให้ owner
+        คืน [(id, created_at, payload), ...] เรียงตาม id
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, created_at, payload FROM attempts "
+                    "WHERE sent = 0 AND lease_until < ? AND due_at <= ? ORDER BY id LIMIT ?",
+                    (now, now, limit)
+                ).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE attempts SET claimed_by = ?, lease_until = ? WHERE id = ?",
+                        [(owner, now + lease, i) for i, _, _ in rows]
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(int(i), float(t), json.loads(p)) for i, t, p in rows]
+
+    def mark_sent(self, record_ids, owner: str) -> int:
+        """บันทึกว่าส่งแล้ว (เฉพาะแถวที่ owner ยังจองอยู่) คืนจำนวนแถวที่บันทึก"""
+        ids = [int(i) for i in ([record_ids] if isinstance(record_ids, int) else record_ids)]
+        if not ids:
+            return 0
+        with self._lock:
+            cur = self._conn.execute(
+                f"UPDATE attempts SET sent = 1 WHERE claimed_by = ? AND id IN ({','.join('?' * len(ids))})",
+                (owner, *ids)
+            )
+            return cur.rowcount
+
+    def release(self, owner: str) -> int:
+        """ปล่อยแถวที่ owner จองไว้แต่ยังส่งไม่สำเร็จ ให้ผู้ส่งอื่น (หรือรอบถัดไป) จองใหม่ได้ทันที"""
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE attempts SET claimed_by = NULL, lease_until = 0 WHERE claimed_by = ? AND sent = 0",
+                (owner,)
+            ).rowcount
+
+    def next_due(self) -> float:
+        """กี่วินาทีถึงแถวที่พักไว้แถวถัดไป (None = ไม่มีแถวที่พักอยู่)"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(due_at) FROM attempts WHERE sent = 0 AND due_at > ?", (now,)
+            ).fetchone()
+        return None if row[0] is None else row[0] - now
+
+    def release_held(self) -> int:
+        """ส่งแถวที่พักไว้ได้ทันที (ก่อนปิดโปรแกรม / flush)"""
+        now = time.time()
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE attempts SET due_at = ? WHERE sent = 0 AND due_at > ?", (now, now)
+            ).rowcount
+
+    def backlog(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM attempts WHERE sent = 0").fetchone()
+        return int(row[0])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,153 @@
+import atexit
+import os
+import socket
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from attempt_guard import coalesce_attempts, coalesce_keys
+from attempt_journal import AttemptJournal
+from telemetry import DISABLED, Telemetry
+
+
+# -------------------------------------------------
+# BACKGROUND ATTEMPT LOGGER
+# -------------------------------------------------
+class AttemptLogger:
+    """
+    ส่งผลการตอบไปยัง webhook ผ่าน worker thread เบื้องหลัง
+    - log() เขียนลง journal ในเครื่องแล้ว return ทันที (ไม่บล็อกหน้าเกม)
+    - worker จองแถวที่ยังไม่ส่งจาก journal ทีละชุด (claim) ส่งผ่าน Session เดียวกัน (keep-alive)
+      แล้วบันทึกว่าส่งแล้วทีละแถว — หลาย process ใช้ journal เดียวกันได้ แถวหนึ่งส่งครั้งเดียว
+    - คำตอบผิดพักไว้ใน journal coalesce_window วินาทีก่อนส่ง (นับจากครั้งแรก)
+      ตอบผิดซ้ำเดิมระหว่างนั้นรวมเป็นแถวเดียว (count) — ตอบอย่างอื่นในด่านเดียวกัน = ส่งชุดที่พักไว้ทันที
+    - ส่งไม่สำเร็จจะรอแบบ backoff แล้วลองใหม่ ไม่ทิ้งรายการ
+    - flush() รอให้ journal ส่งหมดก่อนปิดโปรแกรม
+    """
+
+    def __init__(
+        self,
+        url: str,
+        journal: AttemptJournal,
+        batch_size: int = 20,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        timeout: float = 10.0,
+        pool_size: int = 4,
+        coalesce_window: float = 0.0,
+        telemetry: Telemetry = None,
+    ):
+        self.url = url
+        self.journal = journal
+        self.batch_size = batch_size
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.coalesce_window = coalesce_window
+        self.telemetry = telemetry or DISABLED
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._failures = 0
+        # ชื่อผู้ส่งใน journal (ไม่ซ้ำกันข้าม process/เครื่อง) + อายุการจองต่อชุด (เผื่อทุกแถว timeout)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease = timeout * batch_size + 30.0
+        self._drained = True
+        self.sent = 0
+        self.merged = 0
+        self.failed = 0
+        self.last_error = ""
+
+        self._worker = threading.Thread(target=self._run, name="attempt-logger", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def log(self, payload: dict) -> int:
+        """บันทึกผลการตอบลง journal แล้วปลุก worker (คืนค่าทันที)"""
+        scope, run_key = coalesce_keys(payload)
+        record_id = self.journal.append(payload, scope, run_key, hold=self.coalesce_window)
+        self._wake.set()
+        return record_id
+
+    def pending(self) -> int:
+        return self.journal.backlog()
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """ส่งแถวที่พักไว้ทันที แล้วรอจนส่ง journal หมด หรือหมดเวลา — คืน True ถ้าส่งหมดแล้ว"""
+        deadline = time.monotonic() + timeout
+        self.journal.release_held()
+        self._wake.set()
+        while self.journal.backlog() > 0:
+            if time.monotonic() >= deadline or not self._worker.is_alive():
+                return False
+            time.sleep(0.05)
+            self.journal.release_held()
+        return True
+
+    def close(self, timeout: float = 30.0):
+        if self._stop.is_set():
+            return
+        self.flush(timeout)
+        self._stop.set()
+        self._wake.set()
+        self._worker.join(timeout=1.0)
+        self.journal.release(self.owner)
+        self.session.close()
+
+    # ---------- worker ----------
+    def _send(self, payload: dict) -> bool:
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            r = self.session.post(self.url, json=payload, timeout=self.timeout)
+            ok = r.status_code == 200
+            if not ok:
+                self.last_error = f"HTTP {r.status_code}: {r.text[:200]}"
+        except requests.RequestException as e:
+            self.last_error = str(e)
+        self.telemetry.record("webhook_post", time.perf_counter() - t0, ok)
+        return ok
+
+    def _replay_batch(self) -> bool:
+        """จองแล้วส่งรายการค้างหนึ่งชุด — คืน False ถ้าส่งไม่สำเร็จกลางทาง (ปล่อยแถวที่เหลือคืน journal)"""
+        rows = self.journal.claim(self.owner, self.batch_size, self.lease)
+        self._drained = len(rows) < self.batch_size
+        for record_id, payload, merged in coalesce_attempts(rows, self.coalesce_window):
+            if self._stop.is_set():
+                self.journal.release(self.owner)
+                return False
+            if not self._send(payload):
+                with self._lock:
+                    self.failed += 1
+                self.journal.release(self.owner)
+                return False
+            # แถวที่ถูกรวมเข้ามาส่งไปพร้อมกันแล้ว บันทึกพร้อมกัน
+            self.journal.mark_sent([record_id, *merged], self.owner)
+            with self._lock:
+                self.sent += 1
+                self.merged += len(merged)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._replay_batch():
+                self._failures = 0
+                if not self._drained:
+                    continue
+                # หลับจนมีรายการใหม่ หรือถึงเวลาส่งแถวที่พักไว้
+                due = self.journal.next_due()
+                self._wake.wait(timeout=5.0 if due is None else min(5.0, due + 0.01))
+                self._wake.clear()
+            else:
+                delay = min(self.backoff_max, self.backoff_base * (2 ** self._failures))
+                self._failures += 1
+                self._stop.wait(delay)
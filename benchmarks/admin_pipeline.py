@@ -0,0 +1,181 @@
+"""
+micro-benchmark ของขั้นตอนข้อมูลใน admin.py ที่ขนาดข้อมูลต่าง ๆ (ข้อมูลจาก synthetic.py)
+
+    python benchmarks/admin_pipeline.py                          # 10k, 100k, 1M แถว
+    python benchmarks/admin_pipeline.py --sizes 10000,5000000 --repeat 3 --json out.json
+
+แต่ละขั้นตอนจับเวลาแยกกัน (ค่ามัธยฐานของ --repeat รอบ) แล้ววัด peak memory อีกรอบด้วย tracemalloc
+- โหลดครั้งแรก = parse + normalize + index (ทำครั้งเดียวต่อข้อมูลชุดใหม่)
+- rerun ที่ไม่โดนแคช = filter + kpis + leaderboard + chart + page (เปลี่ยนตัวกรองใหม่ทุกครั้ง)
+ค่าที่เกิน --budget-ms จะมีเครื่องหมาย ! (ช้าเกินกว่าจะใช้หน้า dashboard ได้สบาย ๆ)
+"""
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from dashboard import (  # noqa: E402
+    EXPORT_FORMATS, DashboardCache, compute_kpis, export_csv, export_file, filter_key,
+    normalize_frame, stage_chart,
+)
+from leaderboard import build_leaderboard  # noqa: E402
+from sheet_store import parse_csv  # noqa: E402
+from stage_analytics import StageAnalytics  # noqa: E402
+from stages import FINAL_STAGE, STAGES  # noqa: E402
+from synthetic import generate_attempts  # noqa: E402
+
+REQUIRED_STAGES = [s.number for s in STAGES]
+PAGE_SIZE = 100
+FIRST_LOAD = ["parse", "normalize", "index"]
+RERUN = ["filter", "kpis", "leaderboard", "chart", "analytics", "page"]
+
+
+# -------------------------------------------------
+# PIPELINE STEPS
+# -------------------------------------------------
+class Fixture:
+    """ข้อมูลตั้งต้นของหนึ่งขนาด (สร้างครั้งเดียว ไม่นับเวลา)"""
+
+    def __init__(self, rows: int, seed: int):
+        raw = generate_attempts(rows, seed=seed)
+        self.csv_text = raw.to_csv(index=False)
+        self.raw = parse_csv(self.csv_text)
+        self.df = normalize_frame(self.raw)
+
+
+def _fresh_cache(fx: Fixture) -> DashboardCache:
+    return DashboardCache(fx.df, REQUIRED_STAGES, FINAL_STAGE)
+
+
+def dash_key(dash: DashboardCache) -> tuple:
+    """ตัวกรองตัวอย่าง: ห้องแรก"""
+    return filter_key(rooms=[dash.df["classroom"].cat.categories[0]])
+
+
+# ชื่อขั้นตอน -> (setup ที่ไม่นับเวลา, ขั้นตอนที่จับเวลา)
+STEPS = {
+    "parse": (lambda fx: fx.csv_text, parse_csv),
+    "normalize": (lambda fx: fx.raw, normalize_frame),
+    "index": (lambda fx: fx, _fresh_cache),
+    "options": (_fresh_cache, lambda dash: dash.options()),
+    "filter": (_fresh_cache, lambda dash: dash.filtered(dash_key(dash))),
+    "kpis": (lambda fx: fx.df, lambda df: compute_kpis(df, FINAL_STAGE)),
+    "leaderboard": (lambda fx: fx.df, lambda df: build_leaderboard(df, REQUIRED_STAGES, FINAL_STAGE)),
+    "chart": (lambda fx: fx.df, stage_chart),
+    "analytics": (lambda fx: fx.df, lambda df: StageAnalytics.from_frame(df).report()),
+    "page": (_fresh_cache, lambda dash: dash.page(filter_key(), 1, PAGE_SIZE)),
+    "export": (lambda fx: fx.df, export_csv),
+    "export_file": (lambda fx: fx.df, lambda df: export_file(df, "csv")),
+    "export_gz": (lambda fx: fx.df, lambda df: export_file(df, "csv.gz")),
+}
+if "parquet" in EXPORT_FORMATS:
+    STEPS["export_parquet"] = (lambda fx: fx.df, lambda df: export_file(df, "parquet"))
+
+
+def time_step(name: str, fx: Fixture, repeat: int) -> float:
+    setup, run = STEPS[name]
+    samples = []
+    for _ in range(repeat):
+        arg = setup(fx)
+        gc.collect()
+        t0 = time.perf_counter()
+        run(arg)
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+
+def peak_memory(name: str, fx: Fixture) -> int:
+    """หน่วยความจำสูงสุดที่ขั้นตอนนี้จองเพิ่ม (bytes)"""
+    setup, run = STEPS[name]
+    arg = setup(fx)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        result = run(arg)
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+# -------------------------------------------------
+# RUNNER
+# -------------------------------------------------
+def benchmark(sizes, repeat: int = 1, seed: int = 0, memory: bool = True, steps=None) -> dict:
+    steps = steps or list(STEPS)
+    results = {}
+    for rows in sizes:
+        t0 = time.perf_counter()
+        fx = Fixture(rows, seed)
+        print(f"[{rows:,} rows] fixture ready in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+        results[rows] = {}
+        for name in steps:
+            entry = {"ms": time_step(name, fx, repeat) * 1000}
+            if memory:
+                entry["peak_mib"] = peak_memory(name, fx) / 2**20
+            results[rows][name] = entry
+        del fx
+        gc.collect()
+    return results
+
+
+def _cell(entry: dict, budget_ms: float) -> str:
+    flag = "!" if entry["ms"] > budget_ms else " "
+    if "peak_mib" in entry:
+        return f"{entry['ms']:>9.1f}{flag} ({entry['peak_mib']:>6.1f})"
+    return f"{entry['ms']:>9.1f}{flag}"
+
+
+def print_table(results: dict, budget_ms: float):
+    sizes = list(results)
+    steps = list(results[sizes[0]])
+    width = 20 if "peak_mib" in results[sizes[0]][steps[0]] else 11
+    print()
+    print("ms per step (peak MiB)")
+    print(f"{'step':<14}" + "".join(f"{f'{n:,} rows':>{width}}" for n in sizes))
+    for name in steps:
+        print(f"{name:<14}" + "".join(f"{_cell(results[n][name], budget_ms):>{width}}" for n in sizes))
+    for label, group in (("first load", FIRST_LOAD), ("rerun", RERUN)):
+        if all(s in steps for s in group):
+            totals = [sum(results[n][s]["ms"] for s in group) for n in sizes]
+            print(f"{label:<14}" + "".join(
+                f"{f'{t:.1f}' + ('!' if t > budget_ms else ' '):>{width}}" for t in totals))
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description="benchmark ขั้นตอนข้อมูลของ admin.py")
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="จำนวนแถว คั่นด้วยจุลภาค (เช่น 10000,100000,1000000,5000000)")
+    parser.add_argument("--steps", help=f"เลือกบางขั้นตอน ({','.join(STEPS)})")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="ไม่วัด peak memory (เร็วขึ้น)")
+    parser.add_argument("--budget-ms", type=float, default=1000.0)
+    parser.add_argument("--json", help="บันทึกผลเป็นไฟล์ JSON")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    steps = [s.strip() for s in args.steps.split(",")] if args.steps else None
+    unknown = set(steps or []) - set(STEPS)
+    if unknown:
+        parser.error(f"unknown steps: {', '.join(sorted(unknown))}")
+
+    results = benchmark(sizes, args.repeat, args.seed, memory=not args.no_memory, steps=steps)
+    print_table(results, args.budget_ms)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""
+ทดสอบโหลด app.py: หลายกลุ่มเล่นพร้อมกันจริงบนเซิร์ฟเวอร์ Streamlit ตัวเดียว ตั้งแต่หน้าเริ่ม (ด่าน 0) จนถึงหน้าสรุป
+เปิด `streamlit run app.py` เป็น process แยก แล้วให้ client จำลองหนึ่งตัวต่อกลุ่มคุยผ่าน websocket
+(/_stcore/stream — โปรโตคอลเดียวกับเบราว์เซอร์: ส่ง BackMsg.rerun_script พร้อม widget_states รอ script_finished)
+และใช้ webhook ปลอมในเครื่องแทน WEBHOOK_URL
+
+รัน (จากโฟลเดอร์โปรเจกต์):
+    python benchmarks/loadtest.py --groups 5 10 20 40
+    python benchmarks/loadtest.py --groups 10 --wrong-rate 0.5 --webhook-latency-ms 800 --json out.json
+
+รายงาน ต่อระดับความพร้อมกัน (จำนวนกลุ่มใน --groups ทีละระดับ ทุกกลุ่มในระดับเดียวกันเล่นพร้อมกัน):
+- attempts/s ที่ทำได้จริง (ครั้งที่กดตรวจคำตอบทั้งหมด / เวลาตั้งแต่กลุ่มแรกเริ่มถึงกลุ่มสุดท้ายจบ)
+- p50/p95 latency ของการกดตรวจคำตอบ และของทุก rerun (ส่ง BackMsg จนได้ script_finished ที่ client)
+  แยกตามการกระทำ (โหลดหน้า, เริ่มเกม, ขอใบ้, ตอบผิด, ตอบถูก, tick ของตัวจับเวลาเปลี่ยนด่าน, เปลี่ยนด่าน)
+- หน่วยความจำของเซิร์ฟเวอร์ (RSS) ที่เพิ่มขึ้นต่อ session (Linux)
+- จำนวนผลที่ส่งถึง webhook ครบหรือไม่ (นับตาม count ของรายการที่รวมคำตอบผิดซ้ำ)
+
+ข้อจำกัด: client ทุกตัวรันใน process นี้บนเครื่องเดียวกับเซิร์ฟเวอร์ (แย่ง CPU กันบ้าง)
+การรอระหว่างด่าน (ตัวจับเวลา run_every ของ fragment) และ --think รวมอยู่ในเวลาของระดับ เหมือนการเล่นจริง
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.NumberInput_pb2 import NumberInput
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_PATH = str(ROOT / "app.py")
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from webhook_stub import WebhookStub  # noqa: E402
+
+ACTIONS = ["load", "start", "hint", "wrong", "correct", "tick", "transition"]
+CHECK_ACTIONS = ("wrong", "correct")
+
+START_LABELS = ("ชื่อกลุ่ม", "ห้องเรียน เช่น ม.3/1", "เริ่มเกม →")
+
+
+# -------------------------------------------------
+# ONE SIMULATED BROWSER
+# -------------------------------------------------
+class Recorder:
+    """เก็บเวลาของแต่ละการกระทำจากทุกกลุ่มในระดับหนึ่ง (client ทุกตัวอยู่ใน event loop เดียว)"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = []
+        self.completed = 0
+        self.attempts = 0
+
+    def add(self, action: str, latency: float):
+        self.samples[action].append(latency)
+
+
+class BrowserSession:
+    """
+    client websocket หนึ่งตัว = หนึ่งแท็บ
+    จำ widget ของ rerun ล่าสุด (id ตาม label / key) และตัวจับเวลา run_every ของ fragment เหมือนเบราว์เซอร์
+    """
+
+    def __init__(self, ws, timeout: float):
+        self.ws = ws
+        self.timeout = timeout
+        self.widgets = {}
+        self.page_script_hash = ""
+        self.query_string = ""
+        self.auto_rerun = None
+
+    @staticmethod
+    def _name(widget_id: str, label: str) -> str:
+        # id ของ widget ที่มี key = "$$ID-<hash>-<key>" ไม่มี key = "...-None" -> ใช้ label แทน
+        key = widget_id.rsplit("-", 1)[-1]
+        return label if key == "None" else key
+
+    async def rerun(self, widgets: list = (), fragment_id: str = "") -> int:
+        """ส่ง rerun หนึ่งครั้ง (widgets = [(ชื่อ, ค่า)]) แล้วรอจน script รันจบ — คืนสถานะ script_finished"""
+        back = BackMsg()
+        state = back.rerun_script
+        state.query_string = self.query_string
+        state.page_script_hash = self.page_script_hash
+        if fragment_id:
+            state.fragment_id = fragment_id
+            state.is_auto_rerun = True
+        for name, value in widgets:
+            kind, widget_id, proto = self.widgets[name]
+            w = state.widget_states.widgets.add()
+            w.id = widget_id
+            if kind == "button":
+                w.trigger_value = True
+            elif kind == "text_input":
+                w.string_value = value
+            elif proto.data_type == NumberInput.INT:
+                w.int_value = int(value)
+            else:
+                w.double_value = float(value)
+        await self.ws.send(back.SerializeToString())
+        return await asyncio.wait_for(self._until_finished(bool(fragment_id)), timeout=self.timeout)
+
+    async def _until_finished(self, fragment: bool) -> int:
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await self.ws.recv())
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                self.page_script_hash = msg.new_session.page_script_hash
+                if not msg.new_session.fragment_ids_this_run:
+                    # rerun ทั้งหน้า: widget และตัวจับเวลาชุดเดิมหายไป
+                    self.widgets = {}
+                    self.auto_rerun = None
+            elif kind == "page_info_changed":
+                self.query_string = msg.page_info_changed.query_string
+            elif kind == "auto_rerun":
+                self.auto_rerun = (msg.auto_rerun.interval, msg.auto_rerun.fragment_id)
+            elif kind == "stop_auto_rerun":
+                self.auto_rerun = None
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                etype = element.WhichOneof("type")
+                if etype in ("button", "text_input", "number_input"):
+                    proto = getattr(element, etype)
+                    self.widgets[self._name(proto.id, proto.label)] = (etype, proto.id, proto)
+                elif etype == "exception":
+                    raise RuntimeError(f"{element.exception.type}: {element.exception.message}")
+            elif kind == "script_finished":
+                status = msg.script_finished
+                if status == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RuntimeError("script compile error")
+                # fragment เรียก st.rerun() = รันจบก่อนกำหนด แล้วต่อด้วยการรันทั้งหน้าทันที
+                if status != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return status
+
+    def stage(self):
+        """ด่านที่แสดงอยู่ (จากช่องคำตอบ answer_<n>) หรือ None"""
+        stages = [int(name[len("answer_"):]) for name in self.widgets if name.startswith("answer_")]
+        return stages[0] if stages else None
+
+
+async def timed(recorder: Recorder, action: str, coro):
+    t0 = time.perf_counter()
+    result = await coro
+    recorder.add(action, time.perf_counter() - t0)
+    return result
+
+
+async def wait_transition(session: BrowserSession, recorder: Recorder):
+    """เหมือนเบราว์เซอร์: rerun fragment ตามรอบ run_every จนตัวจับเวลาพาไปด่านถัดไป (rerun ทั้งหน้า)"""
+    while session.auto_rerun is not None:
+        interval, fragment_id = session.auto_rerun
+        await asyncio.sleep(interval)
+        t0 = time.perf_counter()
+        status = await session.rerun(fragment_id=fragment_id)
+        action = "tick" if status == ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY else "transition"
+        recorder.add(action, time.perf_counter() - t0)
+
+
+def stage_answers() -> dict:
+    """เฉลยของทุกด่าน (คิดจาก STAGES แบบเดียวกับ app.py)"""
+    from answer_keys import AnswerKeyCache
+    from stages import STAGES
+
+    cache = AnswerKeyCache()
+    return {s.number: (s, cache.get(s.answer_spec)) for s in STAGES}
+
+
+def group_answers(answers: dict, args, group: str, room: str) -> dict:
+    """โหมดชุดข้อมูลเฉพาะกลุ่ม: เฉลยของกลุ่มนี้ (สร้างด้วย seed เดียวกับ app.py)"""
+    if args.dataset_mode != "group":
+        return answers
+    from datasets import DatasetFactory
+
+    factory = DatasetFactory(rows=args.dataset_rows)
+    return {n: (stage, factory.get(stage, group, room).answer) for n, (stage, _) in answers.items()}
+
+
+def answer_value(stage, value: float):
+    return float(value) if stage.input_format else int(round(value))
+
+
+async def play(index: int, url: str, args, answers: dict, recorder: Recorder):
+    """หนึ่งกลุ่ม: เข้าเว็บ -> กรอกชื่อ -> ผ่านทุกด่าน (มีตอบผิด/ขอใบ้ตามสัดส่วน) -> หน้าสรุป"""
+    rng = random.Random(args.seed * 100003 + index)
+    try:
+        async with websockets.connect(url, subprotocols=["streamlit"], max_size=None) as ws:
+            session = BrowserSession(ws, args.timeout)
+            await timed(recorder, "load", session.rerun())
+            group, room = f"LT-{index:04d}", f"ม.{index % args.rooms + 1}/{index % 12 + 1}"
+            name_label, room_label, start_label = START_LABELS
+            await timed(recorder, "start", session.rerun([(name_label, group), (room_label, room),
+                                                          (start_label, True)]))
+            answers = group_answers(answers, args, group, room)
+
+            for number in sorted(answers):
+                stage, key = answers[number]
+                if session.stage() != number:
+                    raise RuntimeError(f"expected stage {number}, got {session.stage()}")
+                if rng.random() < args.hint_rate:
+                    await timed(recorder, "hint", session.rerun([(f"hint_btn_{number}", True)]))
+
+                while rng.random() < args.wrong_rate:
+                    wrong = key.expected + max(1.0, key.tolerance * 10) * rng.choice((-1, 1))
+                    recorder.attempts += 1
+                    await timed(recorder, "wrong", session.rerun([(f"answer_{number}", answer_value(stage, wrong)),
+                                                                  (f"check_{number}", True)]))
+                    if args.think > 0:
+                        await asyncio.sleep(rng.expovariate(1 / args.think))
+
+                recorder.attempts += 1
+                await timed(recorder, "correct", session.rerun([(f"answer_{number}", answer_value(stage, key.expected)),
+                                                                (f"check_{number}", True)]))
+                await wait_transition(session, recorder)
+
+            if session.stage() is not None or start_label in session.widgets:
+                raise RuntimeError(f"did not reach summary (stage {session.stage()})")
+            recorder.completed += 1
+    except Exception as e:
+        recorder.errors.append(f"group {index}: {type(e).__name__}: {e}")
+
+
+# -------------------------------------------------
+# SERVER
+# -------------------------------------------------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, env: dict, log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "wb")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.headless", "true",
+         "--server.port", str(port), "--server.address", "127.0.0.1",
+         "--browser.gatherUsageStats", "false", "--server.fileWatcherType", "none"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"streamlit exited ({proc.returncode}), see {log_path}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as r:
+                if r.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit(f"streamlit did not start within 60 s, see {log_path}")
+
+
+def server_rss(pid: int):
+    """RSS ของเซิร์ฟเวอร์ (bytes) — None ถ้าอ่าน /proc ไม่ได้"""
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+# -------------------------------------------------
+# PHASES
+# -------------------------------------------------
+async def run_level(groups: int, first_index: int, url: str, args, answers: dict) -> dict:
+    recorder = Recorder()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(play(first_index + i, url, args, answers, recorder) for i in range(groups)))
+    return {"recorder": recorder, "wall_sec": time.perf_counter() - t0}
+
+
+def percentiles(values) -> dict:
+    if not values:
+        return {"n": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    arr = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"n": len(values), "p50": p50, "p95": p95, "p99": p99, "max": float(arr.max())}
+
+
+def level_summary(groups: int, level: dict, rss_before, rss_after) -> dict:
+    recorder = level["recorder"]
+    stats = {a: percentiles(recorder.samples.get(a, [])) for a in ACTIONS}
+    stats["check"] = percentiles([s for a in CHECK_ACTIONS for s in recorder.samples.get(a, [])])
+    stats["all"] = percentiles([s for a in ACTIONS for s in recorder.samples.get(a, [])])
+    rss = None
+    if rss_before is not None and rss_after is not None:
+        rss = (rss_after - rss_before) / groups
+    return {
+        "groups": groups,
+        "completed": recorder.completed,
+        "errors": recorder.errors,
+        "attempts": recorder.attempts,
+        "wall_sec": level["wall_sec"],
+        "attempts_per_sec": recorder.attempts / level["wall_sec"],
+        "latency_ms": stats,
+        "rss_per_session_bytes": rss,
+    }
+
+
+def fmt(value) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def report(args, levels: list, received: int, expected: int, rows: tuple, stub_failed: int,
+           delivered: bool) -> dict:
+    print()
+    print(f"wrong_rate={args.wrong_rate} hint_rate={args.hint_rate} think={args.think}s "
+          f"dataset={args.dataset_mode} webhook_latency={args.webhook_latency_ms:.0f}ms")
+    print("latency = client ส่ง rerun จนได้ script_finished (ทุกกลุ่มในระดับเล่นพร้อมกัน)")
+    print(f"{'groups':>6}{'done':>7}{'attempts':>10}{'wall s':>8}{'att/s':>8}"
+          f"{'check p50':>11}{'check p95':>11}{'all p50':>9}{'all p95':>9}{'KiB/sess':>10}")
+    for lv in levels:
+        check, every = lv["latency_ms"]["check"], lv["latency_ms"]["all"]
+        rss = "-" if lv["rss_per_session_bytes"] is None else f"{lv['rss_per_session_bytes'] / 1024:.0f}"
+        print(f"{lv['groups']:>6}{lv['completed']:>7}{lv['attempts']:>10}{lv['wall_sec']:>8.1f}"
+              f"{lv['attempts_per_sec']:>8.2f}{fmt(check['p50']):>11}{fmt(check['p95']):>11}"
+              f"{fmt(every['p50']):>9}{fmt(every['p95']):>9}{rss:>10}")
+
+    top = levels[-1]
+    print()
+    print(f"by action at {top['groups']} groups")
+    print(f"{'action':<12}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for action, s in top["latency_ms"].items():
+        if not s["n"]:
+            continue
+        print(f"{action:<12}{s['n']:>7}{s['p50']:>10.1f}{s['p95']:>10.1f}{s['p99']:>10.1f}{s['max']:>10.1f}")
+    print()
+    print(f"webhook          : received {received}/{expected}"
+          f"{'' if delivered else ' (not all delivered before timeout)'}"
+          f", all rounds {rows[0]} rows for {rows[1]} attempts"
+          f", stub failures {stub_failed}")
+    for lv in levels:
+        for message in lv["errors"][:10]:
+            print(f"  ! [{lv['groups']} groups] {message}")
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "levels": levels,
+        "webhook_received": received,
+        "webhook_expected": expected,
+        "webhook_rows_all_rounds": rows[0],
+        "webhook_attempts_all_rounds": rows[1],
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ทดสอบโหลด app.py บนเซิร์ฟเวอร์ Streamlit จริง")
+    parser.add_argument("--groups", type=int, nargs="+", default=[5, 10, 20],
+                        help="จำนวนกลุ่มที่เล่นพร้อมกัน ทีละระดับ (เช่น --groups 5 10 20 40)")
+    parser.add_argument("--rooms", type=int, default=3, help="จำนวนห้องเรียน")
+    parser.add_argument("--wrong-rate", type=float, default=0.35, help="โอกาสตอบผิดในแต่ละครั้ง")
+    parser.add_argument("--hint-rate", type=float, default=0.4, help="โอกาสกดขอใบ้ในแต่ละด่าน")
+    parser.add_argument("--think", type=float, default=0.0, help="เวลาคิดเฉลี่ยหลังตอบผิด (วินาที)")
+    parser.add_argument("--dataset-mode", choices=["shared", "group"], default="shared",
+                        help="ชุดข้อมูลของด่าน (เหมือน DATASET_MODE ของ app.py)")
+    parser.add_argument("--dataset-rows", type=int, default=None, help="จำนวนแถวต่อชุดข้อมูลเฉพาะกลุ่ม")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="เปิดตัวจำกัดความถี่การตอบของ app.py (ปิดไว้ เพราะกลุ่มจำลองตอบเร็วกว่าคนจริง)")
+    parser.add_argument("--coalesce-window", type=float, default=2.0,
+                        help="ATTEMPT_COALESCE_WINDOW ของ app.py (วินาที, 0 = ไม่รวมคำตอบซ้ำ)")
+    parser.add_argument("--webhook-latency-ms", type=float, default=200.0)
+    parser.add_argument("--webhook-fail-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="timeout ต่อหนึ่ง rerun (วินาที)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="บันทึกผลเป็นไฟล์ JSON")
+    args = parser.parse_args(argv)
+    args.groups = sorted(set(args.groups))
+    return args
+
+
+def main(argv=None) -> dict:
+    args = parse_args(argv)
+
+    stub = WebhookStub(latency=args.webhook_latency_ms / 1000,
+                       fail_rate=args.webhook_fail_rate, seed=args.seed).start()
+    workdir = Path(tempfile.mkdtemp(prefix="escape-loadtest-"))
+    env = dict(os.environ)
+    env.pop("RESULTS_API_URL", None)
+    env.update({
+        "WEBHOOK_URL": stub.url,
+        "ATTEMPT_JOURNAL_PATH": str(workdir / "attempts.db"),
+        "STATE_DB_PATH": str(workdir / "state.db"),
+        "DATASET_MODE": args.dataset_mode,
+        "DATASET_ROWS": str(args.dataset_rows or ""),
+        "ATTEMPT_RATE_LIMIT": "1" if args.rate_limit else "0",
+        "ATTEMPT_COALESCE_WINDOW": str(args.coalesce_window),
+    })
+    port = free_port()
+    server = start_server(port, env, workdir / "streamlit.log")
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    try:
+        answers = stage_answers()
+
+        # อุ่นเครื่อง: แคชเฉลย/รูป/เสียงของเซิร์ฟเวอร์ถูกสร้างครั้งแรกที่นี่ ไม่นับในผล
+        warmup = asyncio.run(run_level(1, -1, url, args, answers))["recorder"]
+        if warmup.errors:
+            raise SystemExit(f"warm-up failed: {warmup.errors[0]}")
+
+        levels = []
+        next_index = 0
+        for groups in args.groups:
+            before = server_rss(server.pid)
+            level = asyncio.run(run_level(groups, next_index, url, args, answers))
+            levels.append(level_summary(groups, level, before, server_rss(server.pid)))
+            next_index += groups
+
+        # ผลจากรอบอุ่นเครื่องก็ส่งเข้า stub ด้วย -> รอครบทั้งหมดแล้วหักออก
+        # (จำนวนแถวรวมทุกรอบ เพราะรวมคำตอบซ้ำแล้วแยกไม่ได้ว่าแถวไหนมาจากรอบใด)
+        expected = sum(lv["attempts"] for lv in levels)
+        total = warmup.attempts + expected
+        timeout = max(30.0, args.coalesce_window + args.webhook_latency_ms / 1000 * total)
+        delivered = stub.wait_for(total, timeout=timeout)
+        rows = (stub.count(), stub.attempts())
+        result = report(args, levels, rows[1] - warmup.attempts, expected, rows, stub.failed, delivered)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        stub.stop()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+สร้างบันทึกการตอบ (attempt log) ปลอมขนาดใหญ่ หน้าตาเหมือนชีตจริง (ทุกช่องเป็นข้อความ)
+
+    python benchmarks/synthetic.py 1000000 -o data/synthetic_1m.csv
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from leaderboard import CORRECT, WRONG  # noqa: E402
+from stages import FINAL_STAGE, STAGES  # noqa: E402
+
+COLUMNS = ["timestamp", "group_name", "classroom", "stage", "answer", "result", "time_used", "time_seconds",
+           "stage_seconds", "hints_used"]
+START = pd.Timestamp("2025-06-02 08:30:00")
+
+
+def room_name(i: int) -> str:
+    return f"ม.{i // 15 + 1}/{i % 15 + 1}"
+
+
+def generate_attempts(n_rows: int, n_groups: int = None, n_rooms: int = None,
+                      correct_rate: float = 0.55, legacy_fraction: float = 0.1,
+                      seed: int = 0) -> pd.DataFrame:
+    """
+    n_rows แถว จาก n_groups กลุ่มใน n_rooms ห้อง (ค่าเริ่มต้นประมาณ 60 แถวต่อกลุ่ม, 25 กลุ่มต่อห้อง)
+    - ด่านสุดท้ายที่ตอบถูกมีเวลาจบ (time_seconds + time_used)
+    - legacy_fraction ของแถวที่มีเวลา ไม่มี time_seconds (ข้อมูลเก่า ต้องแปลงจาก time_used)
+    - คำตอบถูกมีเวลาของด่าน (stage_seconds) แต่ละด่านยากไม่เท่ากัน, ข้อมูลเก่าไม่มี
+    - hints_used ประมาณ 30% ของแถว (ข้อมูลเก่าไม่มี)
+    """
+    rng = np.random.default_rng(seed)
+    n_groups = n_groups or max(10, n_rows // 60)
+    n_rooms = n_rooms or max(1, n_groups // 25)
+    stages = np.array([s.number for s in STAGES])
+
+    group = rng.integers(0, n_groups, n_rows)
+    stage = rng.choice(stages, n_rows)
+    correct = rng.random(n_rows) < correct_rate
+    offsets = np.sort(rng.integers(0, 6 * 3600, n_rows))
+
+    # เวลาจบของแต่ละกลุ่ม 10–60 นาที (แถวที่ตอบด่านสุดท้ายถูกซ้ำ = ช้ากว่าเดิมเล็กน้อย)
+    finish_base = rng.integers(600, 3600, n_groups)
+    finished = correct & (stage == FINAL_STAGE)
+    seconds = np.where(finished, finish_base[group] + rng.integers(0, 120, n_rows), -1)
+
+    time_used = pd.Series("", index=range(n_rows), dtype=object)
+    idx = np.flatnonzero(finished)
+    time_used.iloc[idx] = [f"{s // 60} นาที {s % 60} วินาที" for s in seconds[idx].tolist()]
+    time_seconds = pd.Series(seconds.astype(str), dtype=object).where(finished, "")
+    legacy = rng.random(n_rows) < legacy_fraction
+    time_seconds[finished & legacy] = ""
+
+    # เวลาต่อด่าน: ค่าเฉลี่ยของแต่ละด่าน 2–12 นาที กระจายแบบ gamma
+    stage_mean = rng.uniform(120, 720, stages.max() + 1)
+    split = np.round(rng.gamma(2.0, stage_mean[stage] / 2.0), 2)
+    stage_seconds = pd.Series(split.astype(str), dtype=object).where(correct & ~legacy, "")
+
+    group_names = np.array([f"ทีม{i:05d}" for i in range(n_groups)], dtype=object)
+    room_names = np.array([room_name(i) for i in range(n_rooms)], dtype=object)
+    group_room = rng.integers(0, n_rooms, n_groups)
+
+    timestamps = (START + pd.to_timedelta(offsets, unit="s")).strftime("%Y-%m-%d %H:%M:%S")
+    return pd.DataFrame({
+        "timestamp": np.asarray(timestamps, dtype=object),
+        "group_name": group_names[group],
+        "classroom": room_names[group_room[group]],
+        "stage": stage.astype(str).astype(object),
+        "answer": rng.integers(0, 5000, n_rows).astype(str).astype(object),
+        "result": np.where(correct, CORRECT, WRONG).astype(object),
+        "time_used": time_used.to_numpy(),
+        "time_seconds": time_seconds.to_numpy(),
+        "stage_seconds": stage_seconds.to_numpy(),
+        "hints_used": np.where(legacy, "", (rng.random(n_rows) < 0.3).astype(int).astype(str)).astype(object),
+    }, columns=COLUMNS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="สร้าง attempt log ปลอมเป็น CSV")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("--groups", type=int)
+    parser.add_argument("--rooms", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="synthetic_attempts.csv")
+    args = parser.parse_args()
+
+    df = generate_attempts(args.rows, args.groups, args.rooms, seed=args.seed)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(args.output, index=False)
+    print(f"{len(df):,} rows, {df['group_name'].nunique():,} groups, "
+          f"{df['classroom'].nunique():,} rooms -> {args.output}")
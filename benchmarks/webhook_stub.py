@@ -0,0 +1,114 @@
+"""
+webhook ปลอมในเครื่อง ใช้แทน Google Apps Script (WEBHOOK_URL) ตอนทดสอบโหลด
+
+รันเดี่ยว ๆ:  python benchmarks/webhook_stub.py --port 8700 --latency-ms 300
+แล้วตั้ง WEBHOOK_URL=http://127.0.0.1:8700/ ให้ app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class WebhookStub:
+    """
+    รับ POST แบบเดียวกับ webhook ของชีต แล้วนับจำนวนที่ได้รับ
+    - latency = หน่วงเวลาตอบ (จำลอง Apps Script ที่ช้า)
+    - fail_rate = สัดส่วนคำขอที่ตอบ 500 (ทดสอบการส่งซ้ำของ AttemptLogger)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, fail_rate: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.received = []
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                if stub.latency:
+                    time.sleep(stub.latency)
+                with stub._lock:
+                    fail = stub._rng.random() < stub.fail_rate
+                    if fail:
+                        stub.failed += 1
+                    else:
+                        try:
+                            stub.received.append(json.loads(body or b"{}"))
+                        except ValueError:
+                            stub.received.append({"raw": body.decode("utf-8", "replace")})
+                self.send_response(500 if fail else 200)
+                self.end_headers()
+                self.wfile.write(b"error" if fail else b"ok")
+
+            def do_GET(self):
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(b"ok")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self.received)
+
+    def attempts(self) -> int:
+        """จำนวนครั้งที่ตอบ (รายการที่รวมคำตอบซ้ำนับตามฟิลด์ count)"""
+        with self._lock:
+            return sum(int(r.get("count") or 1) for r in self.received)
+
+    def wait_for(self, n: int, timeout: float) -> bool:
+        """รอจนได้รับครบ n ครั้ง นับแบบ attempts() (คืน False ถ้าหมดเวลา)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.attempts() >= n:
+                return True
+            time.sleep(0.05)
+        return self.attempts() >= n
+
+    def start(self) -> "WebhookStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="webhook-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="webhook ปลอมสำหรับทดสอบ app.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = WebhookStub(args.host, args.port, args.latency_ms / 1000, args.fail_rate).start()
+    print(f"webhook stub: {stub.url}  (Ctrl+C เพื่อหยุด)")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"received={stub.count()} failed={stub.failed}")
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,272 @@
+import gzip
+import importlib.util
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from leaderboard import CORRECT, WRONG, attempt_counts, partial_aggregates, rank, split_stats
+from stage_analytics import StageAnalytics
+
+
+# -------------------------------------------------
+# NORMALIZE
+# -------------------------------------------------
+BASE_COLUMNS = ["group_name", "classroom", "stage", "result", "time_used", "timestamp"]
+SHOW_COLUMNS = ["timestamp", "group_name", "classroom", "stage", "answer", "result", "time_used", "time_seconds",
+                "stage_seconds", "hints_used", "count"]
+CATEGORY_COLUMNS = ["group_name", "classroom", "result"]
+
+TIME_USED_RE = r"(\d+)\s*นาที\s*(\d+)\s*วินาที"
+
+
+def convert_time_to_seconds(t: pd.Series) -> pd.Series:
+    """แปลง 'x นาที y วินาที' -> วินาที ทั้งคอลัมน์ (แถวที่อ่านไม่ได้ = NaN)"""
+    parts = t.astype("string").str.extract(TIME_USED_RE).astype(float)
+    return parts[0] * 60 + parts[1]
+
+
+def normalize_time_seconds(df: pd.DataFrame) -> pd.Series:
+    """ใช้ time_seconds (ตัวเลขจาก app.py) ก่อน ถ้าไม่มีค่อยแปลงจาก time_used (ข้อมูลเก่า)"""
+    if "time_seconds" in df.columns:
+        sec = pd.to_numeric(df["time_seconds"], errors="coerce")
+    else:
+        sec = pd.Series(float("nan"), index=df.index)
+    missing = sec.isna() & df["time_used"].notna()
+    if missing.any():
+        sec = sec.fillna(convert_time_to_seconds(df.loc[missing, "time_used"]))
+    return sec
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    เตรียมข้อมูลดิบจากชีตครั้งเดียว: เติมคอลัมน์ที่ขาด แปลงชนิดข้อมูล
+    และแปลงคอลัมน์ข้อความที่ซ้ำกันมากเป็น category (กรอง/groupby เร็วขึ้น ใช้หน่วยความจำน้อยลง)
+    """
+    df = df.reset_index(drop=True)
+    for col in BASE_COLUMNS + SHOW_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+
+    df["stage"] = pd.to_numeric(df["stage"], errors="coerce")
+    df["count"] = attempt_counts(df)
+    df["time_seconds"] = normalize_time_seconds(df)
+    df["stage_seconds"] = pd.to_numeric(df["stage_seconds"], errors="coerce")
+    df["hints_used"] = pd.to_numeric(df["hints_used"], errors="coerce")
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+
+    for col in CATEGORY_COLUMNS:
+        s = df[col]
+        df[col] = s.where(s.isna(), s.astype(str)).astype("category")
+    return df
+
+
+# -------------------------------------------------
+# AGGREGATES
+# -------------------------------------------------
+def compute_kpis(df: pd.DataFrame, final_stage: int) -> dict:
+    # แถวที่รวมคำตอบซ้ำนับตาม count
+    counts = attempt_counts(df)
+    total = int(counts.sum())
+    correct_n = int(counts[df["result"] == CORRECT].sum())
+    wrong_n = int(counts[df["result"] == WRONG].sum())
+
+    # จบเกม = ด่านสุดท้ายถูกต้อง + มีเวลา
+    done_df = df[(df["stage"] == final_stage) & (df["result"] == CORRECT)].dropna(subset=["time_seconds", "group_name"])
+    best = done_df.groupby("group_name", observed=True)["time_seconds"].min()
+
+    return {
+        "total": total,
+        "correct": correct_n,
+        "wrong": wrong_n,
+        "accuracy": (correct_n / total * 100) if total > 0 else 0.0,
+        "groups": int(df["group_name"].dropna().nunique()),
+        "rooms": int(df["classroom"].dropna().nunique()),
+        "done_groups": int(len(best)),
+        "avg_finish": float(best.mean()) if len(best) else None,
+    }
+
+
+def stage_chart(df: pd.DataFrame) -> pd.DataFrame:
+    """จำนวนตอบถูก/ผิดต่อด่าน (แถว = ด่าน, คอลัมน์ = ผล)"""
+    if len(df) == 0 or not df["stage"].notna().any():
+        return pd.DataFrame()
+    counts = attempt_counts(df)
+    return counts.groupby([df["stage"], df["result"]], observed=True).sum().unstack(fill_value=0).sort_index()
+
+
+# -------------------------------------------------
+# EXPORT
+# -------------------------------------------------
+EXPORT_CHUNK_ROWS = 50_000
+PARQUET_AVAILABLE = any(importlib.util.find_spec(m) for m in ("pyarrow", "fastparquet"))
+
+# รูปแบบไฟล์ดาวน์โหลด -> (นามสกุล, mime)
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "csv.gz": ("csv.gz", "application/gzip"),
+}
+if PARQUET_AVAILABLE:
+    EXPORT_FORMATS["parquet"] = ("parquet", "application/vnd.apache.parquet")
+
+
+def iter_csv_chunks(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """
+    CSV ทีละช่วงแถว (bytes) — ไม่ต้องสร้างข้อความ CSV ทั้งไฟล์ในหน่วยความจำ
+    ช่วงแรกมี BOM + หัวตาราง (utf-8-sig ให้ Excel อ่านภาษาไทยได้)
+    """
+    yield "\ufeff".encode("utf-8")
+    for start in range(0, max(len(df), 1), chunk_rows):
+        part = df.iloc[start:start + chunk_rows]
+        yield part.to_csv(index=False, header=start == 0).encode("utf-8")
+
+
+def write_export(df: pd.DataFrame, fmt: str, out, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """เขียนไฟล์ดาวน์โหลดลง file object (binary) ตามรูปแบบใน EXPORT_FORMATS"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"รูปแบบไฟล์ไม่รองรับ: {fmt} (ใช้ได้: {', '.join(EXPORT_FORMATS)})")
+    if fmt == "parquet":
+        df.to_parquet(out, index=False)
+    elif fmt == "csv.gz":
+        with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=6) as gz:
+            for chunk in iter_csv_chunks(df, chunk_rows):
+                gz.write(chunk)
+    else:
+        for chunk in iter_csv_chunks(df, chunk_rows):
+            out.write(chunk)
+
+
+def export_file(df: pd.DataFrame, fmt: str = "csv") -> io.BytesIO:
+    """
+    ไฟล์ดาวน์โหลดเป็น io.BytesIO — ชนิดที่ st.download_button รับจากฟังก์ชันแบบ deferred ได้
+    (Streamlit อ่านผลทั้งไฟล์เก็บใน media storage อยู่แล้ว พักไว้บนดิสก์ก็ไม่ได้ช่วยประหยัดหน่วยความจำ)
+    """
+    out = io.BytesIO()
+    write_export(df, fmt, out)
+    out.seek(0)
+    return out
+
+
+def export_csv(df: pd.DataFrame) -> bytes:
+    """CSV ทั้งไฟล์เป็น bytes (สร้างทีละช่วงแถว)"""
+    return b"".join(iter_csv_chunks(df))
+
+
+# -------------------------------------------------
+# FILTER-KEYED CACHE
+# -------------------------------------------------
+def filter_key(groups=(), rooms=(), stages=()) -> tuple:
+    return (tuple(sorted(groups)), tuple(sorted(rooms)), tuple(sorted(stages)))
+
+
+class DashboardCache:
+    """
+    ข้อมูลที่ normalize แล้วหนึ่งชุด + ผลสรุปที่จำไว้ตามชุดตัวกรอง (LRU)
+    - ตัวกรองเดิม = ได้ KPI / leaderboard / กราฟ จากแคชทันที
+    - ตารางเต็มใช้ลำดับที่เรียงตามเวลาไว้แล้วครั้งเดียว แล้วแบ่งหน้า
+    ใช้ร่วมกันได้หลาย session (มี lock)
+    """
+
+    def __init__(self, df: pd.DataFrame, required_stages, final_stage: int,
+                 maxsize: int = 32, rows_maxsize: int = 4):
+        self.df = df
+        self.required_stages = sorted(required_stages)
+        self.final_stage = final_stage
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+        # ลำดับแถวหลังกรองมีขนาดเท่าข้อมูล จึงจำไว้น้อยกว่าผลสรุป
+        self._limits = {"summary": maxsize, "options": maxsize, "analytics": maxsize, "rows": rows_maxsize}
+
+        # ลำดับแถว: ใหม่สุดก่อน, ไม่มีเวลาไว้ท้าย
+        self.order = (
+            df["timestamp"].reset_index(drop=True)
+              .sort_values(ascending=False, na_position="last", kind="stable")
+              .index.to_numpy()
+        )
+
+    def _memo(self, key, compute):
+        """key = (ชนิด, ตัวกรอง) — แต่ละชนิดมีขนาด LRU ของตัวเอง"""
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return self._lru[key]
+        value = compute()
+        with self._lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            kind = key[0]
+            same_kind = [k for k in self._lru if k[0] == kind]
+            for old in same_kind[:max(0, len(same_kind) - self._limits[kind])]:
+                del self._lru[old]
+        return value
+
+    def _category_mask(self, col: str, selected) -> np.ndarray:
+        cat = self.df[col].cat
+        codes = cat.categories.get_indexer([str(v) for v in selected])
+        return np.isin(cat.codes.to_numpy(), codes[codes >= 0])
+
+    def mask(self, key: tuple) -> np.ndarray:
+        """ตัวกรองว่าง = ไม่กรอง (เหมือนเดิม)"""
+        groups, rooms, stages = key
+        m = np.ones(len(self.df), dtype=bool)
+        if groups:
+            m &= self._category_mask("group_name", groups)
+        if rooms:
+            m &= self._category_mask("classroom", rooms)
+        if stages:
+            m &= self.df["stage"].isin(stages).to_numpy()
+        return m
+
+    def _unique(self, col: str, m: np.ndarray) -> list:
+        values = self.df.loc[m, col].dropna()
+        if col == "stage":
+            return sorted(values.astype(int).unique().tolist())
+        return sorted(values.astype(str).unique().tolist())
+
+    def options(self, groups=(), rooms=()) -> tuple:
+        """ตัวเลือกของแต่ละตัวกรอง (ห้องขึ้นกับกลุ่มที่เลือก, ด่านขึ้นกับกลุ่ม+ห้อง)"""
+        key = ("options", filter_key(groups, rooms))
+
+        def compute():
+            m_all = np.ones(len(self.df), dtype=bool)
+            m_group = self.mask(filter_key(groups))
+            m_room = self.mask(filter_key(groups, rooms))
+            return (
+                self._unique("group_name", m_all),
+                self._unique("classroom", m_group),
+                self._unique("stage", m_room),
+            )
+
+        return self._memo(key, compute)
+
+    def summary(self, key: tuple) -> dict:
+        """KPI + leaderboard + กราฟ + เวลาต่อด่าน ของชุดตัวกรองนี้"""
+        def compute():
+            sub = self.df[self.mask(key)]
+            agg = partial_aggregates(sub, self.required_stages, self.final_stage)
+            return {
+                "kpis": compute_kpis(sub, self.final_stage),
+                "leader": rank(agg, self.required_stages),
+                "chart": stage_chart(sub),
+                "splits": split_stats(agg, self.required_stages),
+            }
+
+        return self._memo(("summary", key), compute)
+
+    def analytics(self, key: tuple) -> StageAnalytics:
+        """สถิติความยากรายด่านของชุดตัวกรองนี้ (report() จำผลไว้ในตัวเอง)"""
+        return self._memo(("analytics", key), lambda: StageAnalytics.from_frame(self.filtered(key)))
+
+    def sorted_positions(self, key: tuple) -> np.ndarray:
+        return self._memo(("rows", key), lambda: self.order[self.mask(key)[self.order]])
+
+    def page(self, key: tuple, page: int, page_size: int) -> pd.DataFrame:
+        """หนึ่งหน้าของตารางเต็ม (เรียงใหม่สุดก่อน)"""
+        pos = self.sorted_positions(key)
+        start = max(0, (page - 1) * page_size)
+        return self.df.iloc[pos[start:start + page_size]][SHOW_COLUMNS]
+
+    def filtered(self, key: tuple) -> pd.DataFrame:
+        return self.df[self.mask(key)]
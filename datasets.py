@@ -0,0 +1,200 @@
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from answer_keys import AnswerKey, compute_answer
+
+
+# -------------------------------------------------
+# PER-GROUP DATASETS
+# -------------------------------------------------
+MONTHS = np.array(["January", "February", "March", "April", "May", "June", "July",
+                   "August", "September", "October", "November", "December"], dtype=object)
+
+
+def _sales(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Month": rng.choice(MONTHS, n),
+        "Product": rng.choice(np.array(["A", "B", "C"], dtype=object), n),
+        "Sales": rng.integers(900, 2000, n),
+    })
+
+
+def _exercise(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    minutes = rng.integers(15, 91, n)
+    return pd.DataFrame({
+        "User": np.char.add("User", np.arange(1, n + 1).astype(str)).astype(object),
+        "ExerciseMinutes": minutes,
+        "CaloriesBurned": np.rint(minutes * rng.uniform(4.5, 5.5, n)).astype(np.int64),
+    })
+
+
+def _electricity(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Month": rng.choice(MONTHS, n),
+        "Units": rng.integers(150, 351, n),
+        "Cost": rng.integers(700, 1800, n),
+    })
+
+
+def _web(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    # ข้อมูลใหญ่เกินหนึ่งปี -> รายชั่วโมง (วันที่รายวันจะเกินช่วงที่ pandas รองรับ)
+    # แปลงเป็นข้อความด้วย numpy (strftime ของ pandas ช้ามากเมื่อหลายแสนแถว)
+    unit = "D" if n <= 366 else "h"
+    dates = np.datetime64("2025-01-01", unit) + np.arange(n).astype(f"timedelta64[{unit}]")
+    text = np.datetime_as_string(dates, unit=unit)
+    if unit == "h":
+        text = np.char.add(np.char.replace(text, "T", " "), ":00")
+    return pd.DataFrame({
+        "Date": text.astype(object),
+        "Visitors": rng.integers(200, 700, n),
+    })
+
+
+def _internet(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Age": rng.integers(13, 19, n),
+        "Gender": rng.choice(np.array(["Male", "Female"], dtype=object), n),
+        "HoursUsed": rng.integers(1, 10, n),
+        "Device": rng.choice(np.array(["Tablet", "Computer", "Mobile"], dtype=object), n),
+    })
+
+
+# ไฟล์ของด่าน -> ตัวสร้างข้อมูลชุดใหม่ (คอลัมน์และช่วงค่าเหมือนไฟล์ต้นฉบับ)
+GENERATORS = {
+    "1sales.csv": _sales,
+    "2exercise.csv": _exercise,
+    "3electricity.csv": _electricity,
+    "4web.csv": _web,
+    "5internet.csv": _internet,
+}
+
+
+def resample(source: pd.DataFrame):
+    """ตัวสร้างสำรองสำหรับด่านที่ไม่มีใน GENERATORS: สุ่มแถวจากไฟล์ต้นฉบับ (มีซ้ำได้)"""
+    def generate(rng: np.random.Generator, n: int) -> pd.DataFrame:
+        return source.iloc[rng.integers(0, len(source), n)].reset_index(drop=True)
+    return generate
+
+
+def dataset_seed(stage_number: int, group: str, room: str) -> int:
+    """seed คงที่ต่อ (ด่าน, กลุ่ม, ห้อง) — เหมือนกันทุก process/ทุกครั้งที่รีสตาร์ต"""
+    key = f"{stage_number}|{group.strip().casefold()}|{room.strip().casefold()}"
+    return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "big")
+
+
+# อักขระที่ใช้ในชื่อไฟล์ไม่ได้ (Windows/macOS/Linux)
+UNSAFE_FILE_CHARS = frozenset('\\/:*?"<>|')
+
+
+def safe_file_part(text: str) -> str:
+    """
+    ส่วนของชื่อไฟล์จากชื่อกลุ่ม: ตัดเฉพาะตัวคั่น path / อักขระที่ชื่อไฟล์ใช้ไม่ได้ / อักขระควบคุม
+    (สระและวรรณยุกต์ไทยเป็นอักขระ Mn ต้องเก็บไว้ — isalnum() จะตัดทิ้ง)
+    """
+    text = unicodedata.normalize("NFC", text.strip())
+    kept = []
+    for c in text:
+        if c.isspace():
+            kept.append("_")
+        elif c not in UNSAFE_FILE_CHARS and not unicodedata.category(c).startswith("C"):
+            kept.append(c)
+    return "".join(kept).strip("._") or "group"
+
+
+@dataclass(frozen=True)
+class GroupDataset:
+    csv: bytes
+    answer: AnswerKey
+    rows: int
+
+
+class DatasetFactory:
+    """
+    สร้างไฟล์ CSV ของแต่ละด่านให้แต่ละกลุ่มไม่ซ้ำกัน (กลุ่มเดิม = ได้ไฟล์เดิมทุกครั้ง)
+    - rows=None ใช้จำนวนแถวเท่าไฟล์ต้นฉบับ, หรือกำหนดเอง (เช่น 100_000)
+    - เฉลยคิดครั้งเดียวตอนสร้าง (AnswerSpec เดียวกับไฟล์ต้นฉบับ) แล้วจำไว้พร้อม CSV
+      (LRU จำกัดขนาด CSV รวมไม่เกิน max_bytes — ถูกลบไปแล้วก็สร้างใหม่ได้ผลเดิม)
+    - ดาวน์โหลดจาก bytes ในหน่วยความจำ ไม่มีไฟล์ชั่วคราว
+    """
+
+    def __init__(self, rows: int = None, max_bytes: int = 128 * 2**20):
+        self.rows = rows
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+        self._bytes = 0
+        self._pending = set()
+        self._source_rows = {}
+
+    def _generator(self, file: str):
+        if file in GENERATORS:
+            return GENERATORS[file]
+        return resample(pd.read_csv(file))
+
+    def _size(self, file: str) -> int:
+        if self.rows:
+            return self.rows
+        if file not in self._source_rows:
+            with open(file, "rb") as f:
+                self._source_rows[file] = max(1, sum(1 for _ in f) - 1)
+        return self._source_rows[file]
+
+    def generate(self, stage, group: str, room: str) -> GroupDataset:
+        spec = stage.answer_spec
+        rng = np.random.default_rng(dataset_seed(stage.number, group, room))
+        df = self._generator(spec.file)(rng, self._size(spec.file))
+        answer = AnswerKey(compute_answer(df, spec), spec.tolerance)
+        return GroupDataset(df.to_csv(index=False).encode("utf-8"), answer, len(df))
+
+    def _key(self, stage, group: str, room: str) -> tuple:
+        return stage.number, dataset_seed(stage.number, group, room), self.rows
+
+    def get(self, stage, group: str, room: str) -> GroupDataset:
+        key = self._key(stage, group, room)
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return self._lru[key]
+        value = self.generate(stage, group, room)
+        with self._lock:
+            if key not in self._lru:
+                self._bytes += len(value.csv)
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            # เก็บตัวล่าสุดไว้เสมอ แม้ไฟล์เดียวจะใหญ่กว่า max_bytes
+            while self._bytes > self.max_bytes and len(self._lru) > 1:
+                _, old = self._lru.popitem(last=False)
+                self._bytes -= len(old.csv)
+        return value
+
+    def prefetch(self, stage, group: str, room: str):
+        """สร้างชุดข้อมูลล่วงหน้าใน thread เบื้องหลัง (เช่น ด่านถัดไป) ถ้ายังไม่มีในแคช"""
+        key = self._key(stage, group, room)
+        with self._lock:
+            if key in self._lru or key in self._pending:
+                return
+            self._pending.add(key)
+
+        def run():
+            try:
+                self.get(stage, group, room)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+        threading.Thread(target=run, name="dataset-prefetch", daemon=True).start()
+
+    def cached_bytes(self) -> int:
+        with self._lock:
+            return self._bytes
+
+    def file_name(self, stage, group: str) -> str:
+        """ชื่อไฟล์ดาวน์โหลด เช่น 1sales_ทีมเสือ.csv"""
+        stem = Path(stage.file).stem
+        return f"{stem}_{safe_file_part(group)}.csv"
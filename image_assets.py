@@ -0,0 +1,91 @@
+import hashlib
+import threading
+from pathlib import Path
+
+from PIL import Image
+
+
+# -------------------------------------------------
+# IMAGE VARIANTS (ย่อรูป + บีบอัด)
+# -------------------------------------------------
+# ความกว้างสูงสุด (px) ของแต่ละขนาด — เผื่อจอความละเอียดสูง 2 เท่าแล้ว
+VARIANTS = {
+    "thumb": 160,     # เหรียญในแถบข้าง / หน้าสรุป
+    "sidebar": 480,   # mascot / โลโก้ในแถบข้าง
+    "content": 1280,  # รูปประจำด่าน (ความกว้างเนื้อหา layout="centered")
+}
+
+IMAGE_CACHE_DIR = Path("static") / "img"
+
+
+class ImageVariants:
+    """
+    สร้างรูปขนาดเล็ก (WebP) จากรูปต้นฉบับ แล้วตั้งชื่อไฟล์ด้วย hash ของเนื้อหา
+    เช่น badge1.3fa2c0d1e9b4.thumb.webp — รูปต้นฉบับเปลี่ยน = ได้ชื่อไฟล์ใหม่
+    สร้างครั้งเดียวแล้วใช้ซ้ำ (ทั้งข้าม session และข้ามการรีสตาร์ต)
+    """
+
+    def __init__(self, out_dir=IMAGE_CACHE_DIR, quality: int = 82):
+        self.out_dir = Path(out_dir)
+        self.quality = quality
+        self._lock = threading.Lock()
+        # (path, variant, mtime_ns) -> path ของรูปที่ย่อแล้ว
+        self._paths = {}
+
+    def get(self, path, variant: str) -> str:
+        """path ของรูปขนาด variant (ถ้าย่อไม่ได้จะคืนรูปต้นฉบับ)"""
+        src = Path(path)
+        try:
+            key = (str(src), variant, src.stat().st_mtime_ns)
+        except OSError:
+            return str(src)
+
+        with self._lock:
+            cached = self._paths.get(key)
+            if cached is None:
+                try:
+                    cached = str(self._build(src, variant))
+                except OSError:
+                    cached = str(src)
+                self._paths[key] = cached
+            return cached
+
+    def _build(self, src: Path, variant: str) -> Path:
+        data = src.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        target = self.out_dir / f"{src.stem}.{digest}.{variant}.webp"
+        if target.exists():
+            return target
+
+        max_width = VARIANTS[variant]
+        with Image.open(src) as im:
+            im.load()
+            if im.width > max_width:
+                height = round(im.height * max_width / im.width)
+                im = im.resize((max_width, height), Image.LANCZOS)
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(".tmp")
+            im.save(tmp, format="WEBP", quality=self.quality, method=6)
+            tmp.replace(target)
+        return target
+
+    def prebuild(self, plan):
+        """สร้างรูปล่วงหน้า: plan = [(path, variant), ...]"""
+        return [self.get(p, v) for p, v in plan]
+
+
+def default_plan(assets_dir=Path("assets")):
+    assets_dir = Path(assets_dir)
+    plan = [(p, "thumb") for p in sorted(assets_dir.glob("badge*.png"))]
+    plan += [(p, "content") for p in sorted(assets_dir.glob("stage*.png"))]
+    plan += [(assets_dir / "mascot.png", "sidebar")]
+    return plan
+
+
+if __name__ == "__main__":
+    # สร้างรูปทั้งหมดล่วงหน้า (เช่น ตอน build/deploy): python image_assets.py
+    variants = ImageVariants()
+    for (src, variant), out in zip(default_plan(), variants.prebuild(default_plan())):
+        before = Path(src).stat().st_size if Path(src).exists() else 0
+        after = Path(out).stat().st_size if Path(out).exists() else 0
+        print(f"{src} [{variant}] {before // 1024} KB -> {out} {after // 1024} KB")
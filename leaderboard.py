@@ -0,0 +1,127 @@
+import pandas as pd
+
+
+# -------------------------------------------------
+# LEADERBOARD ENGINE (vectorized)
+# -------------------------------------------------
+KEYS = ["group_name", "classroom"]
+CORRECT = "ถูกต้อง"
+WRONG = "ผิด"
+
+
+def stage_column(stage: int) -> str:
+    return f"stage_{stage}"
+
+
+def split_column(stage: int) -> str:
+    return f"split_{stage}"
+
+
+def attempt_counts(df: pd.DataFrame) -> pd.Series:
+    """จำนวนครั้งที่แต่ละแถวแทน (app.py รวมคำตอบผิดซ้ำติด ๆ เป็นแถวเดียว, ข้อมูลเก่า = 1)"""
+    if "count" not in df.columns:
+        return pd.Series(1, index=df.index, dtype="int64")
+    return pd.to_numeric(df["count"], errors="coerce").fillna(1).clip(lower=1).astype("int64")
+
+
+def partial_aggregates(df: pd.DataFrame, required_stages, final_stage: int) -> pd.DataFrame:
+    """
+    สรุปต่อ (group_name, classroom) ใน groupby ครั้งเดียว
+    - attempts / wrong = จำนวนครั้งที่ตอบ / ตอบผิด (นับตาม count ของแต่ละแถว)
+    - stage_N = จำนวนครั้งที่ตอบถูกด่าน N (ผ่านด่าน = มากกว่า 0)
+    - finish = เวลาจบเกมที่เร็วที่สุด (ด่านสุดท้ายถูกต้อง)
+    - split_N = เวลาที่ใช้ในด่าน N (stage_seconds ของคำตอบถูก, ข้อมูลเก่าไม่มี = NaN)
+    ทุกคอลัมน์รวมกันต่อได้ (sum / min) จึงใช้อัปเดตแบบเพิ่มทีละส่วนได้
+    """
+    correct = df["result"].eq(CORRECT)
+    stage = pd.to_numeric(df["stage"], errors="coerce")
+
+    parts = {k: df[k] for k in KEYS}
+    counts = attempt_counts(df)
+    parts["attempts"] = counts
+    parts["wrong"] = counts.where(df["result"].eq(WRONG), 0)
+    for s in required_stages:
+        parts[stage_column(s)] = (correct & stage.eq(s)).astype(int)
+    parts["finish"] = pd.to_numeric(df["time_seconds"], errors="coerce").where(correct & stage.eq(final_stage))
+    if "stage_seconds" in df.columns:
+        split = pd.to_numeric(df["stage_seconds"], errors="coerce")
+    else:
+        split = pd.Series(float("nan"), index=df.index)
+    for s in required_stages:
+        parts[split_column(s)] = split.where(correct & stage.eq(s))
+
+    frame = pd.DataFrame(parts)
+    return frame.groupby(KEYS, sort=False, observed=True).agg(_agg_spec(frame.columns))
+
+
+def _agg_spec(columns) -> dict:
+    return {c: ("min" if c == "finish" or c.startswith("split_") else "sum") for c in columns if c not in KEYS}
+
+
+def combine(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """รวมผลสรุปสองชุด (เช่น ของเดิม + แถวใหม่)"""
+    if a is None or a.empty:
+        return b
+    if b is None or b.empty:
+        return a
+    both = pd.concat([a, b])
+    return both.groupby(level=KEYS, sort=False, observed=True).agg(_agg_spec(both.columns))
+
+
+def rank(agg: pd.DataFrame, required_stages) -> pd.DataFrame:
+    """เฉพาะกลุ่มที่ผ่านครบทุกด่านและมีเวลาจบ เรียงตามเวลา (เร็วสุดก่อน) พร้อมเวลาต่อด่าน"""
+    cols = [stage_column(s) for s in required_stages]
+    splits = [split_column(s) for s in required_stages]
+    if agg is None or agg.empty:
+        return pd.DataFrame(columns=KEYS + ["time_seconds", "attempts", "wrong"] + splits)
+    passed_all = agg[cols].gt(0).all(axis=1) & agg["finish"].notna()
+    leader = (
+        agg.loc[passed_all, ["finish", "attempts", "wrong"] + splits]
+           .rename(columns={"finish": "time_seconds"})
+           .reset_index()
+           .sort_values(["time_seconds", "attempts"], kind="stable")
+           .reset_index(drop=True)
+    )
+    return leader
+
+
+def build_leaderboard(df: pd.DataFrame, required_stages, final_stage: int) -> pd.DataFrame:
+    return rank(partial_aggregates(df, required_stages, final_stage), required_stages)
+
+
+def split_stats(agg: pd.DataFrame, required_stages) -> pd.DataFrame:
+    """
+    คอขวดรายด่าน: มัธยฐาน / P90 ของเวลาที่แต่ละกลุ่มใช้ในด่านนั้น (วินาที)
+    แถว = ด่าน, คิดจากผลสรุปของ partial_aggregates (ใช้ได้ทั้งโหมดปกติและโหมดสด)
+    """
+    columns = ["teams", "median", "p90"]
+    if agg is None or agg.empty:
+        return pd.DataFrame(columns=columns)
+    rows = {}
+    for s in required_stages:
+        values = agg[split_column(s)].dropna()
+        if len(values):
+            rows[s] = (len(values), values.median(), values.quantile(0.9))
+    out = pd.DataFrame.from_dict(rows, orient="index", columns=columns)
+    out.index.name = "stage"
+    return out
+
+
+class LeaderboardState:
+    """เก็บผลสรุปไว้ แล้ว update() ด้วยแถวใหม่เท่านั้น (ไม่ต้องคำนวณทั้งชีตใหม่)"""
+
+    def __init__(self, required_stages, final_stage: int):
+        self.required_stages = sorted(required_stages)
+        self.final_stage = final_stage
+        self.agg = None
+        self.rows_seen = 0
+
+    def update(self, new_rows: pd.DataFrame):
+        if len(new_rows) == 0:
+            return
+        part = partial_aggregates(new_rows, self.required_stages, self.final_stage)
+        self.agg = combine(self.agg, part)
+        self.rows_seen += len(new_rows)
+
+    def table(self) -> pd.DataFrame:
+        return rank(self.agg, self.required_stages)
@@ -0,0 +1,186 @@
+import threading
+import time
+
+import pandas as pd
+
+from dashboard import normalize_frame
+from leaderboard import CORRECT, WRONG, LeaderboardState, attempt_counts, split_stats
+from stage_analytics import StageAnalytics
+
+
+# -------------------------------------------------
+# INCREMENTAL LIVE AGGREGATES
+# -------------------------------------------------
+class LiveAggregates:
+    """KPI + leaderboard + กราฟรายด่าน ที่อัปเดตด้วยแถวใหม่เท่านั้น"""
+
+    def __init__(self, required_stages, final_stage: int):
+        self.required_stages = required_stages
+        self.final_stage = final_stage
+        self.reset()
+
+    def reset(self):
+        self.board = LeaderboardState(self.required_stages, self.final_stage)
+        self.total = 0
+        self.correct = 0
+        self.wrong = 0
+        self.groups = set()
+        self.rooms = set()
+        self.chart_counts = None
+
+    def on_rows(self, rows: pd.DataFrame, reset: bool):
+        """ผู้ติดตามของ LiveFeed"""
+        if reset:
+            self.reset()
+        self.update(rows)
+
+    def update(self, rows: pd.DataFrame):
+        if len(rows) == 0:
+            return
+        self.board.update(rows)
+        counts = attempt_counts(rows)
+        self.total += int(counts.sum())
+        self.correct += int(counts[rows["result"] == CORRECT].sum())
+        self.wrong += int(counts[rows["result"] == WRONG].sum())
+        self.groups.update(rows["group_name"].dropna().astype(str).unique())
+        self.rooms.update(rows["classroom"].dropna().astype(str).unique())
+
+        staged = rows.dropna(subset=["stage", "result"])
+        by_stage = counts[staged.index].groupby([staged["stage"], staged["result"].astype(str)]).sum()
+        if self.chart_counts is None:
+            self.chart_counts = by_stage
+        else:
+            self.chart_counts = self.chart_counts.add(by_stage, fill_value=0).astype("int64")
+
+    def kpis(self) -> dict:
+        # จบเกม = เวลาจบที่เร็วที่สุดของแต่ละกลุ่ม (เหมือน dashboard.compute_kpis)
+        best = pd.Series(dtype=float)
+        if self.board.agg is not None:
+            best = self.board.agg["finish"].groupby(level="group_name", observed=True).min().dropna()
+        return {
+            "total": self.total,
+            "correct": self.correct,
+            "wrong": self.wrong,
+            "accuracy": (self.correct / self.total * 100) if self.total > 0 else 0.0,
+            "groups": len(self.groups),
+            "rooms": len(self.rooms),
+            "done_groups": int(len(best)),
+            "avg_finish": float(best.mean()) if len(best) else None,
+        }
+
+    def chart(self) -> pd.DataFrame:
+        if self.chart_counts is None or self.chart_counts.empty:
+            return pd.DataFrame()
+        return self.chart_counts.unstack(fill_value=0).sort_index()
+
+
+# -------------------------------------------------
+# IN-PROCESS PUB/SUB FEED
+# -------------------------------------------------
+class LiveFeed:
+    """
+    thread เบื้องหลังหนึ่งตัวต่อ process: ดึงแถวใหม่จาก loader (ชีต/results_service)
+    แล้วส่ง (rows, reset) ให้ผู้ติดตามทุกตัว — หน้าจอครูทุกเครื่องใช้ผลชุดเดียวกัน
+    loader ต้องมี refresh() และ since(position) -> (generation, rows)
+    ไม่มีหน้าจอไหนเรียก snapshot() นานเกิน idle_timeout วินาที = หยุดดึง (ไม่โหลดชีตเปล่า ๆ)
+    แล้วเริ่มดึงใหม่เองเมื่อมีคนเรียก snapshot() ครั้งถัดไป
+    """
+
+    def __init__(self, loader, required_stages, final_stage: int, interval: float = 2.0,
+                 idle_timeout: float = 60.0):
+        self.loader = loader
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.aggregates = LiveAggregates(required_stages, final_stage)
+        self.analytics = StageAnalytics()
+        self.version = 0
+        self.updated_at = None
+        self.last_error = ""
+        self._lock = threading.Lock()
+        self._subscribers = [self.aggregates.on_rows, self.analytics.on_rows]
+        self._position = 0
+        self._generation = None
+        self._snapshot = (None, None)
+        self._run_lock = threading.Lock()
+        self._last_read = time.monotonic()
+        self._thread = None
+        self._ensure_running()
+
+    def _ensure_running(self):
+        with self._run_lock:
+            self._last_read = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+                self._thread.start()
+
+    @property
+    def running(self) -> bool:
+        with self._run_lock:
+            return self._thread is not None
+
+    def subscribe(self, callback):
+        """
+        callback(rows, reset) ถูกเรียกเมื่อมีแถวใหม่ (reset=True = ล้างของเดิมก่อน)
+        คืนฟังก์ชันสำหรับยกเลิก
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def poll_once(self):
+        self.loader.refresh()
+        generation, rows = self.loader.since(self._position)
+        with self._lock:
+            reset = generation != self._generation
+            if reset:
+                # ข้อมูลถูกโหลดใหม่ทั้งชุด -> เริ่มนับใหม่จากแถวแรก
+                generation, rows = self.loader.since(0)
+                self._position = 0
+                self._generation = generation
+            self._position += len(rows)
+            self.updated_at = time.time()
+            if len(rows) == 0 and not reset:
+                return
+            try:
+                normalized = normalize_frame(rows)
+                for callback in list(self._subscribers):
+                    callback(normalized, reset)
+            except Exception:
+                # ผู้ติดตามอาจได้ข้อมูลไม่ครบ -> รอบหน้าเริ่มนับใหม่ทั้งชุด
+                self._generation = None
+                raise
+            finally:
+                self.version += 1
+
+    def snapshot(self) -> dict:
+        """ผลสรุปล่าสุด (คำนวณครั้งเดียวต่อ version ใช้ร่วมกันทุกหน้าจอ)"""
+        self._ensure_running()
+        with self._lock:
+            version, data = self._snapshot
+            if version != self.version:
+                data = {
+                    "kpis": self.aggregates.kpis(),
+                    "leader": self.aggregates.board.table(),
+                    "chart": self.aggregates.chart(),
+                    "splits": split_stats(self.aggregates.board.agg, self.aggregates.board.required_stages),
+                }
+                self._snapshot = (self.version, data)
+            return data
+
+    def _run(self):
+        while True:
+            with self._run_lock:
+                if time.monotonic() - self._last_read > self.idle_timeout:
+                    self._thread = None
+                    return
+            try:
+                self.poll_once()
+                self.last_error = ""
+            except Exception as e:
+                self.last_error = str(e)
+            time.sleep(self.interval)
@@ -0,0 +1,239 @@
+// ช่องเขียนโค้ด pandas (Streamlit component): รันด้วย Pyodide ใน Web Worker ของเบราว์เซอร์ผู้เล่น
+// โปรโตคอลกับ Streamlit (postMessage กับหน้าหลัก):
+//   ส่ง streamlit:componentReady -> ได้ streamlit:render {args, disabled, theme} ทุก rerun
+//   ส่ง streamlit:setComponentValue {answer, nonce} เมื่อกดส่งคำตอบ, streamlit:setFrameHeight เมื่อขนาดเปลี่ยน
+// args: csv (bytes), data_key, stage, initial_code, pyodide_url, timeout_ms
+// เซิร์ฟเวอร์ได้แค่ตัวเลขคำตอบไปตรวจเหมือนช่องกรอกคำตอบ — ไม่เคยรันโค้ดของผู้เล่น
+"use strict";
+
+const MAX_CODE = 20000;
+const MAX_OUTPUT = 4000;
+
+const els = {};
+for (const id of ["code", "run", "status", "stdout", "display", "error", "info", "submit"]) {
+  els[id] = document.getElementById(id);
+}
+
+let args = null;
+let disabled = false;
+let busy = false;
+let lastValue = null;
+
+// worker ปัจจุบัน: {worker, ready (Promise), loaded (data_key ที่อ่านแล้ว), pending}
+let runner = null;
+let nextId = 1;
+
+function send(type, data) {
+  window.parent.postMessage(Object.assign({ isStreamlitMessage: true, type }, data), "*");
+}
+
+function updateHeight() {
+  send("streamlit:setFrameHeight", { height: document.documentElement.scrollHeight });
+}
+
+function draftKey() {
+  return `pandas_cell:${args.stage}`;
+}
+
+function loadDraft() {
+  try {
+    return window.localStorage.getItem(draftKey());
+  } catch (err) {
+    return null;
+  }
+}
+
+function saveDraft() {
+  try {
+    window.localStorage.setItem(draftKey(), els.code.value);
+  } catch (err) {
+    // localStorage ใช้ไม่ได้ (เช่น โหมดส่วนตัว) — ไม่จำโค้ดร่าง
+  }
+}
+
+// ---------- worker ----------
+function startRunner() {
+  if (runner !== null || args === null) {
+    return runner;
+  }
+  const worker = new Worker("worker.js");
+  const current = { worker, loaded: null, pending: null };
+  current.ready = new Promise((resolve, reject) => {
+    worker.onmessage = (event) => {
+      const msg = event.data;
+      if (msg.type === "ready") {
+        resolve();
+      } else if (msg.type === "failed") {
+        reject(new Error(msg.error));
+      } else if (msg.type === "result" && current.pending && current.pending.id === msg.id) {
+        current.loaded = msg.loaded;
+        current.pending.finish(msg.result);
+      }
+    };
+    worker.onerror = (event) => {
+      event.preventDefault();
+      const error = "ตัวรันหยุดทำงาน (ใช้หน่วยความจำมากเกินไป?) — กำลังเริ่มตัวรันใหม่";
+      reject(new Error(event.message || error));
+      if (current.pending) {
+        current.pending.finish({ error });
+      }
+      stopRunner(current);
+    };
+  });
+  current.ready.catch(() => stopRunner(current));
+  worker.postMessage({ type: "init", indexURL: args.pyodide_url });
+  runner = current;
+  return current;
+}
+
+function stopRunner(current) {
+  current.worker.terminate();
+  if (runner === current) {
+    runner = null;
+  }
+}
+
+function execute(current, code) {
+  const key = args.data_key;
+  const id = nextId++;
+  return new Promise((resolve) => {
+    const seconds = args.timeout_ms / 1000;
+    const timer = setTimeout(() => {
+      current.pending = null;
+      stopRunner(current);
+      startRunner();
+      resolve({ error: `รันนานเกิน ${seconds} วินาที (มีลูปที่ไม่จบหรือไม่?) — เริ่มตัวรันใหม่แล้ว` });
+    }, args.timeout_ms);
+    current.pending = {
+      id,
+      finish(result) {
+        clearTimeout(timer);
+        current.pending = null;
+        resolve(result);
+      },
+    };
+    const csv = current.loaded === key ? null : args.csv;
+    current.worker.postMessage({ type: "run", id, key, csv, code, maxOutput: MAX_OUTPUT });
+  });
+}
+
+// ---------- UI ----------
+function setBusy(value, status) {
+  busy = value;
+  els.status.textContent = status || "";
+  els.run.disabled = busy || disabled;
+  els.submit.disabled = busy || disabled;
+}
+
+function showBlock(el, text) {
+  el.textContent = text || "";
+  el.hidden = !text;
+}
+
+function showResult(result) {
+  showBlock(els.stdout, result.stdout);
+  showBlock(els.display, result.display);
+  showBlock(els.error, result.error);
+  lastValue = null;
+  let info = "";
+  if (!result.error && "value" in result) {
+    if (typeof result.value === "number" && Number.isFinite(result.value)) {
+      lastValue = result.value;
+    } else {
+      info = "ผลลัพธ์ยังไม่ใช่ตัวเลข — ให้บรรทัดสุดท้ายเป็นคำตอบ เช่น df['ชื่อคอลัมน์'].max()";
+    }
+  }
+  showBlock(els.info, info);
+  els.submit.hidden = lastValue === null;
+  els.submit.textContent = `📨 ส่งคำตอบ ${lastValue}`;
+  updateHeight();
+}
+
+function clearResult() {
+  showResult({});
+}
+
+async function run() {
+  if (args === null || busy) {
+    return;
+  }
+  const code = els.code.value;
+  if (!code.trim()) {
+    showResult({ error: "ยังไม่ได้เขียนโค้ด" });
+    return;
+  }
+  if (code.length > MAX_CODE) {
+    showResult({ error: `โค้ดยาวเกิน ${MAX_CODE} ตัวอักษร` });
+    return;
+  }
+  const current = startRunner();
+  setBusy(true, "กำลังโหลด Python + pandas ในเบราว์เซอร์ (ครั้งแรกใช้เวลาสักครู่)…");
+  try {
+    await current.ready;
+  } catch (err) {
+    setBusy(false);
+    showResult({ error: `โหลด Python ในเบราว์เซอร์ไม่สำเร็จ (ต้องต่ออินเทอร์เน็ต): ${err.message}` });
+    return;
+  }
+  setBusy(true, "กำลังรัน…");
+  const result = await execute(current, code);
+  setBusy(false);
+  showResult(result);
+}
+
+els.run.addEventListener("click", run);
+
+els.submit.addEventListener("click", () => {
+  if (lastValue === null || busy || disabled) {
+    return;
+  }
+  // nonce ใหม่ทุกครั้งที่กด: ค่าของ component ค้างอยู่ทุก rerun เซิร์ฟเวอร์ตรวจเฉพาะ nonce ที่ยังไม่เคยเห็น
+  const nonce = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+  send("streamlit:setComponentValue", { value: { answer: lastValue, nonce }, dataType: "json" });
+});
+
+els.code.addEventListener("input", saveDraft);
+// เริ่มโหลด Pyodide เมื่อเริ่มเขียนโค้ด (ผู้เล่นที่ไม่ใช้ช่องนี้ไม่ต้องโหลด)
+els.code.addEventListener("focus", () => startRunner());
+els.code.addEventListener("keydown", (event) => {
+  if (event.key === "Enter" && (event.ctrlKey || event.metaKey)) {
+    event.preventDefault();
+    run();
+  }
+});
+
+function applyTheme(theme) {
+  if (!theme) {
+    return;
+  }
+  const root = document.documentElement.style;
+  const vars = { "--text": theme.textColor, "--bg": theme.backgroundColor,
+    "--panel": theme.secondaryBackgroundColor, "--primary": theme.primaryColor, "--font": theme.font };
+  for (const [name, value] of Object.entries(vars)) {
+    if (value) {
+      root.setProperty(name, value);
+    }
+  }
+}
+
+window.addEventListener("message", (event) => {
+  const msg = event.data;
+  if (event.source !== window.parent || !msg || msg.type !== "streamlit:render") {
+    return;
+  }
+  const previous = args;
+  args = msg.args;
+  disabled = Boolean(msg.disabled);
+  applyTheme(msg.theme);
+  if (previous === null || previous.stage !== args.stage) {
+    els.code.value = loadDraft() || args.initial_code || "";
+  }
+  if (previous !== null && previous.data_key !== args.data_key) {
+    clearResult();
+  }
+  setBusy(busy, els.status.textContent);
+  updateHeight();
+});
+
+new ResizeObserver(updateHeight).observe(document.body);
+send("streamlit:componentReady", { apiVersion: 1 });
@@ -0,0 +1,117 @@
+// Web Worker: Python (Pyodide) + pandas ในเบราว์เซอร์ของผู้เล่น — โค้ดของผู้เล่นไม่ได้รันบนเซิร์ฟเวอร์
+// ข้อความจากหน้าหลัก:
+//   {type: "init", indexURL}                          -> {type: "ready"} หรือ {type: "failed", error}
+//   {type: "run", id, key, csv|null, code, maxOutput} -> {type: "result", id, loaded, result}
+// csv = null ถ้า worker นี้อ่านข้อมูลชุด key ไว้แล้ว (DataFrame จำไว้ ผู้เล่นได้สำเนาทุกครั้ง)
+// รันนานเกินกำหนด หน้าหลักจะ terminate() worker ทิ้งแล้วเปิดใหม่
+"use strict";
+
+const RUNNER = `
+import ast, contextlib, io, json, numbers, traceback
+import numpy as np
+import pandas as pd
+
+_frames = {}
+
+
+def load(key):
+    _frames.clear()
+    _frames[key] = pd.read_csv("/tmp/data.csv")
+
+
+def _numeric(value):
+    if isinstance(value, (bool, np.bool_)):
+        return None
+    if isinstance(value, (numbers.Number, np.number)):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        return value if np.isfinite(value) else None
+    return None
+
+
+def _error_line(e):
+    lines = [f.lineno for f in traceback.extract_tb(e.__traceback__) if f.filename == "<cell>"]
+    if isinstance(e, SyntaxError):
+        lines = [e.lineno] if e.lineno else []
+        message = e.msg
+    else:
+        message = str(e)
+    where = f"บรรทัด {lines[-1]}: " if lines else ""
+    return f"{where}{type(e).__name__}: {message}"
+
+
+def run(key, code, max_output):
+    out = io.StringIO()
+    result = {"value": None, "display": "", "stdout": "", "error": ""}
+    if key not in _frames:
+        result["error"] = "ข้อมูลของด่านหาย ลองรันใหม่อีกครั้ง"
+        return json.dumps(result)
+    try:
+        tree = ast.parse(code, filename="<cell>", mode="exec")
+        last = None
+        if tree.body and isinstance(tree.body[-1], ast.Expr):
+            last = ast.Expression(tree.body.pop().value)
+        scope = {"pd": pd, "np": np, "df": _frames[key].copy()}
+        with contextlib.redirect_stdout(out), pd.option_context("display.max_rows", 20, "display.max_columns", 20):
+            exec(compile(tree, "<cell>", "exec"), scope)
+            value = eval(compile(last, "<cell>", "eval"), scope) if last is not None else None
+            if value is None:
+                value = scope.get("answer")
+            if isinstance(value, np.generic):
+                value = value.item()
+            result["display"] = "" if value is None else repr(value)
+        result["value"] = _numeric(value)
+    except BaseException as e:
+        result["error"] = _error_line(e)
+    result["stdout"] = out.getvalue()[:max_output]
+    result["display"] = result["display"][:max_output]
+    return json.dumps(result)
+`;
+
+let ready = null;
+let pyodide = null;
+let loadData = null;
+let runCell = null;
+let loadedKey = null;
+
+async function init(indexURL) {
+  importScripts(indexURL + "pyodide.js");
+  pyodide = await loadPyodide({ indexURL });
+  await pyodide.loadPackage(["pandas"]);
+  pyodide.runPython(RUNNER);
+  loadData = pyodide.globals.get("load");
+  runCell = pyodide.globals.get("run");
+}
+
+self.onmessage = async (event) => {
+  const msg = event.data;
+  if (msg.type === "init") {
+    ready = init(msg.indexURL);
+    try {
+      await ready;
+      self.postMessage({ type: "ready" });
+    } catch (err) {
+      self.postMessage({ type: "failed", error: String(err && err.message || err) });
+    }
+    return;
+  }
+  if (msg.type !== "run") {
+    return;
+  }
+  let result;
+  try {
+    await ready;
+    if (msg.csv !== null) {
+      loadedKey = null;
+      pyodide.FS.writeFile("/tmp/data.csv", msg.csv);
+      loadData(msg.key);
+      loadedKey = msg.key;
+    }
+    result = JSON.parse(runCell(msg.key, msg.code, msg.maxOutput));
+  } catch (err) {
+    result = { value: null, display: "", stdout: "", error: String(err && err.message || err) };
+  }
+  self.postMessage({ type: "result", id: msg.id, loaded: loadedKey, result });
+};
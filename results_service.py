@@ -0,0 +1,158 @@
+"""
+บริการเก็บผลในเครื่อง (ASGI) — ใช้แทนการเขียน/อ่านผ่าน Google Sheets
+
+รัน:  uvicorn results_service:app --port 8600
+แล้วตั้ง RESULTS_API_URL=http://localhost:8600 ให้ app.py และ admin.py
+
+POST /attempts                       บันทึกผลการตอบ (JSON เดียวกับที่ app.py ส่งเข้าชีต)
+GET  /attempts?after_id=&limit=&group_name=&classroom=&stage=
+GET  /leaderboard?classroom=
+GET  /stages?classroom=
+GET  /health
+
+ถ้าตั้ง RESULTS_SHEET_WEBHOOK ไว้ จะทยอยส่งผลขึ้น Google Sheets เบื้องหลังด้วย
+"""
+import asyncio
+import json
+import os
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from attempt_journal import AttemptJournal
+from attempt_logger import AttemptLogger
+from results_store import ResultsStore
+from stages import FINAL_STAGE, STAGES
+
+RESULTS_DB_PATH = Path(os.environ.get("RESULTS_DB_PATH", Path("data") / "results.db"))
+SHEET_SYNC_JOURNAL_PATH = Path("data") / "sheet_sync.db"
+REQUIRED_STAGES = [s.number for s in STAGES]
+MAX_PAGE = 5000
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ResultsService:
+    """ASGI app ขนาดเล็ก (ไม่ต้องใช้ framework) ครอบ ResultsStore"""
+
+    def __init__(self, store: ResultsStore, sheet_sync: AttemptLogger = None):
+        self.store = store
+        self.sheet_sync = sheet_sync
+        self.routes = {
+            ("POST", "/attempts"): self.post_attempt,
+            ("GET", "/attempts"): self.get_attempts,
+            ("GET", "/leaderboard"): self.get_leaderboard,
+            ("GET", "/stages"): self.get_stages,
+            ("GET", "/health"): self.get_health,
+        }
+
+    # ---------- handlers (sync, รันใน thread) ----------
+    def post_attempt(self, query: dict, body: bytes):
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HttpError(400, "invalid JSON")
+        if not isinstance(payload, dict):
+            raise HttpError(400, "expected a JSON object")
+        # ค่าที่ ResultsStore แปลงเป็นตัวเลข: ตรวจก่อน ค่าผิดรูปแบบ = 400 (ไม่ใช่ 500)
+        payload = dict(payload)
+        for key in ("stage", "count"):
+            if payload.get(key) not in (None, ""):
+                payload[key] = _int(payload, key, None)
+        record_id = self.store.add(payload)
+        if self.sheet_sync is not None:
+            self.sheet_sync.log(payload)
+        return {"id": record_id}
+
+    def get_attempts(self, query: dict, body: bytes):
+        return self.store.attempts(
+            after_id=_int(query, "after_id", 0),
+            limit=min(_int(query, "limit", 1000), MAX_PAGE),
+            group_name=query.get("group_name"),
+            classroom=query.get("classroom"),
+            stage=_int(query, "stage", None) if query.get("stage") else None,
+        )
+
+    def get_leaderboard(self, query: dict, body: bytes):
+        return self.store.leaderboard(REQUIRED_STAGES, FINAL_STAGE, classroom=query.get("classroom"))
+
+    def get_stages(self, query: dict, body: bytes):
+        return self.store.stage_stats(classroom=query.get("classroom"))
+
+    def get_health(self, query: dict, body: bytes):
+        pending = self.sheet_sync.pending() if self.sheet_sync is not None else 0
+        return {"ok": True, "attempts": self.store.count(), "sheet_sync_pending": pending}
+
+    # ---------- ASGI ----------
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        body = b""
+        more = True
+        while more:
+            message = await receive()
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+
+        query = {k: v[-1] for k, v in parse_qs(scope.get("query_string", b"").decode()).items()}
+        handler = self.routes.get((scope["method"], scope["path"].rstrip("/") or "/"))
+        try:
+            if handler is None:
+                raise HttpError(404, "not found")
+            status, data = 200, await asyncio.to_thread(handler, query, body)
+        except HttpError as e:
+            status, data = e.status, {"error": str(e)}
+
+        raw = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json; charset=utf-8"),
+                        (b"content-length", str(len(raw)).encode())],
+        })
+        await send({"type": "http.response.body", "body": raw})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.sheet_sync is not None:
+                    await asyncio.to_thread(self.sheet_sync.close)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def _int(query: dict, key: str, default: int) -> int:
+    value = query.get(key, default)
+    try:
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError(value)
+        return int(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f"{key} must be an integer")
+
+
+def create_app(db_path=RESULTS_DB_PATH, sheet_webhook: str = None) -> ResultsService:
+    sheet_sync = None
+    if sheet_webhook:
+        sheet_sync = AttemptLogger(sheet_webhook, AttemptJournal(SHEET_SYNC_JOURNAL_PATH))
+    return ResultsService(ResultsStore(db_path), sheet_sync)
+
+
+app = create_app(sheet_webhook=os.environ.get("RESULTS_SHEET_WEBHOOK"))
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=os.environ.get("RESULTS_HOST", "127.0.0.1"),
+                port=int(os.environ.get("RESULTS_PORT", "8600")))
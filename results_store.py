@@ -0,0 +1,145 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from leaderboard import CORRECT, WRONG
+
+
+# -------------------------------------------------
+# RESULTS STORE (SQLite)
+# -------------------------------------------------
+COLUMNS = ["group_name", "classroom", "stage", "answer", "result", "time_used", "time_seconds", "count"]
+
+
+class ResultsStore:
+    """
+    ที่เก็บผลการตอบของทุกกลุ่ม (ใช้แทนชีตเมื่อรัน results_service ในเครื่อง)
+    มี index สำหรับ leaderboard / สถิติรายด่าน / ดึงรายการตามตัวกรองเป็นหน้า ๆ
+    ฟิลด์อื่นที่ app.py ส่งมา (นอกจาก COLUMNS) เก็บไว้ในคอลัมน์ extra (JSON)
+    count = จำนวนครั้งที่แถวนั้นแทน (คำตอบผิดซ้ำติด ๆ ที่ถูกรวม) ใช้เป็นน้ำหนักในสถิติ
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS attempts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                group_name TEXT,
+                classroom TEXT,
+                stage INTEGER,
+                answer TEXT,
+                result TEXT,
+                time_used TEXT,
+                time_seconds REAL,
+                count INTEGER NOT NULL DEFAULT 1,
+                extra TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_attempts_team
+                ON attempts (group_name, classroom, stage, result);
+            CREATE INDEX IF NOT EXISTS idx_attempts_stage ON attempts (stage, result);
+            CREATE INDEX IF NOT EXISTS idx_attempts_room ON attempts (classroom);
+        """)
+        # ไฟล์เดิมที่สร้างก่อนมีคอลัมน์ count
+        names = {r["name"] for r in self._conn.execute("PRAGMA table_info(attempts)")}
+        if "count" not in names:
+            self._conn.execute("ALTER TABLE attempts ADD COLUMN count INTEGER NOT NULL DEFAULT 1")
+
+    def add(self, payload: dict) -> int:
+        row = {c: payload.get(c) for c in COLUMNS}
+        if row["time_seconds"] in ("", None):
+            row["time_seconds"] = None
+        if row["answer"] is not None:
+            row["answer"] = str(row["answer"])
+        row["count"] = max(1, int(row["count"] or 1))
+        extra = {k: v for k, v in payload.items() if k not in COLUMNS and k != "timestamp"}
+        timestamp = payload.get("timestamp") or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO attempts (timestamp, group_name, classroom, stage, answer, result, "
+                "time_used, time_seconds, count, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (timestamp, row["group_name"], row["classroom"], row["stage"], row["answer"],
+                 row["result"], row["time_used"], row["time_seconds"], row["count"],
+                 json.dumps(extra, ensure_ascii=False) if extra else None)
+            )
+            return int(cur.lastrowid)
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params).fetchall()]
+
+    @staticmethod
+    def _where(group_name=None, classroom=None, stage=None) -> tuple:
+        clauses, params = [], []
+        if group_name is not None:
+            clauses.append("group_name = ?")
+            params.append(group_name)
+        if classroom is not None:
+            clauses.append("classroom = ?")
+            params.append(classroom)
+        if stage is not None:
+            clauses.append("stage = ?")
+            params.append(int(stage))
+        return clauses, params
+
+    def attempts(self, after_id: int = 0, limit: int = 1000,
+                 group_name=None, classroom=None, stage=None) -> list:
+        """รายการเรียงตาม id (ใช้ after_id = id สุดท้ายที่เห็น เพื่อดึงหน้าถัดไป/แถวใหม่)"""
+        clauses, params = self._where(group_name, classroom, stage)
+        clauses.insert(0, "id > ?")
+        params.insert(0, int(after_id))
+        rows = self._query(
+            f"SELECT * FROM attempts WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?",
+            params + [int(limit)]
+        )
+        for r in rows:
+            extra = r.pop("extra")
+            if extra:
+                r.update(json.loads(extra))
+        return rows
+
+    def leaderboard(self, required_stages, final_stage: int, classroom=None) -> list:
+        """กลุ่มที่ผ่านครบทุกด่าน + มีเวลาจบ เรียงตามเวลา (คิดใน SQLite ทั้งหมด)"""
+        required = sorted(int(s) for s in required_stages)
+        marks = ", ".join("?" for _ in required)
+        clauses, params = self._where(classroom=classroom)
+        where = " AND ".join(["group_name IS NOT NULL", "classroom IS NOT NULL"] + clauses)
+        sql = f"""
+            SELECT group_name, classroom, attempts, wrong, finish AS time_seconds FROM (
+                SELECT group_name, classroom,
+                       SUM(count) AS attempts,
+                       SUM(CASE WHEN result = ? THEN count ELSE 0 END) AS wrong,
+                       COUNT(DISTINCT CASE WHEN result = ? AND stage IN ({marks}) THEN stage END) AS passed,
+                       MIN(CASE WHEN result = ? AND stage = ? THEN time_seconds END) AS finish
+                FROM attempts
+                WHERE {where}
+                GROUP BY group_name, classroom
+            )
+            WHERE passed = ? AND finish IS NOT NULL
+            ORDER BY finish, attempts
+        """
+        return self._query(
+            sql,
+            [WRONG, CORRECT, *required, CORRECT, int(final_stage), *params, len(required)]
+        )
+
+    def stage_stats(self, classroom=None) -> list:
+        """จำนวนตอบถูก/ผิดต่อด่าน"""
+        clauses, params = self._where(classroom=classroom)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(
+            f"SELECT stage, result, SUM(count) AS n FROM attempts {where} "
+            "GROUP BY stage, result ORDER BY stage, result",
+            params
+        )
+
+    def count(self) -> int:
+        return int(self._query("SELECT COUNT(*) AS n FROM attempts")[0]["n"])
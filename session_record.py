@@ -0,0 +1,228 @@
+import threading
+import time
+from dataclasses import asdict, dataclass, field, fields
+from typing import Optional
+
+
+# -------------------------------------------------
+# COMPACT SESSION RECORD
+# -------------------------------------------------
+# ค่าที่ผูกกับ time.monotonic ของ process นี้ — ไม่บันทึกใน checkpoint
+_LOCAL_FIELDS = ("pending_stage", "pending_due", "stage_mark")
+
+
+@dataclass(slots=True)
+class SessionRecord:
+    """
+    สถานะของผู้เล่นหนึ่ง session (แทนค่าหลายตัวใน st.session_state)
+    เหรียญ / คำใบ้ที่เปิดแล้ว เก็บเป็น bitmask (บิตที่ n = ด่าน n)
+    เวลาเล่นจับด้วย time.monotonic: เริ่มนับเมื่อเข้าด่าน หยุดเมื่อตอบถูก เก็บเป็นเวลาต่อด่าน (splits)
+    """
+    stage: int = 0
+    # รหัส session (อยู่ใน URL ?sid=) ใช้โหลดสถานะกลับจาก state backend
+    sid: str = ""
+    group_name: str = ""
+    room: str = ""
+    start_time: Optional[float] = None
+    game_completed: bool = False
+    completed_seconds: int = 0
+    completed_time: str = ""
+    badges: int = 0
+    hints: int = 0
+    # วินาทีที่ใช้ในแต่ละด่านที่ผ่านแล้ว (ตัวที่ i = ด่าน i+1)
+    splits: list = field(default_factory=list)
+    # วินาทีที่นับไว้แล้วของด่านปัจจุบัน + จุดเริ่มช่วงที่กำลังนับ (None = นาฬิกาหยุด)
+    stage_banked: float = 0.0
+    stage_mark: Optional[float] = None
+    # time.time() ตอนบันทึก checkpoint (ใช้ต่อเวลาเมื่อโหลดกลับใน process อื่น)
+    saved_at: float = 0.0
+    # เวลาเปลี่ยนด่านอัตโนมัติ
+    pending_stage: Optional[int] = None
+    pending_due: float = 0.0
+
+    def has_badge(self, stage: int) -> bool:
+        return bool(self.badges >> stage & 1)
+
+    def add_badge(self, stage: int):
+        self.badges |= 1 << stage
+
+    def has_hint(self, stage: int) -> bool:
+        return bool(self.hints >> stage & 1)
+
+    def add_hint(self, stage: int):
+        self.hints |= 1 << stage
+
+    def start(self, now: float, mono: float):
+        """เริ่มเกมใหม่ (ชื่อกลุ่ม/ห้องคงเดิม) — now = time.time(), mono = time.monotonic()"""
+        self.reset()
+        self.stage = 1
+        self.start_time = now
+        self.start_clock(mono)
+
+    def reset(self):
+        """กลับหน้าแรก ล้างความคืบหน้า"""
+        self.stage = 0
+        self.start_time = None
+        self.game_completed = False
+        self.completed_seconds = 0
+        self.completed_time = ""
+        self.badges = 0
+        self.hints = 0
+        self.splits = []
+        self.stage_banked = 0.0
+        self.stage_mark = None
+        self.pending_stage = None
+        self.pending_due = 0.0
+
+    # ---------- timing ----------
+    def start_clock(self, mono: float):
+        """เข้าด่านใหม่: เริ่มนับจาก 0"""
+        self.stage_banked = 0.0
+        self.stage_mark = mono
+
+    def stage_seconds(self, mono: float) -> float:
+        """เวลาที่ใช้ในด่านปัจจุบันจนถึงตอนนี้"""
+        running = mono - self.stage_mark if self.stage_mark is not None else 0.0
+        return self.stage_banked + max(0.0, running)
+
+    def split(self, mono: float) -> float:
+        """ตอบถูก: หยุดนาฬิกา เก็บเวลาของด่านนี้ คืนวินาทีที่ใช้"""
+        seconds = self.stage_seconds(mono)
+        self.splits = self.splits[:self.stage - 1] + [0.0] * max(0, self.stage - 1 - len(self.splits))
+        self.splits.append(seconds)
+        self.stage_banked = seconds
+        self.stage_mark = None
+        return seconds
+
+    def total_seconds(self, mono: float = None) -> float:
+        """รวมเวลาทุกด่านที่ผ่านแล้ว (+ ด่านปัจจุบันถ้าส่ง mono และนาฬิกายังเดิน)"""
+        total = float(sum(self.splits))
+        if mono is not None and self.stage_mark is not None:
+            total += self.stage_seconds(mono)
+        return total
+
+    # ---------- checkpoint ----------
+    def checkpoint(self, mono: float = None) -> dict:
+        data = asdict(self)
+        mono = time.monotonic() if mono is None else mono
+        running = self.stage_mark is not None
+        if self.pending_stage is not None:
+            # กำลังรอเปลี่ยนด่าน -> บันทึกเป็นด่านถัดไปที่เพิ่งเริ่ม
+            data["stage"] = self.pending_stage
+            data["stage_banked"] = 0.0
+            running = not self.game_completed
+        else:
+            data["stage_banked"] = self.stage_seconds(mono)
+        data["clock_running"] = running
+        data["saved_at"] = time.time()
+        for name in _LOCAL_FIELDS:
+            del data[name]
+        return data
+
+    @classmethod
+    def from_checkpoint(cls, data: dict, mono: float = None) -> "SessionRecord":
+        """
+        โหลดกลับ (อาจเป็นอีก process/เครื่อง) — นาฬิกาที่เดินอยู่ตอนบันทึกเดินต่อ
+        ช่วงระหว่างบันทึกถึงตอนโหลดนับจากเวลานาฬิกาปกติ (ไม่ติดลบ ถ้านาฬิกาถอยหลัง)
+        """
+        names = {f.name for f in fields(cls)} - set(_LOCAL_FIELDS)
+        record = cls(**{k: v for k, v in data.items() if k in names})
+        if data.get("clock_running"):
+            record.stage_banked += max(0.0, time.time() - record.saved_at)
+            record.stage_mark = time.monotonic() if mono is None else mono
+        return record
+
+
+def team_key(group: str, room: str) -> str:
+    return f"{group.strip().casefold()}|{room.strip().casefold()}"
+
+
+# -------------------------------------------------
+# CHECKPOINTS (state backend)
+# -------------------------------------------------
+class SessionCheckpoints:
+    """
+    ความคืบหน้าล่าสุดใน state backend (state_backend.py) — ใช้ร่วมกันได้ทุก process/ทุกเครื่อง
+    - ต่อ session (sid ใน URL): รีเฟรช / ต่อใหม่ไปเจอเครื่องอื่น / เซิร์ฟเวอร์รีสตาร์ต ก็ได้สถานะเดิม
+    - ต่อทีม (กลุ่ม + ห้อง): เปิดแท็บใหม่แล้วกรอกชื่อเดิมเพื่อเล่นต่อ
+    ทุก key หมดอายุหลังไม่ได้อัปเดต ttl วินาที
+    """
+
+    def __init__(self, backend, ttl: float = 24 * 3600):
+        self.backend = backend
+        self.ttl = ttl
+
+    def save(self, record: SessionRecord):
+        data = record.checkpoint()
+        if record.sid:
+            self.backend.save(f"session:{record.sid}", data, self.ttl)
+        if record.group_name.strip() and record.room.strip():
+            self.backend.save(f"team:{team_key(record.group_name, record.room)}", data, self.ttl)
+
+    def load(self, group: str, room: str) -> Optional[SessionRecord]:
+        data = self.backend.load(f"team:{team_key(group, room)}")
+        return SessionRecord.from_checkpoint(data) if data else None
+
+    def load_session(self, sid: str) -> Optional[SessionRecord]:
+        data = self.backend.load(f"session:{sid}")
+        return SessionRecord.from_checkpoint(data) if data else None
+
+    def delete(self, group: str, room: str):
+        self.backend.delete(f"team:{team_key(group, room)}")
+
+
+# -------------------------------------------------
+# IDLE SESSION EVICTION
+# -------------------------------------------------
+class IdleSessionReaper:
+    """
+    จำเวลาที่แต่ละ session ใช้งานล่าสุด แล้วเรียก evict(session_id) เมื่อว่างเกิน timeout วินาที
+    (ความคืบหน้าอยู่ใน checkpoint แล้ว เปิด URL เดิม หรือกรอกกลุ่ม+ห้องเดิมเพื่อเล่นต่อได้)
+    - evict คืน False = session ยังใช้อยู่ (เช่น แท็บยังเปิด websocket ค้างไว้) ไม่ปิด แล้วตรวจใหม่รอบถัดไป
+    """
+
+    def __init__(self, timeout: float, evict, interval: float = None):
+        self.timeout = timeout
+        self.evict = evict
+        self.interval = interval or max(1.0, min(60.0, timeout / 4))
+        self.evicted = 0
+        self.last_error = ""
+        self._lock = threading.Lock()
+        self._last_seen = {}
+        self._thread = threading.Thread(target=self._run, name="session-reaper", daemon=True)
+        self._thread.start()
+
+    def touch(self, session_id: str):
+        with self._lock:
+            self._last_seen[session_id] = time.monotonic()
+
+    def active(self) -> int:
+        with self._lock:
+            return len(self._last_seen)
+
+    def sweep(self) -> list:
+        cutoff = time.monotonic() - self.timeout
+        with self._lock:
+            idle = {sid: seen for sid, seen in self._last_seen.items() if seen < cutoff}
+            for sid in idle:
+                del self._last_seen[sid]
+        evicted = []
+        for sid, seen in idle.items():
+            try:
+                closed = self.evict(sid) is not False
+            except Exception as e:
+                self.last_error = str(e)
+                continue
+            if closed:
+                self.evicted += 1
+                evicted.append(sid)
+            else:
+                with self._lock:
+                    # touch() ระหว่างนี้ = ใช้งานใหม่แล้ว ใช้เวลาใหม่
+                    self._last_seen.setdefault(sid, seen)
+        return evicted
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.sweep()
@@ -0,0 +1,199 @@
+import io
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+import requests
+
+
+def parse_csv(text: str, header: bool = True) -> pd.DataFrame:
+    """CSV จากชีต -> DataFrame (ทุกช่องเป็นข้อความ)"""
+    if not text.strip():
+        return pd.DataFrame()
+    return pd.read_csv(io.StringIO(text), dtype=str, header=0 if header else None)
+
+
+# -------------------------------------------------
+# INCREMENTAL SHEET LOADER
+# -------------------------------------------------
+class IncrementalSheetLoader:
+    """
+    โหลดชีต (CSV ที่ publish ไว้) แบบดึงเฉพาะแถวใหม่
+    - เก็บทุกแถวไว้ใน SQLite ในเครื่อง (ข้อมูลอยู่รอดแม้รีสตาร์ต)
+    - refresh() ขอเฉพาะแถวที่ต่อจากจำนวนแถวที่มีแล้ว (&range=A{n}:ZZ) โดยขอแถวสุดท้ายที่มีแล้วซ้ำมาด้วย
+    - ถ้าแถวสุดท้ายที่มีแล้วไม่ตรงกับในชีต (ครูลบ/แก้แถว ชีตสั้นลง) หัวตารางเปลี่ยน หรือ Google ไม่สนใจ range
+      จะโหลดใหม่ทั้งหมดอัตโนมัติ
+    - โหลดใหม่ทั้งหมดทุก full_every วินาที (แถวที่แก้กลางชีตหายไปได้) หรือเมื่อเรียก refresh(full=True)
+    ค่าทุกช่องเก็บเป็นข้อความ (str) — แปลงชนิดตอน normalize ใน admin.py
+    """
+
+    def __init__(self, url: str, db_path, timeout: float = 30.0, full_every: float = 600.0):
+        self.url = url
+        self.timeout = timeout
+        self.full_every = full_every
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._df = self._read_store()
+        # ข้อมูลจากไฟล์ใช้ต่อได้ (แถวท้ายถูกตรวจทุกรอบ) — แถวที่แก้กลางชีตหายไปภายใน full_every วินาที
+        self._last_full = time.monotonic()
+        # เพิ่มขึ้นทุกครั้งที่ข้อมูลถูกแทนทั้งชุด (ผู้ติดตามแบบ incremental ต้องเริ่มนับใหม่)
+        self.generation = 0
+
+    # ---------- store ----------
+    def _read_store(self) -> pd.DataFrame:
+        try:
+            return pd.read_sql("SELECT * FROM sheet_rows", self._conn).astype(object)
+        except (pd.errors.DatabaseError, sqlite3.DatabaseError):
+            return pd.DataFrame()
+
+    def _write_store(self, df: pd.DataFrame, replace: bool):
+        df.to_sql(
+            "sheet_rows", self._conn, index=False,
+            if_exists="replace" if replace else "append",
+            dtype={c: "TEXT" for c in df.columns},
+        )
+        self._conn.commit()
+
+    # ---------- fetch ----------
+    def _get(self, url: str) -> str:
+        r = self._session.get(url, timeout=self.timeout)
+        r.raise_for_status()
+        r.encoding = "utf-8"
+        return r.text
+
+    def _parse(self, text: str, header: bool = True) -> pd.DataFrame:
+        return parse_csv(text, header)
+
+    def _full_load(self) -> pd.DataFrame:
+        df = self._parse(self._get(self.url))
+        self._write_store(df, replace=True)
+        return df
+
+    @staticmethod
+    def _cells(row) -> list:
+        return ["" if pd.isna(v) else str(v) for v in row]
+
+    def _delta_load(self):
+        """แถวใหม่ต่อท้าย หรือ None ถ้าต้องโหลดใหม่ทั้งหมด"""
+        columns = list(self._df.columns)
+        # แถวที่ 1 คือหัวตาราง ข้อมูลแถวที่ n จึงอยู่แถวที่ n+1 — ขอตั้งแต่แถวสุดท้ายที่มีแล้ว
+        start_row = len(self._df) + 1
+        sep = "&" if "?" in self.url else "?"
+        delta = self._parse(self._get(f"{self.url}{sep}range=A{start_row}:ZZ"), header=False)
+        if delta.empty or delta.shape[1] != len(columns):
+            # ชีตสั้นกว่าที่มี (ลบแถว) หรือจำนวนคอลัมน์เปลี่ยน
+            return None
+        if self._cells(delta.iloc[0]) != self._cells(self._df.iloc[-1]):
+            # แถวสุดท้ายเปลี่ยน (ลบ/แก้แถว) หรือได้หัวตารางกลับมา = range ไม่ถูกใช้
+            return None
+        delta = delta.iloc[1:].reset_index(drop=True)
+        delta.columns = columns
+        return delta
+
+    def refresh(self, full: bool = False) -> int:
+        """
+        ดึงแถวใหม่จากชีต — คืนจำนวนแถวที่เพิ่มเข้ามา
+        full=True = โหลดใหม่ทั้งหมด (ข้อมูลที่ลบ/แก้ในชีตหายไปจากที่เก็บในเครื่อง)
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_full >= self.full_every:
+                full = True
+            delta = None if full or self._df.empty else self._delta_load()
+            if delta is None:
+                before = len(self._df)
+                self._df = self._full_load()
+                self._last_full = now
+                self.generation += 1
+                return max(0, len(self._df) - before)
+            if not delta.empty:
+                self._write_store(delta, replace=False)
+                self._df = pd.concat([self._df, delta], ignore_index=True)
+            return len(delta)
+
+    def frame(self) -> pd.DataFrame:
+        """สำเนาของข้อมูลทั้งหมด (แก้ไขได้โดยไม่กระทบที่เก็บ)"""
+        with self._lock:
+            return self._df.copy()
+
+    def since(self, position: int) -> tuple:
+        """(generation, แถวตั้งแต่ตำแหน่ง position) สำหรับผู้ติดตามแบบ incremental"""
+        with self._lock:
+            return self.generation, self._df.iloc[position:].copy()
+
+    def reset(self):
+        """ล้างข้อมูลในเครื่อง แล้วโหลดใหม่ทั้งหมดครั้งถัดไป"""
+        with self._lock:
+            self._conn.execute("DROP TABLE IF EXISTS sheet_rows")
+            self._conn.commit()
+            self._df = pd.DataFrame()
+            self.generation += 1
+
+
+# -------------------------------------------------
+# RESULTS SERVICE LOADER
+# -------------------------------------------------
+class ResultsApiLoader:
+    """
+    โหลดผลจาก results_service ในเครื่องแทนชีต (ใช้แทน IncrementalSheetLoader ได้ทันที)
+    refresh() ขอเฉพาะรายการที่ id มากกว่ารายการล่าสุดที่มีแล้ว
+    """
+
+    def __init__(self, base_url: str, page_size: int = 5000, timeout: float = 10.0):
+        self.base_url = base_url.rstrip("/")
+        self.page_size = page_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._df = pd.DataFrame()
+        self._last_id = 0
+        self.generation = 0
+
+    def refresh(self, full: bool = False) -> int:
+        with self._lock:
+            if full:
+                self._df = pd.DataFrame()
+                self._last_id = 0
+                self.generation += 1
+            added = []
+            while True:
+                r = self._session.get(
+                    f"{self.base_url}/attempts",
+                    params={"after_id": self._last_id, "limit": self.page_size},
+                    timeout=self.timeout,
+                )
+                r.raise_for_status()
+                rows = r.json()
+                if not rows:
+                    break
+                added.extend(rows)
+                self._last_id = rows[-1]["id"]
+                if len(rows) < self.page_size:
+                    break
+            if added:
+                # เก็บเป็นข้อความเหมือนข้อมูลจากชีต — แปลงชนิดตอน normalize
+                delta = pd.DataFrame(added)
+                delta = delta.astype(str).where(delta.notna(), None)
+                self._df = pd.concat([self._df, delta], ignore_index=True)
+            return len(added)
+
+    def frame(self) -> pd.DataFrame:
+        with self._lock:
+            return self._df.copy()
+
+    def since(self, position: int) -> tuple:
+        """(generation, แถวตั้งแต่ตำแหน่ง position) สำหรับผู้ติดตามแบบ incremental"""
+        with self._lock:
+            return self.generation, self._df.iloc[position:].copy()
+
+    def reset(self):
+        with self._lock:
+            self._df = pd.DataFrame()
+            self.generation += 1
+            self._last_id = 0
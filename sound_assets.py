@@ -0,0 +1,52 @@
+import base64
+import hashlib
+import shutil
+from pathlib import Path
+
+
+# -------------------------------------------------
+# PRE-ENCODED SOUND EFFECTS
+# -------------------------------------------------
+AUDIO_HTML = """
+<audio autoplay>
+    <source src="{src}" type="audio/mp3">
+</audio>
+"""
+
+
+class SoundBank:
+    """
+    เตรียมไฟล์เสียงครั้งเดียวตอนเริ่ม process แล้วเก็บ HTML สำเร็จรูปไว้ในหน่วยความจำ
+    - use_static=True: คัดลอกไฟล์ไปที่ static/ โดยใส่ hash ในชื่อไฟล์
+      แล้วให้ <audio> อ้าง URL (app/static/...) -> เบราว์เซอร์โหลดครั้งเดียวแล้วใช้แคช
+    - use_static=False: ฝังเป็น base64 data URI (เข้ารหัสครั้งเดียว ไม่ใช่ทุกครั้งที่ตรวจคำตอบ)
+    """
+
+    def __init__(self, paths, use_static: bool = False, static_dir=Path("static"),
+                 static_url: str = "app/static"):
+        self.use_static = use_static
+        self.static_dir = Path(static_dir)
+        self.static_url = static_url.rstrip("/")
+        self._html = {}
+        for p in paths:
+            self._prepare(Path(p))
+
+    def _prepare(self, path: Path):
+        if not path.exists():
+            return
+        data = path.read_bytes()
+        if self.use_static:
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            name = f"{path.stem}.{digest}{path.suffix}"
+            target = self.static_dir / "sfx" / name
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(path, target)
+            src = f"{self.static_url}/sfx/{name}"
+        else:
+            src = "data:audio/mp3;base64," + base64.b64encode(data).decode("utf-8")
+        self._html[str(path)] = AUDIO_HTML.format(src=src)
+
+    def html(self, path_str: str):
+        """HTML สำหรับเล่นเสียง หรือ None ถ้าไม่พบไฟล์"""
+        return self._html.get(str(Path(path_str)))
@@ -0,0 +1,212 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from leaderboard import CORRECT, WRONG, attempt_counts
+
+
+# -------------------------------------------------
+# PER-STAGE DIFFICULTY ANALYTICS (incremental)
+# -------------------------------------------------
+TEAM_STAGE = ["group_name", "classroom", "stage"]
+
+# ช่วงจำนวนครั้งที่ตอบจนผ่าน
+ATTEMPT_BINS = [0, 1, 2, 3, 5, 10, np.inf]
+ATTEMPT_LABELS = ["1", "2", "3", "4–5", "6–10", ">10"]
+TIME_QUANTILES = [0.25, 0.5, 0.75, 0.9]
+
+_AGG = {"attempts": "sum", "solved": "max", "hint": "max", "split": "min"}
+
+
+def answer_text(answer: pd.Series) -> pd.Series:
+    """คำตอบเป็นข้อความรูปเดียวกัน (1977 / "1977" / "1977.0" -> "1977", 4.7400 -> "4.74")"""
+    num = pd.to_numeric(answer, errors="coerce")
+    text = answer.astype("string").str.strip()
+    whole = num.notna() & num.eq(num.round())
+    text = text.mask(num.notna(), num.round(6).astype("string"))
+    return text.mask(whole, num.where(whole).astype("Int64").astype("string"))
+
+
+def team_stage_partials(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    สรุปต่อ (กลุ่ม, ห้อง, ด่าน) — รวมกันต่อได้ด้วย sum / max / min
+    - attempts = จำนวนครั้งที่ตอบ (ตาม count), solved = ตอบถูกแล้ว
+    - hint = เปิดคำใบ้ของด่านนี้ (hints_used), split = เวลาที่ใช้จนตอบถูก (stage_seconds)
+    """
+    correct = df["result"].eq(CORRECT)
+    parts = {
+        "group_name": df["group_name"],
+        "classroom": df["classroom"],
+        "stage": pd.to_numeric(df["stage"], errors="coerce"),
+        "attempts": attempt_counts(df),
+        "solved": correct.astype(int),
+        "hint": (pd.to_numeric(df["hints_used"], errors="coerce").fillna(0).gt(0).astype(int)
+                 if "hints_used" in df.columns else 0),
+        "split": (pd.to_numeric(df["stage_seconds"], errors="coerce").where(correct)
+                  if "stage_seconds" in df.columns else np.nan),
+    }
+    frame = pd.DataFrame(parts).dropna(subset=TEAM_STAGE)
+    return frame.groupby(TEAM_STAGE, sort=False, observed=True).agg(_AGG)
+
+
+def wrong_answer_counts(df: pd.DataFrame) -> pd.Series:
+    """จำนวนครั้งของคำตอบผิดแต่ละค่า ต่อ (ห้อง, ด่าน, คำตอบ)"""
+    wrong = df["result"].eq(WRONG)
+    sub = pd.DataFrame({
+        "classroom": df.loc[wrong, "classroom"].astype("string").fillna(""),
+        "stage": pd.to_numeric(df.loc[wrong, "stage"], errors="coerce"),
+        "answer": answer_text(df.loc[wrong, "answer"]),
+        "n": attempt_counts(df)[wrong],
+    }).dropna(subset=["stage", "answer"])
+    return sub.groupby(["classroom", "stage", "answer"], sort=False)["n"].sum()
+
+
+class StageAnalytics:
+    """
+    ความยากของแต่ละด่าน จากผลการตอบทั้งหมด
+    - update(rows) รับเฉพาะแถวใหม่ (ข้อมูลที่ normalize แล้ว) รวมเข้ากับผลสรุปเดิม
+    - report(rooms) คำนวณตารางจากผลสรุป (ขนาด = จำนวนกลุ่ม x ด่าน) แล้วจำไว้จนกว่าจะมีแถวใหม่
+    ใช้ร่วมกันได้หลาย thread (มี lock)
+    """
+
+    def __init__(self, top_wrong: int = 5):
+        self.top_wrong = top_wrong
+        self._lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, **kwargs) -> "StageAnalytics":
+        analytics = cls(**kwargs)
+        analytics.update(df)
+        return analytics
+
+    def reset(self):
+        with self._lock:
+            self.teams = None
+            self.wrong = None
+            self.version = 0
+            self._reports = {}
+
+    def on_rows(self, rows: pd.DataFrame, reset: bool):
+        """ผู้ติดตามของ LiveFeed"""
+        if reset:
+            self.reset()
+        self.update(rows)
+
+    def update(self, rows: pd.DataFrame):
+        if len(rows) == 0:
+            return
+        teams = team_stage_partials(rows)
+        wrong = wrong_answer_counts(rows)
+        with self._lock:
+            if self.teams is None:
+                self.teams = teams
+            else:
+                both = pd.concat([self.teams, teams])
+                self.teams = both.groupby(level=TEAM_STAGE, sort=False, observed=True).agg(_AGG)
+            self.wrong = wrong if self.wrong is None else self.wrong.add(wrong, fill_value=0)
+            self.version += 1
+            self._reports = {}
+
+    def rooms(self) -> list:
+        with self._lock:
+            if self.teams is None:
+                return []
+            return sorted(self.teams.index.get_level_values("classroom").astype(str).unique().tolist())
+
+    def report(self, rooms=()) -> dict:
+        """
+        ตารางสรุปของห้องที่เลือก (ว่าง = ทุกห้อง)
+        - summary: ต่อด่าน — กลุ่มที่ลอง / ผ่าน / ยังติด, จำนวนครั้งจนผ่าน, เวลา p50/p90, คำใบ้
+        - attempts: จำนวนกลุ่มตามช่วงจำนวนครั้งที่ตอบจนผ่าน (แถว = ด่าน)
+        - times: เปอร์เซ็นไทล์ของเวลาที่ใช้จนผ่าน (วินาที)
+        - wrong: คำตอบผิดที่พบบ่อยที่สุดของแต่ละด่าน
+        """
+        key = tuple(sorted(str(r) for r in rooms))
+        with self._lock:
+            if key in self._reports:
+                return self._reports[key]
+            teams, wrong, version = self.teams, self.wrong, self.version
+        result = self._compute(teams, wrong, key)
+        with self._lock:
+            if self.version == version:
+                self._reports[key] = result
+        return result
+
+    def _compute(self, teams, wrong, rooms: tuple) -> dict:
+        if teams is None or teams.empty:
+            return {"summary": pd.DataFrame(), "attempts": pd.DataFrame(),
+                    "times": pd.DataFrame(), "wrong": pd.DataFrame()}
+        t = teams.reset_index()
+        t["classroom"] = t["classroom"].astype(str)
+        t["stage"] = t["stage"].astype(int)
+        if rooms:
+            t = t[t["classroom"].isin(rooms)]
+        if wrong is not None and rooms:
+            wrong = wrong[wrong.index.get_level_values("classroom").isin(rooms)]
+
+        solved = t[t["solved"] > 0]
+        by_stage = t.groupby("stage")
+        summary = pd.DataFrame({
+            "teams": by_stage.size(),
+            "solved": by_stage["solved"].sum(),
+            "hint_rate": by_stage["hint"].mean(),
+        })
+        summary["stuck"] = summary["teams"] - summary["solved"]
+        solved_by_stage = solved.groupby("stage")
+        summary["attempts_median"] = solved_by_stage["attempts"].median()
+        summary["attempts_mean"] = solved_by_stage["attempts"].mean()
+        summary["time_p50"] = solved_by_stage["split"].median()
+        summary["time_p90"] = solved_by_stage["split"].quantile(0.9)
+
+        # คำใบ้กับความยาก: จำนวนครั้งเฉลี่ยจนผ่าน (มี/ไม่มีคำใบ้) + สหสัมพันธ์ (Pearson)
+        with_hint = solved.groupby(["stage", "hint"])["attempts"].mean().unstack().reindex(columns=[0, 1])
+        summary["attempts_hint"] = with_hint[1]
+        summary["attempts_no_hint"] = with_hint[0]
+        summary["hint_corr"] = _pearson(solved, "hint", "attempts")
+
+        attempts = pd.crosstab(
+            solved["stage"],
+            pd.cut(solved["attempts"], ATTEMPT_BINS, labels=ATTEMPT_LABELS),
+        ).reindex(columns=ATTEMPT_LABELS, fill_value=0)
+
+        timed = solved.dropna(subset=["split"])
+        times = timed.groupby("stage")["split"].quantile(TIME_QUANTILES).unstack()
+        times = times.rename(columns={q: f"p{int(q * 100)}" for q in TIME_QUANTILES})
+
+        return {
+            "summary": summary.sort_index(),
+            "attempts": attempts,
+            "times": times,
+            "wrong": self._top_wrong(wrong),
+        }
+
+    def _top_wrong(self, wrong) -> pd.DataFrame:
+        columns = ["stage", "answer", "n", "share"]
+        if wrong is None or wrong.empty:
+            return pd.DataFrame(columns=columns)
+        per_answer = wrong.groupby(level=["stage", "answer"]).sum()
+        per_answer = per_answer[per_answer > 0].rename("n").reset_index()
+        per_answer["stage"] = per_answer["stage"].astype(int)
+        per_answer["share"] = per_answer["n"] / per_answer.groupby("stage")["n"].transform("sum")
+        top = (
+            per_answer.sort_values(["stage", "n"], ascending=[True, False], kind="stable")
+                      .groupby("stage").head(self.top_wrong)
+        )
+        return top[columns].reset_index(drop=True)
+
+
+def _pearson(df: pd.DataFrame, x: str, y: str) -> pd.Series:
+    """สหสัมพันธ์ของ x กับ y ต่อด่าน (คิดจากผลรวม — ไม่ต้อง apply ทีละกลุ่ม)"""
+    v = pd.DataFrame({
+        "stage": df["stage"], "x": df[x].astype(float), "y": df[y].astype(float),
+    })
+    v["xx"], v["yy"], v["xy"] = v["x"] ** 2, v["y"] ** 2, v["x"] * v["y"]
+    s = v.groupby("stage").agg(n=("x", "size"), x=("x", "sum"), y=("y", "sum"),
+                               xx=("xx", "sum"), yy=("yy", "sum"), xy=("xy", "sum"))
+    cov = s["xy"] - s["x"] * s["y"] / s["n"]
+    var_x = s["xx"] - s["x"] ** 2 / s["n"]
+    var_y = s["yy"] - s["y"] ** 2 / s["n"]
+    denom = np.sqrt(var_x * var_y)
+    return (cov / denom).where(denom > 0)
@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from answer_keys import AnswerSpec
+
+
+# -------------------------------------------------
+# STAGE REGISTRY
+# -------------------------------------------------
+@dataclass(frozen=True)
+class Stage:
+    """
+    ข้อมูลของด่านหนึ่งด่าน — เพิ่มด่านใหม่ = เพิ่ม Stage ใน STAGES (ไม่ต้องเขียนโค้ดใหม่)
+    aggregate: max / min / sum / mean / median / count
+    group_by: ถ้ากำหนด จะ groupby คอลัมน์นี้ด้วย group_aggregate ก่อน แล้วค่อยใช้ aggregate กับผลของแต่ละกลุ่ม
+    """
+    number: int
+    title: str
+    mission_html: str
+    image: str
+    file: str
+    column: str
+    aggregate: str
+    hint: str
+    group_by: Optional[str] = None
+    group_aggregate: str = "sum"
+    rounding: Optional[int] = None
+    tolerance: float = 0.0
+    input_label: str = "กรอกคำตอบ"
+    input_format: Optional[str] = None
+
+    @property
+    def answer_spec(self) -> AnswerSpec:
+        return AnswerSpec(
+            file=self.file,
+            column=self.column,
+            aggregate=self.aggregate,
+            rounding=self.rounding,
+            tolerance=self.tolerance,
+            group_by=self.group_by,
+            group_aggregate=self.group_aggregate,
+        )
+
+
+STAGES = (
+    Stage(
+        number=1,
+        title="🔎 ด่านที่ 1 : ปลดล็อกยอดขาย",
+        mission_html="<b>ภารกิจ:</b> เปิดไฟล์ CSV แล้วหาค่า <b>ยอดขาย</b> ที่มากที่สุด",
+        image="stage1.png",
+        file="1sales.csv",
+        column="Sales",
+        aggregate="max",
+        hint="ใบ้: ดูคอลัมน์ <b>Sales</b> แล้วหา “ค่ามากที่สุด” (max).",
+    ),
+    Stage(
+        number=2,
+        title="💪 ด่านที่ 2 : ภารกิจออกกำลัง",
+        mission_html="<b>ภารกิจ:</b> เปิดไฟล์ CSV แล้วหาค่า <b>จำนวนนาทีออกกำลังกาย</b> ที่น้อยที่สุด",
+        image="stage2.png",
+        file="2exercise.csv",
+        column="ExerciseMinutes",
+        aggregate="min",
+        hint="ใบ้: ดูคอลัมน์ <b>ExerciseMinutes</b> แล้วหา “ค่าน้อยที่สุด” (min).",
+    ),
+    Stage(
+        number=3,
+        title="⚡ ด่านที่ 3 : ภารกิจไฟฟ้า",
+        mission_html="<b>ภารกิจ:</b> เปิดไฟล์ CSV แล้วหาค่า <b>การใช้หน่วยไฟฟ้า</b> ที่มากที่สุด",
+        image="stage3.png",
+        file="3electricity.csv",
+        column="Units",
+        aggregate="max",
+        tolerance=0.01,
+        hint="ใบ้: ดูคอลัมน์ <b>Units</b> แล้วหา “ค่ามากที่สุด” (max).",
+    ),
+    Stage(
+        number=4,
+        title="🌐 ด่านที่ 4 : ภารกิจเว็บทราฟฟิก",
+        mission_html="<b>ภารกิจ:</b> เปิดไฟล์ CSV แล้วหาค่าผลรวมของผู้เยี่ยมชมเว็บไซต์ทั้งหมด",
+        image="stage4.png",
+        file="4web.csv",
+        column="Visitors",
+        aggregate="sum",
+        input_label="กรอกจำนวนคน",
+        hint="ใบ้: ดูคอลัมน์ <b>Visitors</b> แล้วหา “หาผลรวม” (sum).",
+    ),
+    Stage(
+        number=5,
+        title="📶 ด่านที่ 5 : ภารกิจ Wi-Fi",
+        mission_html="<b>ภารกิจ:</b> หา <b>ค่าเฉลี่ยชั่วโมงที่ใช้งาน Wi-Fi</b> เป็นทศนิยม 2 ตำแหน่ง",
+        image="stage5.png",
+        file="5internet.csv",
+        column="HoursUsed",
+        aggregate="mean",
+        rounding=2,
+        input_label="กรอกคำตอบ เช่น 3.89",
+        input_format="%.2f",
+        hint="ใบ้: ดูคอลัมน์ <b>HoursUsed</b> แล้วหา “ค่าเฉลี่ย” และปัดทศนิยม 2 ตำแหน่ง (mean + round).",
+    ),
+)
+
+TOTAL_STAGES = len(STAGES)
+FINAL_STAGE = STAGES[-1].number
+# หน้าสรุปผลอยู่ถัดจากด่านสุดท้าย
+SUMMARY_STAGE = FINAL_STAGE + 1
+STAGE_BY_NUMBER = {s.number: s for s in STAGES}
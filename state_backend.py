@@ -0,0 +1,146 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+
+# -------------------------------------------------
+# SHARED STATE BACKENDS
+# -------------------------------------------------
+class SQLiteStateBackend:
+    """
+    key -> JSON ในไฟล์ SQLite (มีวันหมดอายุต่อ key)
+    ใช้ได้ทุก process บนเครื่องเดียวกัน (WAL) — หลายเครื่องหลัง load balancer ให้ใช้ RedisStateBackend
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS app_state ("
+            " key TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self.prune()
+
+    def load(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM app_state WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, key: str, value: dict, ttl: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO app_state (key, data, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET data = excluded.data, expires = excluded.expires",
+                (key, json.dumps(value, ensure_ascii=False), time.time() + ttl)
+            )
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM app_state WHERE key = ?", (key,))
+
+    def prune(self) -> int:
+        """ลบ key ที่หมดอายุแล้ว"""
+        with self._lock:
+            return self._conn.execute("DELETE FROM app_state WHERE expires <= ?", (time.time(),)).rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RedisStateBackend:
+    """
+    key -> JSON ใน Redis (หมดอายุด้วย EX ของ Redis) ใช้ร่วมกันได้ทุกเครื่อง
+    client = อะไรก็ได้ที่มี get / set(name, value, ex=) / delete แบบ redis-py
+    (ส่ง client เข้ามาเอง เช่น redis.Redis(...) หรือ MemoryRedis ในเครื่องตอนทดสอบ)
+    """
+
+    def __init__(self, client, prefix: str = "escape:"):
+        self.client = client
+        self.prefix = prefix
+
+    def load(self, key: str) -> Optional[dict]:
+        data = self.client.get(self.prefix + key)
+        return json.loads(data) if data is not None else None
+
+    def save(self, key: str, value: dict, ttl: float):
+        self.client.set(self.prefix + key, json.dumps(value, ensure_ascii=False), ex=max(1, int(ttl)))
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def close(self):
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            close()
+
+
+class MemoryRedis:
+    """
+    ตัวแทน Redis ในหน่วยความจำ (get / set(ex=) / delete แบบ redis-py) สำหรับทดสอบ / รันเครื่องเดียว
+    ค่าเก็บเป็น bytes และหมดอายุตาม ex วินาทีเหมือน Redis — ไม่ได้ใช้ร่วมกันข้าม process
+    clock = ฟังก์ชันคืนเวลาเป็นวินาที (ว่าง = time.time)
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def _now(self) -> float:
+        return self.clock() if self.clock is not None else time.time()
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._data.get(name)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires <= self._now():
+                del self._data[name]
+                return None
+            return value
+
+    def set(self, name: str, value, ex: int = None) -> bool:
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        with self._lock:
+            self._data[name] = (bytes(value), self._now() + ex if ex is not None else None)
+        return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+    def close(self):
+        pass
+
+
+def open_backend(url: str, default_path, prefix: str = "escape:"):
+    """
+    เลือก backend จาก URL
+    - "" = SQLite ที่ default_path, "sqlite:///data/state.db" หรือ path ของไฟล์ = SQLite
+    - "redis://host:6379/0" (หรือ rediss://) = Redis (ต้องติดตั้งแพ็กเกจ redis)
+    - "memory://" = MemoryRedis (process เดียว หายเมื่อรีสตาร์ต)
+    """
+    url = (url or "").strip()
+    if url.startswith("memory://"):
+        return RedisStateBackend(MemoryRedis(), prefix=prefix)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("STATE_BACKEND เป็น Redis แต่ยังไม่ได้ติดตั้งแพ็กเกจ redis (pip install redis)") from e
+        return RedisStateBackend(redis.Redis.from_url(url), prefix=prefix)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SQLiteStateBackend(url or default_path)
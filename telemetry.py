@@ -0,0 +1,233 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------
+# SPAN TIMERS (opt-in)
+# -------------------------------------------------
+# ขอบบนของ bucket (วินาที) แบบเดียวกับ histogram ของ Prometheus
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TRACE_PATH = Path("data") / "telemetry.jsonl"
+
+_NOOP = nullcontext()
+
+
+class Telemetry:
+    """
+    จับเวลาช่วงงานสำคัญ (span) ของหนึ่ง process
+    - span("answer_check") ครอบโค้ดที่ต้องการวัด (เกิด exception = ok=False แล้วโยนต่อ)
+    - เก็บ histogram สะสม (สำหรับ Prometheus /metrics) + ค่าล่าสุด window ค่าต่อ span
+    - ถ้าตั้ง trace_path จะเขียนทุก span ต่อท้ายไฟล์ JSONL (หน้า admin อ่านจากไฟล์นี้)
+    ปิดอยู่ (enabled=False) = span() คืน context ว่าง ไม่มีต้นทุนเพิ่ม
+    """
+
+    def __init__(self, app: str, enabled: bool = True, trace_path=None,
+                 window: int = 2000, buckets=DEFAULT_BUCKETS):
+        self.app = app
+        self.enabled = enabled
+        self.window = window
+        self.buckets = tuple(buckets)
+        self.trace_path = Path(trace_path) if trace_path else None
+        self._lock = threading.Lock()
+        self._series = {}
+        self._trace = None
+        self._server = None
+        if enabled and self.trace_path is not None:
+            self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+            self._trace = open(self.trace_path, "a", encoding="utf-8", buffering=1)
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _NOOP
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str):
+        t0 = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            self.record(name, time.perf_counter() - t0, ok)
+
+    def record(self, name: str, seconds: float, ok: bool = True):
+        if not self.enabled:
+            return
+        with self._lock:
+            s = self._series.get(name)
+            if s is None:
+                s = self._series[name] = {
+                    "count": 0, "errors": 0, "sum": 0.0,
+                    "buckets": [0] * len(self.buckets),
+                    "recent": deque(maxlen=self.window),
+                }
+            s["count"] += 1
+            s["errors"] += 0 if ok else 1
+            s["sum"] += seconds
+            for i, upper in enumerate(self.buckets):
+                if seconds <= upper:
+                    s["buckets"][i] += 1
+            s["recent"].append(seconds)
+            if self._trace is not None:
+                self._trace.write(json.dumps({
+                    "ts": round(time.time(), 3), "app": self.app, "span": name,
+                    "ms": round(seconds * 1000, 3), "ok": ok,
+                }) + "\n")
+
+    def stats(self) -> pd.DataFrame:
+        """สรุปต่อ span จากค่าล่าสุด (rolling window)"""
+        with self._lock:
+            rows = [(name, s["count"], s["errors"], np.asarray(s["recent"]))
+                    for name, s in self._series.items()]
+        return summarize([
+            {"span": name, "count": count, "errors": errors, "recent_ms": recent * 1000}
+            for name, count, errors, recent in rows
+        ])
+
+    def prometheus(self) -> str:
+        """ข้อความรูปแบบ Prometheus exposition"""
+        lines = [
+            "# HELP escape_span_seconds Duration of instrumented operations.",
+            "# TYPE escape_span_seconds histogram",
+        ]
+        errors = ["# HELP escape_span_errors_total Operations that raised.",
+                  "# TYPE escape_span_errors_total counter"]
+        with self._lock:
+            for name, s in sorted(self._series.items()):
+                labels = f'app="{self.app}",span="{name}"'
+                for upper, n in zip(self.buckets, s["buckets"]):
+                    lines.append(f'escape_span_seconds_bucket{{{labels},le="{upper}"}} {n}')
+                lines.append(f'escape_span_seconds_bucket{{{labels},le="+Inf"}} {s["count"]}')
+                lines.append(f"escape_span_seconds_sum{{{labels}}} {s['sum']:.6f}")
+                lines.append(f"escape_span_seconds_count{{{labels}}} {s['count']}")
+                errors.append(f"escape_span_errors_total{{{labels}}} {s['errors']}")
+        return "\n".join(lines + errors) + "\n"
+
+    def serve_metrics(self, port: int, host: str = "0.0.0.0"):
+        """เปิด /metrics ให้ Prometheus scrape (thread เบื้องหลัง, เรียกซ้ำได้)"""
+        if self._server is not None or not self.enabled:
+            return
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = telemetry.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._trace is not None:
+            self._trace.close()
+            self._trace = None
+
+
+DISABLED = Telemetry("disabled", enabled=False)
+
+
+def from_env(app: str) -> Telemetry:
+    """
+    เปิดด้วย TELEMETRY=1
+    - TELEMETRY_TRACE = ไฟล์ JSONL (ค่าเริ่มต้น data/telemetry.jsonl, ตั้งเป็นค่าว่าง = ไม่เขียน)
+    - TELEMETRY_PORT_<APP> = พอร์ต /metrics ของแต่ละแอป เช่น TELEMETRY_PORT_APP=9101
+    """
+    if os.environ.get("TELEMETRY", "").lower() not in ("1", "true", "yes", "on"):
+        return DISABLED
+    telemetry = Telemetry(app, trace_path=os.environ.get("TELEMETRY_TRACE", str(TRACE_PATH)))
+    port = os.environ.get(f"TELEMETRY_PORT_{app.upper()}")
+    if port:
+        telemetry.serve_metrics(int(port))
+    return telemetry
+
+
+# -------------------------------------------------
+# TRACE READING (หน้า admin)
+# -------------------------------------------------
+def read_trace(path=TRACE_PATH, max_bytes: int = 4 * 2**20) -> pd.DataFrame:
+    """อ่านท้ายไฟล์ trace (ล่าสุดไม่เกิน max_bytes) เป็น DataFrame"""
+    path = Path(path)
+    if not path.exists():
+        return pd.DataFrame(columns=["ts", "app", "span", "ms", "ok"])
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - max_bytes))
+        data = f.read()
+    lines = data.splitlines()
+    if size > max_bytes and lines:
+        lines = lines[1:]  # บรรทัดแรกอาจถูกตัดกลางบรรทัด
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    df = pd.DataFrame.from_records(records, columns=["ts", "app", "span", "ms", "ok"])
+    df["ts"] = pd.to_datetime(df["ts"], unit="s")
+    return df
+
+
+def summarize(series) -> pd.DataFrame:
+    """[{span, count, errors, recent_ms}] -> ตาราง p50/p95/p99"""
+    rows = []
+    for s in series:
+        recent = np.asarray(s["recent_ms"], dtype=float)
+        p50, p95, p99 = np.percentile(recent, [50, 95, 99]) if len(recent) else (np.nan,) * 3
+        rows.append({
+            "span": s["span"], "count": s["count"], "errors": s["errors"],
+            "p50_ms": p50, "p95_ms": p95, "p99_ms": p99,
+        })
+    return pd.DataFrame(rows, columns=["span", "count", "errors", "p50_ms", "p95_ms", "p99_ms"])
+
+
+def trace_summary(trace: pd.DataFrame) -> pd.DataFrame:
+    """สรุปต่อ (app, span) จาก trace"""
+    out = []
+    for (app, span), g in trace.groupby(["app", "span"], sort=True):
+        row = summarize([{"span": span, "count": len(g), "errors": int((~g["ok"].astype(bool)).sum()),
+                          "recent_ms": g["ms"].to_numpy()}]).iloc[0].to_dict()
+        row["app"] = app
+        out.append(row)
+    cols = ["app", "span", "count", "errors", "p50_ms", "p95_ms", "p99_ms"]
+    return pd.DataFrame(out, columns=cols)
+
+
+def latency_histogram(ms: pd.Series, bins: int = 24) -> pd.DataFrame:
+    """histogram แบบ log scale (แกน x = ขอบบนของช่วง, ms)"""
+    ms = pd.to_numeric(ms, errors="coerce").dropna()
+    ms = ms[ms > 0]
+    if ms.empty:
+        return pd.DataFrame(columns=["le_ms", "count"])
+    lo, hi = np.log10(ms.min()), np.log10(ms.max())
+    edges = np.logspace(lo, hi if hi > lo else lo + 1, bins + 1)
+    counts, _ = np.histogram(ms, bins=edges)
+    return pd.DataFrame({"le_ms": np.round(edges[1:], 2).astype(str), "count": counts})
@@ -0,0 +1,179 @@
+"""
+ทดสอบ journal ผลการตอบ: ส่งครั้งเดียวต่อแถว แม้หลายผู้ส่ง (หลาย process) ใช้ไฟล์เดียวกัน หรือรีสตาร์ตกลางชุด
+
+    python -m pytest tests
+"""
+import json
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from attempt_journal import AttemptJournal  # noqa: E402
+from attempt_logger import AttemptLogger  # noqa: E402
+from webhook_stub import WebhookStub  # noqa: E402
+
+
+@pytest.fixture
+def stub():
+    server = WebhookStub(latency=0.002).start()
+    yield server
+    server.stop()
+
+
+def attempt(i: int, result: str = "ผิด", group: str = None) -> dict:
+    return {"group_name": group or f"ทีม{i % 4}", "classroom": "ม.3/1", "stage": 1, "answer": i, "result": result,
+            "count": 1}
+
+
+def test_two_senders_on_one_journal_send_each_row_once(tmp_path, stub):
+    # journal คนละ connection = เหมือนสอง process บนเครื่องเดียวกัน
+    path = tmp_path / "attempts.db"
+    loggers = [AttemptLogger(stub.url, AttemptJournal(path), batch_size=5) for _ in range(2)]
+    for i in range(40):
+        loggers[i % 2].log(attempt(i))
+    for logger in loggers:
+        assert logger.flush(timeout=20)
+    assert sorted(r["answer"] for r in stub.received) == list(range(40))
+    assert sum(logger.sent for logger in loggers) == 40
+    for logger in loggers:
+        logger.close()
+
+
+REPLICA = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from attempt_journal import AttemptJournal
+from attempt_logger import AttemptLogger
+logger = AttemptLogger(sys.argv[2], AttemptJournal(sys.argv[3]), batch_size=5)
+for i in range(int(sys.argv[4]), int(sys.argv[4]) + 20):
+    logger.log({"group_name": "ทีม", "classroom": "ม.3/1", "stage": 1, "answer": i, "result": "ผิด", "count": 1})
+sys.exit(0 if logger.flush(timeout=30) else 1)
+"""
+
+
+def test_replica_processes_on_one_journal_send_each_row_once(tmp_path, stub):
+    # หลาย replica ของแอปบนเครื่องเดียวกันใช้ data/attempts.db ไฟล์เดียวกัน
+    path = tmp_path / "attempts.db"
+    procs = [
+        subprocess.Popen([sys.executable, "-c", REPLICA, str(ROOT), stub.url, str(path), str(start)])
+        for start in (0, 20)
+    ]
+    assert [p.wait(timeout=60) for p in procs] == [0, 0]
+    assert sorted(r["answer"] for r in stub.received) == list(range(40))
+    journal = AttemptJournal(path)
+    assert journal.backlog() == 0
+    journal.close()
+
+
+def wait_for_rows(stub, n: int, timeout: float = 5.0) -> list:
+    deadline = time.monotonic() + timeout
+    while len(stub.received) < n and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return list(stub.received)
+
+
+def test_repeated_wrong_answer_is_held_and_sent_once(tmp_path, stub):
+    # webhook ปกติ (ไม่ล้ม) — ต้องพักคำตอบผิดไว้จนครบ window ถึงจะรวมได้
+    logger = AttemptLogger(stub.url, AttemptJournal(tmp_path / "attempts.db"), coalesce_window=1.0)
+    for _ in range(5):
+        logger.log(attempt(7))
+        time.sleep(0.1)
+    assert stub.received == []
+    rows = wait_for_rows(stub, 1)
+    time.sleep(0.3)
+    assert [(r["answer"], r["count"]) for r in stub.received] == [(7, 5)]
+    assert stub.received[0]["timestamp"] <= time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - 1))
+    assert logger.pending() == 0
+    logger.close()
+
+
+def test_other_answer_releases_held_run_in_order(tmp_path, stub):
+    logger = AttemptLogger(stub.url, AttemptJournal(tmp_path / "attempts.db"), coalesce_window=30.0)
+    for _ in range(3):
+        logger.log(attempt(7, group="ทีมเสือ"))
+    logger.log(attempt(8, group="ทีมเสือ"))
+    logger.log(attempt(4, result="ถูก", group="ทีมเสือ"))
+    rows = wait_for_rows(stub, 2, timeout=3.0)
+    assert [(r["answer"], r["count"]) for r in rows[:2]] == [(7, 3), (8, 1)]
+    # คำตอบผิดที่เป็นแถวสุดท้ายถูกพักไว้ แต่ flush ส่งทันที
+    assert logger.flush(timeout=5)
+    assert [(r["answer"], r["result"], r["count"]) for r in stub.received] == [
+        (7, "ผิด", 3), (8, "ผิด", 1), (4, "ถูก", 1)]
+    logger.close()
+
+
+def test_payload_keeps_event_time_when_sent_late(tmp_path, stub):
+    journal = AttemptJournal(tmp_path / "attempts.db")
+    before = time.strftime("%Y-%m-%d %H:%M:%S")
+    journal.append(attempt(1, group="ทีมเสือ"))
+    journal.append(dict(attempt(2), timestamp="2025-06-02 08:30:00"))
+    journal.close()
+    time.sleep(1.1)
+
+    # ส่งหลังเหตุการณ์ (เช่น webhook ล่มแล้วกลับมา) — เวลายังเป็นเวลาที่ตอบ ไม่ใช่เวลาที่ส่ง
+    logger = AttemptLogger(stub.url, AttemptJournal(tmp_path / "attempts.db"))
+    assert logger.flush(timeout=5)
+    first, second = stub.received
+    assert before <= first["timestamp"] < time.strftime("%Y-%m-%d %H:%M:%S")
+    assert second["timestamp"] == "2025-06-02 08:30:00"
+    logger.close()
+
+
+def test_restart_mid_batch_does_not_resend(tmp_path):
+    path = tmp_path / "attempts.db"
+    journal = AttemptJournal(path)
+    for i in range(5):
+        journal.append(attempt(i))
+    rows = journal.claim("first", limit=5, lease=0.2)
+    assert [r[0] for r in rows] == [1, 2, 3, 4, 5]
+    # ส่งได้สองแถวแล้ว process ตาย (ไม่ได้ release)
+    assert journal.mark_sent([1, 2], "first") == 2
+    journal.close()
+
+    again = AttemptJournal(path)
+    assert again.claim("second", limit=5) == []  # ยังติด lease ของผู้ส่งเดิม
+    time.sleep(0.25)
+    assert [r[0] for r in again.claim("second", limit=5)] == [3, 4, 5]
+    # ผู้ส่งเดิมที่ lease หมดแล้วบันทึกทับไม่ได้
+    assert again.mark_sent([3], "first") == 0
+    assert again.mark_sent([3, 4, 5], "second") == 3
+    assert again.backlog() == 0
+    again.close()
+
+
+def test_release_returns_unsent_rows(tmp_path):
+    journal = AttemptJournal(tmp_path / "attempts.db")
+    for i in range(3):
+        journal.append(attempt(i))
+    journal.claim("a", limit=3)
+    journal.mark_sent([1], "a")
+    assert journal.release("a") == 2
+    assert [r[0] for r in journal.claim("b", limit=3)] == [2, 3]
+    journal.close()
+
+
+def test_migrates_high_water_mark_journal(tmp_path):
+    path = tmp_path / "attempts.db"
+    conn = sqlite3.connect(str(path))
+    conn.executescript("""
+        CREATE TABLE attempts (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, payload TEXT NOT NULL);
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        INSERT INTO meta (key, value) VALUES ('hwm', 2);
+    """)
+    conn.executemany("INSERT INTO attempts (created_at, payload) VALUES (?, ?)",
+                     [(time.time(), json.dumps(attempt(i))) for i in range(4)])
+    conn.commit()
+    conn.close()
+
+    journal = AttemptJournal(path)
+    assert journal.backlog() == 2
+    assert [r[2]["answer"] for r in journal.claim("x", limit=10)] == [2, 3]
+    journal.close()
@@ -0,0 +1,61 @@
+"""
+ทดสอบไฟล์ดาวน์โหลดของแดชบอร์ด: ฟังก์ชันแบบ deferred ของ st.download_button ต้องคืนชนิดที่ Streamlit รับ
+(รันผ่าน MediaFileManager จริง เหมือนตอนกดปุ่มดาวน์โหลด)
+
+    python -m pytest tests
+"""
+import gzip
+import io
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from dashboard import EXPORT_CHUNK_ROWS, EXPORT_FORMATS, export_file  # noqa: E402
+
+
+def sample_frame(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "group_name": [f"ทีม{i % 7}" for i in range(rows)],
+        "classroom": ["ม.3/1"] * rows,
+        "stage": [i % 5 + 1 for i in range(rows)],
+        "result": ["ถูกต้อง" if i % 3 else "ผิด" for i in range(rows)],
+        "count": [1] * rows,
+    })
+
+
+def download(fn, mime: str) -> bytes:
+    """ลงทะเบียนแบบ deferred แล้วเรียกแบบที่ Streamlit ทำตอนกดปุ่ม คืนเนื้อไฟล์ที่เก็บไว้"""
+    storage = MemoryMediaFileStorage("/media")
+    manager = MediaFileManager(storage)
+    file_id = manager.add_deferred(fn, mime, "test-export", file_name="export")
+    url = manager.execute_deferred(file_id)
+    return storage.get_file(url.rsplit("/", 1)[-1]).content
+
+
+def read_back(content: bytes, fmt: str) -> pd.DataFrame:
+    if fmt == "parquet":
+        return pd.read_parquet(io.BytesIO(content))
+    if fmt == "csv.gz":
+        content = gzip.decompress(content)
+    return pd.read_csv(io.BytesIO(content), encoding="utf-8-sig")
+
+
+@pytest.mark.parametrize("fmt", list(EXPORT_FORMATS))
+def test_deferred_export_round_trip(fmt):
+    df = sample_frame(EXPORT_CHUNK_ROWS + 10)
+    _, mime = EXPORT_FORMATS[fmt]
+    content = download(lambda: export_file(df, fmt), mime)
+    pd.testing.assert_frame_equal(read_back(content, fmt), df)
+
+
+def test_deferred_export_empty_frame():
+    df = sample_frame(0)
+    content = download(lambda: export_file(df, "csv"), "text/csv")
+    assert content.decode("utf-8-sig").splitlines() == [",".join(df.columns)]
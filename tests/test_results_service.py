@@ -0,0 +1,69 @@
+"""
+ทดสอบ results_service (ASGI) โดยเรียก app ตรง ๆ ไม่ต้องเปิด uvicorn: ค่าผิดรูปแบบต้องได้ 400 ไม่ใช่ 500
+
+    python -m pytest tests
+"""
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from results_service import ResultsService  # noqa: E402
+from results_store import ResultsStore  # noqa: E402
+
+
+@pytest.fixture
+def service(tmp_path):
+    return ResultsService(ResultsStore(tmp_path / "results.db"))
+
+
+def call(service, method: str, path: str, query: str = "", body=None) -> tuple:
+    raw = b"" if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": raw, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": query.encode()}
+    asyncio.run(service(scope, receive, send))
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+
+def attempt(**overrides) -> dict:
+    payload = {"group_name": "ทีมเสือ", "classroom": "ม.3/1", "stage": 2, "answer": 42, "result": "ผิด",
+               "time_used": "", "time_seconds": "", "count": 1, "timestamp": "2025-06-02 08:30:00"}
+    payload.update(overrides)
+    return payload
+
+
+def test_post_and_filter_by_stage(service):
+    assert call(service, "POST", "/attempts", body=attempt())[0] == 200
+    assert call(service, "POST", "/attempts", body=attempt(stage="3", count="4"))[0] == 200
+
+    status, rows = call(service, "GET", "/attempts", "stage=3")
+    assert status == 200
+    assert [(r["stage"], r["count"], r["timestamp"]) for r in rows] == [(3, 4, "2025-06-02 08:30:00")]
+
+
+@pytest.mark.parametrize("overrides", [{"stage": "สอง"}, {"stage": 2.5}, {"stage": [2]}, {"count": "abc"},
+                                       {"count": {"n": 1}}])
+def test_post_rejects_non_integer_fields(service, overrides):
+    status, data = call(service, "POST", "/attempts", body=attempt(**overrides))
+    assert status == 400
+    assert "must be an integer" in data["error"]
+    assert call(service, "GET", "/attempts")[1] == []
+
+
+@pytest.mark.parametrize("query", ["stage=x", "after_id=abc", "limit=1.5"])
+def test_get_rejects_non_integer_query(service, query):
+    status, data = call(service, "GET", "/attempts", query)
+    assert status == 400
+    assert "must be an integer" in data["error"]
@@ -0,0 +1,54 @@
+"""
+ทดสอบตัวปิด session ที่ไม่ได้ใช้งาน: ปิดเฉพาะ session ที่แท็บหลุดไปแล้ว
+
+    python -m pytest tests
+"""
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from session_record import IdleSessionReaper  # noqa: E402
+
+
+def test_reaper_keeps_connected_sessions_until_they_disconnect():
+    connected = {"a", "b"}
+    closed = []
+
+    def evict(sid):
+        if sid in connected:
+            return False
+        closed.append(sid)
+        return True
+
+    reaper = IdleSessionReaper(0.05, evict, interval=3600)
+    for sid in ("a", "b", "c"):
+        reaper.touch(sid)
+    time.sleep(0.1)
+
+    assert reaper.sweep() == ["c"]
+    assert closed == ["c"] and reaper.active() == 2
+
+    # ยังเปิดแท็บค้างไว้ = ตรวจใหม่ทุกรอบ ไม่ปิด
+    assert reaper.sweep() == []
+    connected.discard("a")
+    assert reaper.sweep() == ["a"]
+    assert closed == ["c", "a"] and reaper.evicted == 2 and reaper.active() == 1
+
+
+def test_reaper_touch_while_checking_keeps_new_time():
+    checked = []
+
+    def evict(sid):
+        checked.append(sid)
+        reaper.touch(sid)
+        return False
+
+    reaper = IdleSessionReaper(0.05, evict, interval=3600)
+    reaper.touch("a")
+    time.sleep(0.1)
+    assert reaper.sweep() == []
+    # touch ระหว่างตรวจ = เพิ่งใช้งาน ยังไม่ถึงเวลาตรวจอีก
+    assert reaper.sweep() == [] and checked == ["a"] and reaper.active() == 1
@@ -0,0 +1,147 @@
+"""
+ทดสอบตัวโหลดชีตแบบดึงเฉพาะแถวใหม่ กับเซิร์ฟเวอร์ CSV ในเครื่อง (ทำตัวเหมือนชีตที่ publish ไว้ + &range=)
+
+    python -m pytest tests
+"""
+import csv
+import http.server
+import io
+import sys
+import threading
+import urllib.parse
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from sheet_store import IncrementalSheetLoader  # noqa: E402
+
+HEADER = ["timestamp", "group_name", "stage", "result"]
+
+
+class FakeSheet:
+    def __init__(self):
+        self.rows = []
+        self.honor_range = True
+        self.requests = []
+        sheet = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+                sheet.requests.append(query.get("range", ["full"])[0])
+                buf = io.StringIO()
+                writer = csv.writer(buf)
+                if "range" in query and sheet.honor_range:
+                    start = int(query["range"][0].split(":")[0][1:])
+                    writer.writerows(sheet.rows[start - 2:])
+                else:
+                    writer.writerow(HEADER)
+                    writer.writerows(sheet.rows)
+                body = buf.getvalue().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv; charset=utf-8")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/pub?output=csv"
+
+    def add(self, n: int):
+        start = len(self.rows)
+        self.rows += [[f"2025-06-02 08:{i % 60:02d}:00", f"ทีม{i}", "1", "ผิด"] for i in range(start, start + n)]
+
+
+@pytest.fixture
+def sheet():
+    s = FakeSheet()
+    yield s
+    s.server.shutdown()
+
+
+def groups(loader) -> list:
+    return loader.frame()["group_name"].tolist()
+
+
+def test_appends_only_new_rows(sheet, tmp_path):
+    sheet.add(3)
+    loader = IncrementalSheetLoader(sheet.url, tmp_path / "rows.db")
+    assert loader.refresh() == 3
+    sheet.add(2)
+    assert loader.refresh() == 2
+    assert loader.refresh() == 0
+    assert groups(loader) == ["ทีม0", "ทีม1", "ทีม2", "ทีม3", "ทีม4"]
+    # ขอแถวสุดท้ายที่มีแล้วซ้ำมาด้วย (แถว 4 ของชีต = ข้อมูลแถวที่ 3)
+    assert sheet.requests == ["full", "A4:ZZ", "A6:ZZ"]
+    assert loader.generation == 1
+
+
+def test_deleted_rows_trigger_full_reload(sheet, tmp_path):
+    sheet.add(5)
+    loader = IncrementalSheetLoader(sheet.url, tmp_path / "rows.db")
+    loader.refresh()
+    # ครูล้างชีตระหว่างคาบ แล้วมีแถวใหม่เข้ามาน้อยกว่าเดิม
+    sheet.rows = sheet.rows[:0]
+    sheet.add(2)
+    loader.refresh()
+    assert groups(loader) == ["ทีม0", "ทีม1"]
+    assert loader.generation == 2
+
+    # ลบแถวท้ายอย่างเดียว (ชีตสั้นลง)
+    sheet.rows.pop()
+    loader.refresh()
+    assert groups(loader) == ["ทีม0"]
+
+
+def test_edited_last_row_triggers_full_reload(sheet, tmp_path):
+    sheet.add(3)
+    loader = IncrementalSheetLoader(sheet.url, tmp_path / "rows.db")
+    loader.refresh()
+    sheet.rows[-1][3] = "ถูก"
+    sheet.add(1)
+    loader.refresh()
+    assert loader.frame()["result"].tolist() == ["ผิด", "ผิด", "ถูก", "ผิด"]
+
+
+def test_full_refresh_and_periodic_reload_pick_up_middle_edits(sheet, tmp_path):
+    sheet.add(3)
+    loader = IncrementalSheetLoader(sheet.url, tmp_path / "rows.db", full_every=3600)
+    loader.refresh()
+    sheet.rows[0][1] = "ทีมแก้ชื่อ"
+    loader.refresh()
+    assert groups(loader)[0] == "ทีม0"  # แก้กลางชีต ดึงแบบ incremental ไม่เห็น
+    loader.refresh(full=True)
+    assert groups(loader)[0] == "ทีมแก้ชื่อ"
+
+    sheet.rows[1][1] = "ทีมแก้อีก"
+    loader.full_every = 0
+    loader.refresh()
+    assert groups(loader)[1] == "ทีมแก้อีก"
+
+
+def test_restart_reuses_store_but_drops_deleted_rows(sheet, tmp_path):
+    sheet.add(4)
+    first = IncrementalSheetLoader(sheet.url, tmp_path / "rows.db")
+    first.refresh()
+
+    sheet.rows = sheet.rows[:2]
+    again = IncrementalSheetLoader(sheet.url, tmp_path / "rows.db")
+    assert len(again.frame()) == 4
+    again.refresh()
+    assert groups(again) == ["ทีม0", "ทีม1"]
+
+
+def test_range_ignored_falls_back_to_full_load(sheet, tmp_path):
+    sheet.add(2)
+    loader = IncrementalSheetLoader(sheet.url, tmp_path / "rows.db")
+    loader.refresh()
+    sheet.honor_range = False
+    sheet.add(1)
+    assert loader.refresh() == 1
+    assert groups(loader) == ["ทีม0", "ทีม1", "ทีม2"]
@@ -0,0 +1,134 @@
+"""
+ทดสอบ state backend: checkpoint ของ SessionRecord ผ่าน SQLite และ Redis (MemoryRedis) + การหมดอายุ
+
+    python -m pytest tests
+"""
+import dataclasses
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import state_backend  # noqa: E402
+from session_record import SessionCheckpoints, SessionRecord  # noqa: E402
+from state_backend import MemoryRedis, RedisStateBackend, SQLiteStateBackend, open_backend  # noqa: E402
+
+TTL = 60
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """นาฬิกาปลอมของ state_backend (time.time) เลื่อนได้ด้วย clock.now += วินาที"""
+    fake = types.SimpleNamespace(now=1_800_000_000.0)
+    monkeypatch.setattr(state_backend, "time", types.SimpleNamespace(time=lambda: fake.now))
+    return fake
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def backend(request, tmp_path, clock):
+    if request.param == "sqlite":
+        b = SQLiteStateBackend(tmp_path / "state.db")
+    else:
+        b = RedisStateBackend(MemoryRedis(), prefix="test:")
+    yield b
+    b.close()
+
+
+def finished_stage_one() -> SessionRecord:
+    """ผ่านด่าน 1 แล้ว (นาฬิกาหยุด) เวลาที่โหลดกลับจึงไม่ขึ้นกับเวลาจริง"""
+    rec = SessionRecord(sid="abc123", group_name="ทีมเสือ", room="ม.3/1")
+    rec.start(now=1_700_000_000.0, mono=100.0)
+    rec.add_hint(1)
+    rec.split(112.5)
+    rec.add_badge(1)
+    return rec
+
+
+def test_checkpoint_round_trip(backend):
+    checkpoints = SessionCheckpoints(backend, ttl=TTL)
+    rec = finished_stage_one()
+    checkpoints.save(rec)
+
+    by_team = checkpoints.load(" ทีมเสือ ", "ม.3/1")
+    by_session = checkpoints.load_session("abc123")
+    for loaded in (by_team, by_session):
+        assert loaded is not None
+        assert dataclasses.replace(loaded, saved_at=0.0) == rec
+        assert loaded.splits == [12.5] and loaded.has_badge(1) and loaded.has_hint(1)
+
+    checkpoints.delete("ทีมเสือ", "ม.3/1")
+    assert checkpoints.load("ทีมเสือ", "ม.3/1") is None
+    assert checkpoints.load_session("abc123") is not None
+
+
+def test_checkpoint_expires_after_ttl(backend, clock):
+    checkpoints = SessionCheckpoints(backend, ttl=TTL)
+    checkpoints.save(finished_stage_one())
+
+    clock.now += TTL - 1
+    assert checkpoints.load("ทีมเสือ", "ม.3/1") is not None
+
+    # บันทึกใหม่ = ต่ออายุ
+    checkpoints.save(finished_stage_one())
+    clock.now += TTL - 1
+    assert checkpoints.load_session("abc123") is not None
+
+    clock.now += 2
+    assert checkpoints.load("ทีมเสือ", "ม.3/1") is None
+    assert checkpoints.load_session("abc123") is None
+
+
+def test_memory_redis_matches_redis_py():
+    now = [0.0]
+    client = MemoryRedis(clock=lambda: now[0])
+    assert client.set("k", "ค่า", ex=5) is True
+    assert client.get("k") == "ค่า".encode("utf-8")
+    client.set("forever", b"x")
+    now[0] = 5.0
+    assert client.get("k") is None
+    assert client.get("forever") == b"x"
+    assert client.delete("forever", "missing") == 1
+
+
+def test_open_backend_redis_url(monkeypatch, clock):
+    urls = []
+
+    class FakeRedis:
+        @classmethod
+        def from_url(cls, url):
+            urls.append(url)
+            return MemoryRedis()
+
+    monkeypatch.setitem(sys.modules, "redis", types.SimpleNamespace(Redis=FakeRedis))
+    backend = open_backend(" redis://cache:6379/2 ", "unused.db", prefix="room:")
+    assert isinstance(backend, RedisStateBackend)
+    assert urls == ["redis://cache:6379/2"]
+    assert backend.prefix == "room:"
+
+    checkpoints = SessionCheckpoints(backend, ttl=TTL)
+    checkpoints.save(finished_stage_one())
+    assert backend.client.get("room:session:abc123") is not None
+    assert checkpoints.load("ทีมเสือ", "ม.3/1").splits == [12.5]
+
+
+def test_open_backend_redis_missing(monkeypatch):
+    monkeypatch.setitem(sys.modules, "redis", None)
+    with pytest.raises(RuntimeError, match="pip install redis"):
+        open_backend("redis://localhost:6379/0", "unused.db")
+
+
+def test_open_backend_sqlite_and_memory(tmp_path):
+    default = open_backend("", tmp_path / "default.db")
+    assert isinstance(default, SQLiteStateBackend) and default.path == tmp_path / "default.db"
+    default.close()
+
+    url = open_backend(f"sqlite:///{tmp_path / 'state.db'}", tmp_path / "default.db")
+    assert isinstance(url, SQLiteStateBackend) and url.path == tmp_path / "state.db"
+    url.close()
+
+    memory = open_backend("memory://", tmp_path / "default.db")
+    assert isinstance(memory, RedisStateBackend) and isinstance(memory.client, MemoryRedis)